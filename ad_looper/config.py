@@ -1,4 +1,5 @@
 from pathlib import Path
+from typing import Literal
 
 from pydantic import BaseModel
 from pydantic_settings import BaseSettings, SettingsConfigDict
@@ -13,6 +14,75 @@ class TokenSettings(BaseModel):
     algorithm: str
     access_token_expire_minutes: int
     refresh_token_expire_days: int
+    cache_size: int = 10_000
+    cache_ttl: float = 60.0
+    stateless_device_auth: bool = False
+    revocation_refresh: float = 30.0
+    purge_interval: float = 3600.0
+    purge_batch_size: int = 1000
+
+
+class LogSettings(BaseModel):
+    queue_size: int = 10_000
+    batch_size: int = 500
+    flush_interval: float = 1.0
+    retention_days: int = 90
+    partitions_ahead: int = 4
+
+
+class PlaylistSettings(BaseModel):
+    cache_size: int = 10_000
+    cache_ttl: float = 300.0
+
+
+class ScheduleSettings(BaseModel):
+    timeline_refresh: float = 60.0
+
+
+class PushSettings(BaseModel):
+    send_timeout: float = 5.0
+
+
+class EventSettings(BaseModel):
+    enabled: bool = True
+    channel: str = "entity_events"
+    reconnect_delay: float = 1.0
+    reconnect_max_delay: float = 30.0
+
+
+class HeartbeatSettings(BaseModel):
+    flush_interval: float = 10.0
+    batch_size: int = 1000
+    # Seconds since the last heartbeat before a device counts as stale,
+    # and then as offline
+    stale_after: float = 90.0
+    offline_after: float = 600.0
+
+
+class PlaySettings(BaseModel):
+    aggregate_interval: float = 60.0
+    aggregate_batch_size: int = 10_000
+    # Caps one aggregation cycle so a backlog can't hold the loop forever
+    aggregate_max_batches: int = 100
+
+
+class MediaSettings(BaseModel):
+    max_upload_size: int = 2 * 1024**3
+    chunk_size: int = 1024 * 1024
+    # "stream" sends files from the worker. The other two only authorize
+    # and leave sending to the front proxy (nginx / Apache or lighttpd)
+    delivery: Literal["stream", "x-accel-redirect", "x-sendfile"] = "stream"
+    # nginx `internal` location that maps onto media_folder
+    accel_redirect_prefix: str = "/_media/"
+    upload_session_ttl: float = 86400.0
+    upload_cleanup_interval: float = 3600.0
+    blob_collect_interval: float = 600.0
+    blob_collect_batch_size: int = 100
+
+
+class PasswordSettings(BaseModel):
+    workers: int = 4
+    queue_timeout: float = 5.0
 
 
 class Settings(BaseSettings):
@@ -25,6 +95,15 @@ class Settings(BaseSettings):
 
     db: DBSettings
     token: TokenSettings
+    logs: LogSettings = LogSettings()
+    password: PasswordSettings = PasswordSettings()
+    playlist: PlaylistSettings = PlaylistSettings()
+    schedules: ScheduleSettings = ScheduleSettings()
+    push: PushSettings = PushSettings()
+    events: EventSettings = EventSettings()
+    heartbeat: HeartbeatSettings = HeartbeatSettings()
+    plays: PlaySettings = PlaySettings()
+    media: MediaSettings = MediaSettings()
 
     debug: bool
     base_dir: Path = Path(__file__).resolve().parent.parent
@@ -1,15 +1,80 @@
+import asyncio
 from contextlib import asynccontextmanager
 
 import uvicorn
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 
+from .config import settings
+from .metrics import registry
 from .middleware import LogRequestResponseMiddleware
 import apps
+from apps.auth.purge import run_token_purger
+from apps.auth.revocation import load_revoked_tokens, sync_revoked_tokens
+from apps.common.events import event_bus
+from apps.common.evictors import register_evictors
+from apps.display_devices.heartbeat import heartbeat_tracker
+from apps.logs.writer import log_writer
+from apps.media.collector import run_blob_collector
+from apps.media.uploads import run_upload_cleaner
+from apps.plays.aggregator import run_play_aggregator
+from apps.schedules.timeline import (
+    load_schedule_timeline,
+    sync_schedule_timeline,
+)
+
+register_evictors(event_bus)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    log_writer.start()
+    if settings.events.enabled:
+        await event_bus.start()
+    await load_schedule_timeline()
+    await heartbeat_tracker.load()
+    heartbeat_tracker.start()
+    tasks = [
+        asyncio.create_task(
+            run_token_purger(
+                settings.token.purge_interval,
+                settings.token.purge_batch_size,
+            )
+        ),
+        asyncio.create_task(
+            sync_schedule_timeline(settings.schedules.timeline_refresh)
+        ),
+        asyncio.create_task(
+            run_upload_cleaner(settings.media.upload_cleanup_interval)
+        ),
+        asyncio.create_task(
+            run_blob_collector(
+                settings.media.blob_collect_interval,
+                settings.media.blob_collect_batch_size,
+            )
+        ),
+        asyncio.create_task(
+            run_play_aggregator(
+                settings.plays.aggregate_interval,
+                settings.plays.aggregate_batch_size,
+                settings.plays.aggregate_max_batches,
+            )
+        ),
+    ]
+    if settings.token.stateless_device_auth:
+        await load_revoked_tokens()
+        tasks.append(
+            asyncio.create_task(
+                sync_revoked_tokens(settings.token.revocation_refresh)
+            )
+        )
     yield
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    await heartbeat_tracker.stop()
+    await event_bus.stop()
+    await log_writer.stop()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -19,5 +84,12 @@ app.add_middleware(LogRequestResponseMiddleware)
 app.include_router(apps.core_router)
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(
+        registry.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
 if __name__ == "__main__":
     uvicorn.run("main:app", host="127.0.0.1", port=8000, reload=True)
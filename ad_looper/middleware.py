@@ -1,37 +1,84 @@
-from starlette.middleware.base import BaseHTTPMiddleware
+from time import perf_counter
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from ad_looper.metrics import Gauge, Histogram
 from apps.auth.utils import decode_access_token
-from apps.common.dependencies import get_db
-from apps.logs import crud as logs_crud
+from apps.logs.writer import log_writer
+
+http_requests_in_flight = Gauge(
+    "http_requests_in_flight",
+    "Requests currently being handled",
+)
+http_request_duration_seconds = Histogram(
+    "http_request_duration_seconds",
+    "Time spent handling a request, including sending the response body",
+    ["method", "route"],
+)
+
+
+def get_bearer_token(scope: Scope) -> str | None:
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            value = value.decode("latin-1")
+            if value.startswith("Bearer "):
+                return value.removeprefix("Bearer ")
+            return None
+    return None
 
 
-from fastapi import Request, Response
+def get_display_device_id(scope: Scope) -> int | None:
+    token = get_bearer_token(scope)
+    if token is None:
+        return None
 
+    try:
+        token_data = decode_access_token(token)
+    except Exception:
+        token_data = None
+    scope.setdefault("state", {})["token_data"] = token_data
+    return (token_data or {}).get("display_device_id")
 
-from typing import Awaitable, Callable
 
+class LogRequestResponseMiddleware:
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
 
-class LogRequestResponseMiddleware(BaseHTTPMiddleware):
-    async def dispatch(
-        self,
-        request: Request,
-        call_next: Callable[[Request], Awaitable[Response]],
-    ):
-        response = await call_next(request)
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
 
+        display_device_id = get_display_device_id(scope)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        start = perf_counter()
+        http_requests_in_flight.inc()
         try:
-            data = decode_access_token(
-                request.headers["Authorization"].removeprefix("Bearer ")
-            )
-            display_device_id = data["display_device_id"]
-            async for db in get_db():
-                await logs_crud.create_log(
-                    db,
-                    url=request.url.path,
-                    method=request.method,
-                    status_code=response.status_code,
+            if display_device_id is None:
+                await self.app(scope, receive, send)
+            else:
+                await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = perf_counter() - start
+            http_requests_in_flight.dec()
+
+            # Label by route template so ids in the path don't add series
+            route = scope.get("route")
+            http_request_duration_seconds.labels(
+                scope["method"], route.path if route else "unmatched"
+            ).observe(duration)
+
+            if display_device_id is not None:
+                log_writer.put(
+                    url=scope["path"],
+                    method=scope["method"],
+                    status_code=status_code,
                     device_id=display_device_id,
+                    duration_ms=duration * 1000,
                 )
-        except KeyError:
-            pass
-
-        return response
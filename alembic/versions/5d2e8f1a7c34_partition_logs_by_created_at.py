@@ -0,0 +1,107 @@
+"""partition_logs_by_created_at
+
+Revision ID: 5d2e8f1a7c34
+Revises: a9c4a618c48c
+Create Date: 2026-10-18 10:12:37.418204
+
+"""
+from datetime import datetime, timedelta
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5d2e8f1a7c34'
+down_revision: Union[str, None] = 'a9c4a618c48c'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+PARTITIONS_AHEAD = 4
+
+
+def upgrade() -> None:
+    op.rename_table('logs', 'logs_unpartitioned')
+    op.execute('ALTER INDEX ix_logs_id RENAME TO ix_logs_unpartitioned_id')
+    op.execute(
+        'ALTER TABLE logs_unpartitioned '
+        'RENAME CONSTRAINT logs_pkey TO logs_unpartitioned_pkey'
+    )
+    op.execute(
+        """
+        CREATE TABLE logs (
+            id INTEGER NOT NULL DEFAULT nextval('logs_id_seq'),
+            url VARCHAR NOT NULL,
+            method VARCHAR NOT NULL,
+            status_code INTEGER NOT NULL,
+            device_id INTEGER REFERENCES display_devices (id),
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            updated_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+        """
+    )
+    op.execute('ALTER SEQUENCE logs_id_seq OWNED BY logs.id')
+    op.create_index(
+        'ix_logs_device_id_created_at',
+        'logs',
+        ['device_id', 'created_at'],
+        unique=False,
+    )
+    op.execute('CREATE TABLE logs_default PARTITION OF logs DEFAULT')
+
+    # Weekly partitions from the oldest existing row up to a few weeks ahead
+    oldest = op.get_bind().execute(
+        sa.text('SELECT min(created_at) FROM logs_unpartitioned')
+    ).scalar()
+    today = datetime.utcnow().date()
+    start = oldest.date() if oldest else today
+    start -= timedelta(days=start.weekday())
+    end = today + timedelta(weeks=PARTITIONS_AHEAD)
+    while start <= end:
+        op.execute(
+            f"CREATE TABLE logs_p{start:%Y%m%d} PARTITION OF logs "
+            f"FOR VALUES FROM ('{start}') TO ('{start + timedelta(days=7)}')"
+        )
+        start += timedelta(days=7)
+
+    op.execute(
+        'INSERT INTO logs '
+        '(id, url, method, status_code, device_id, created_at, updated_at) '
+        'SELECT id, url, method, status_code, device_id, created_at, '
+        'updated_at FROM logs_unpartitioned'
+    )
+    op.drop_table('logs_unpartitioned')
+
+
+def downgrade() -> None:
+    op.rename_table('logs', 'logs_partitioned')
+    op.execute(
+        'ALTER INDEX ix_logs_device_id_created_at '
+        'RENAME TO ix_logs_partitioned_device_id_created_at'
+    )
+    op.execute(
+        'ALTER TABLE logs_partitioned '
+        'RENAME CONSTRAINT logs_pkey TO logs_partitioned_pkey'
+    )
+    op.create_table('logs',
+    sa.Column('url', sa.String(), nullable=False),
+    sa.Column('method', sa.String(), nullable=False),
+    sa.Column('status_code', sa.Integer(), nullable=False),
+    sa.Column('device_id', sa.Integer(), nullable=True),
+    sa.Column('id', sa.Integer(), server_default=sa.text("nextval('logs_id_seq')"), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['device_id'], ['display_devices.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_logs_id'), 'logs', ['id'], unique=False)
+    op.execute('ALTER SEQUENCE logs_id_seq OWNED BY logs.id')
+    op.execute(
+        'INSERT INTO logs '
+        '(id, url, method, status_code, device_id, created_at, updated_at) '
+        'SELECT id, url, method, status_code, device_id, created_at, '
+        'updated_at FROM logs_partitioned'
+    )
+    op.drop_table('logs_partitioned')
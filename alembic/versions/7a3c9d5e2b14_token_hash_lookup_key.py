@@ -0,0 +1,38 @@
+"""token_hash_lookup_key
+
+Revision ID: 7a3c9d5e2b14
+Revises: e4a97b3c1f08
+Create Date: 2026-10-18 13:27:44.081953
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7a3c9d5e2b14'
+down_revision: Union[str, None] = 'e4a97b3c1f08'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('tokens', 'display_device_tokens')
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(table, sa.Column('token_hash', sa.LargeBinary(length=32), nullable=True))
+        op.execute(
+            f"UPDATE {table} SET token_hash = sha256(convert_to(token, 'UTF8'))"
+        )
+        op.alter_column(table, 'token_hash', nullable=False)
+        op.create_unique_constraint(f'{table}_token_hash_key', table, ['token_hash'])
+        op.drop_constraint(f'{table}_token_key', table, type_='unique')
+
+
+def downgrade() -> None:
+    for table in TABLES:
+        op.create_unique_constraint(f'{table}_token_key', table, ['token'])
+        op.drop_constraint(f'{table}_token_hash_key', table, type_='unique')
+        op.drop_column(table, 'token_hash')
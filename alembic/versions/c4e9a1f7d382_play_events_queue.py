@@ -0,0 +1,48 @@
+"""play_events_queue
+
+Revision ID: c4e9a1f7d382
+Revises: b3f8d2a6c715
+Create Date: 2026-10-19 11:37:15.204683
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e9a1f7d382'
+down_revision: Union[str, None] = 'b3f8d2a6c715'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+FOREIGN_KEYS = [
+    ('play_events', 'device_id', 'display_devices'),
+    ('play_events', 'media_id', 'media'),
+    ('play_rollups', 'device_id', 'display_devices'),
+    ('play_rollups', 'media_id', 'media'),
+]
+
+
+def upgrade() -> None:
+    # Events already in the rollups are deleted; from now on the aggregator
+    # deletes them as it rolls them up
+    op.execute('DELETE FROM play_events WHERE aggregated')
+    op.drop_index('ix_play_events_pending', table_name='play_events', postgresql_where=sa.text('NOT aggregated'))
+    op.drop_column('play_events', 'aggregated')
+    for table, column, referred in FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(
+            name, table, referred, [column], ['id'], ondelete='CASCADE'
+        )
+
+
+def downgrade() -> None:
+    for table, column, referred in FOREIGN_KEYS:
+        name = f'{table}_{column}_fkey'
+        op.drop_constraint(name, table, type_='foreignkey')
+        op.create_foreign_key(name, table, referred, [column], ['id'])
+    op.add_column('play_events', sa.Column('aggregated', sa.Boolean(), server_default=sa.text('false'), nullable=False))
+    op.create_index('ix_play_events_pending', 'play_events', ['id'], unique=False, postgresql_where=sa.text('NOT aggregated'))
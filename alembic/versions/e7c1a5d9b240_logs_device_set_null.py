@@ -0,0 +1,38 @@
+"""logs_device_set_null
+
+Revision ID: e7c1a5d9b240
+Revises: d6b2f8a4e513
+Create Date: 2026-10-19 09:14:26.301845
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7c1a5d9b240'
+down_revision: Union[str, None] = 'd6b2f8a4e513'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Replaced on the partitioned parent, which carries it to every partition
+    op.drop_constraint('logs_device_id_fkey', 'logs', type_='foreignkey')
+    op.create_foreign_key(
+        'logs_device_id_fkey',
+        'logs',
+        'display_devices',
+        ['device_id'],
+        ['id'],
+        ondelete='SET NULL',
+    )
+
+
+def downgrade() -> None:
+    op.drop_constraint('logs_device_id_fkey', 'logs', type_='foreignkey')
+    op.create_foreign_key(
+        'logs_device_id_fkey', 'logs', 'display_devices', ['device_id'], ['id']
+    )
@@ -1,6 +1,15 @@
 from fastapi import APIRouter
 
-from . import auth, display_devices, media, media_groups, schedules, users
+from . import (
+    auth,
+    display_devices,
+    logs,
+    media,
+    media_groups,
+    plays,
+    schedules,
+    users,
+)
 
 core_router = APIRouter()
 
@@ -11,3 +20,5 @@ core_router.include_router(media_groups.router)
 core_router.include_router(media.router)
 core_router.include_router(display_devices.router)
 core_router.include_router(schedules.router)
+core_router.include_router(logs.router)
+core_router.include_router(plays.router)
@@ -1,10 +1,15 @@
 from datetime import datetime
+from typing import Sequence
 
 from fastapi import HTTPException
-from sqlalchemy import exists, select
+from sqlalchemy import delete, exists, insert, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.models import DeviceToken, Token
+from apps.auth.utils import decode_token_claims
+from apps.common.events import EntityEvent, publish
+from apps.common.utils import hash_token
+from database.models import DeviceToken, DisplayDevice, RevokedToken, Token
 
 
 async def create_token(
@@ -16,6 +21,7 @@ async def create_token(
 ) -> Token:
     db_token = Token(
         token=token,
+        token_hash=hash_token(token),
         token_type=token_type,
         expires_at=expires_at,
         owner_id=owner_id,
@@ -26,6 +32,28 @@ async def create_token(
     return db_token
 
 
+async def create_tokens(
+    db: AsyncSession,
+    owner_id: int,
+    tokens: Sequence[tuple[str, str, datetime]],
+) -> None:
+    await db.execute(
+        insert(Token).values(
+            [
+                {
+                    "token": token,
+                    "token_hash": hash_token(token),
+                    "token_type": token_type,
+                    "expires_at": expires_at,
+                    "owner_id": owner_id,
+                }
+                for token, token_type, expires_at in tokens
+            ]
+        )
+    )
+    await db.commit()
+
+
 async def get_token(db: AsyncSession, **kwargs) -> Token:
     query = select(Token)
     for key, value in kwargs.items():
@@ -57,21 +85,88 @@ async def update_token(db: AsyncSession, token_id: int, **kwargs) -> Token:
     db_token = result.scalars().first()
     if db_token is None:
         raise HTTPException(status_code=404, detail="Token not found")
+    old_token = db_token.token
+    was_active = db_token.is_active
+    if "token" in kwargs:
+        kwargs["token_hash"] = hash_token(kwargs["token"])
     for key, value in kwargs.items():
         if hasattr(db_token, key):
             setattr(db_token, key, value)
         else:
             raise HTTPException(status_code=400, detail="Invalid attribute")
+    revoked = {}
+    if is_retired(old_token, was_active, db_token):
+        revoked = await revoke_token(db, old_token)
     db.add(db_token)
     await db.commit()
+    await publish(
+        EntityEvent(
+            "token", hash_token(old_token).hex(), db_token.owner_id, revoked
+        )
+    )
     await db.refresh(db_token)
     return db_token
 
 
+async def exchange_refresh_token(
+    db: AsyncSession,
+    token_hash: bytes,
+    token: str,
+    expires_at: datetime,
+    now: datetime,
+) -> int | None:
+    query = (
+        update(Token)
+        .where(
+            Token.token_hash == token_hash,
+            Token.token_type == "refresh",
+            Token.is_active.is_(True),
+            Token.expires_at > now,
+        )
+        .values(
+            token=token,
+            token_hash=hash_token(token),
+            token_type="access",
+            expires_at=expires_at,
+        )
+        .returning(Token.id)
+    )
+    result = await db.execute(query)
+    token_id = result.scalar()
+    await db.commit()
+    return token_id
+
+
+async def refresh_failure_reason(
+    db: AsyncSession, token_hash: bytes, now: datetime
+) -> str:
+    query = select(Token.token_type, Token.is_active, Token.expires_at).filter(
+        Token.token_hash == token_hash
+    )
+    result = await db.execute(query)
+    row = result.first()
+    if row is None or not row.is_active:
+        return "Invalid token"
+    if row.token_type != "refresh":
+        return "Refresh token required"
+    if row.expires_at <= now:
+        return "Token expired"
+    return "Invalid token"
+
+
 async def delete_token(db: AsyncSession, token_id: int) -> None:
     db_token = await get_token(db, id=token_id)
     await db.delete(db_token)
+    revoked = await revoke_token(db, db_token.token)
     await db.commit()
+    await publish(
+        EntityEvent(
+            "token",
+            db_token.token_hash.hex(),
+            db_token.owner_id,
+            revoked,
+        )
+    )
 
 
 async def create_device_token(
@@ -84,6 +179,7 @@ async def create_device_token(
 ) -> DeviceToken:
     db_device_token = DeviceToken(
         token=token,
+        token_hash=hash_token(token),
         expires_at=expires_at,
         display_device_id=display_device_id,
         token_type=token_type,
@@ -95,6 +191,48 @@ async def create_device_token(
     return db_device_token
 
 
+async def create_device_tokens(
+    db: AsyncSession,
+    owner_id: int,
+    tokens: Sequence[tuple[str, datetime, int]],
+    token_type: str = "access_display_device",
+) -> None:
+    await db.execute(
+        insert(DeviceToken).values(
+            [
+                {
+                    "token": token,
+                    "token_hash": hash_token(token),
+                    "token_type": token_type,
+                    "expires_at": expires_at,
+                    "display_device_id": display_device_id,
+                    "owner_id": owner_id,
+                }
+                for token, expires_at, display_device_id in tokens
+            ]
+        )
+    )
+    await db.commit()
+
+
+async def get_registration_status(
+    db: AsyncSession, display_device_ids: Sequence[int]
+) -> dict[int, tuple[int, bool]]:
+    registered = (
+        exists()
+        .where(DeviceToken.display_device_id == DisplayDevice.id)
+        .label("registered")
+    )
+    query = select(DisplayDevice.id, DisplayDevice.owner_id, registered).filter(
+        DisplayDevice.id.in_(display_device_ids)
+    )
+    result = await db.execute(query)
+    return {
+        device_id: (owner_id, is_registered)
+        for device_id, owner_id, is_registered in result.tuples()
+    }
+
+
 async def device_token_exists(
     async_session: AsyncSession, display_device_id: int
 ) -> bool:
@@ -138,13 +276,31 @@ async def update_device_token(
     db_device_token = result.scalars().first()
     if db_device_token is None:
         raise HTTPException(status_code=404, detail="DeviceToken not found")
+    old_token = db_device_token.token
+    was_active = db_device_token.is_active
+    if "token" in kwargs:
+        kwargs["token_hash"] = hash_token(kwargs["token"])
     for key, value in kwargs.items():
         if hasattr(db_device_token, key):
             setattr(db_device_token, key, value)
         else:
             raise HTTPException(status_code=400, detail="Invalid attribute")
+    data = {}
+    if is_retired(old_token, was_active, db_device_token):
+        data = {
+            **await revoke_token(db, old_token),
+            "display_device_id": db_device_token.display_device_id,
+        }
     db.add(db_device_token)
     await db.commit()
+    await publish(
+        EntityEvent(
+            "token",
+            hash_token(old_token).hex(),
+            db_device_token.owner_id,
+            data,
+        )
+    )
     await db.refresh(db_device_token)
     return db_device_token
 
@@ -152,4 +308,152 @@ async def update_device_token(
 async def delete_device_token(db: AsyncSession, device_token_id: int) -> None:
     db_device_token = await get_device_token(db, id=device_token_id)
     await db.delete(db_device_token)
+    revoked = await revoke_token(db, db_device_token.token)
     await db.commit()
+    await publish(
+        EntityEvent(
+            "token",
+            db_device_token.token_hash.hex(),
+            db_device_token.owner_id,
+            {
+                **revoked,
+                "display_device_id": db_device_token.display_device_id,
+            },
+        )
+    )
+
+
+async def get_owner_device_tokens(
+    db: AsyncSession, owner_id: int
+) -> Sequence[str]:
+    result = await db.execute(
+        select(DeviceToken.token).filter(DeviceToken.owner_id == owner_id)
+    )
+    return result.scalars().all()
+
+
+async def delete_display_device_tokens(
+    db: AsyncSession, display_device_id: int
+) -> list[tuple[str, bytes]]:
+    result = await db.execute(
+        delete(DeviceToken)
+        .where(DeviceToken.display_device_id == display_device_id)
+        .returning(DeviceToken.token, DeviceToken.token_hash)
+    )
+    return result.tuples().all()
+
+
+# A deactivated or replaced token has to stop working in stateless mode too
+def is_retired(
+    old_token: str, was_active: bool, db_token: Token | DeviceToken
+) -> bool:
+    return db_token.token != old_token or (
+        was_active and not db_token.is_active
+    )
+
+
+def _revocation(token: str) -> tuple[str, datetime] | None:
+    claims = decode_token_claims(token)
+    if claims is None or "jti" not in claims:
+        return None
+    return claims["jti"], datetime.utcfromtimestamp(claims["exp"])
+
+
+# Returns the event data that puts the token on every worker's
+# revocation list once the transaction is committed
+async def revoke_token(db: AsyncSession, token: str) -> dict:
+    revocation = _revocation(token)
+    if revocation is None:
+        return {}
+    jti, expires_at = revocation
+    await db.merge(RevokedToken(jti=jti, expires_at=expires_at))
+    return {"jti": jti, "expires_at": expires_at.isoformat()}
+
+
+async def revoke_tokens(
+    db: AsyncSession, tokens: Sequence[str]
+) -> list[tuple[str, datetime]]:
+    revocations = [
+        revocation
+        for revocation in map(_revocation, tokens)
+        if revocation is not None
+    ]
+    if revocations:
+        await db.execute(
+            pg_insert(RevokedToken)
+            .values(
+                [
+                    {"jti": jti, "expires_at": expires_at}
+                    for jti, expires_at in revocations
+                ]
+            )
+            .on_conflict_do_nothing()
+        )
+    return revocations
+
+
+# NOTIFY payloads are capped at 8000 bytes
+REVOKED_TOKENS_CHUNK = 50
+
+
+async def publish_revoked_tokens(
+    owner_id: int, revocations: Sequence[tuple[str, datetime]]
+) -> None:
+    for start in range(0, len(revocations), REVOKED_TOKENS_CHUNK):
+        await publish(
+            EntityEvent(
+                "revoked_tokens",
+                None,
+                owner_id,
+                {
+                    "tokens": [
+                        [jti, expires_at.isoformat()]
+                        for jti, expires_at in revocations[
+                            start : start + REVOKED_TOKENS_CHUNK
+                        ]
+                    ]
+                },
+            )
+        )
+
+
+async def get_revoked_tokens(
+    db: AsyncSession, now: datetime
+) -> Sequence[tuple[str, datetime]]:
+    query = select(RevokedToken.jti, RevokedToken.expires_at).filter(
+        RevokedToken.expires_at > now
+    )
+    result = await db.execute(query)
+    return result.tuples().all()
+
+
+async def purge_tokens(
+    db: AsyncSession,
+    model: type[Token] | type[DeviceToken] | type[RevokedToken],
+    condition,
+    batch_size: int,
+    revoke: bool = False,
+) -> int:
+    # Small batches keep each transaction and its row locks short
+    key = model.jti if model is RevokedToken else model.id
+    batch = (
+        select(key)
+        .filter(condition)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    purged = 0
+    while True:
+        query = delete(model).where(key.in_(batch))
+        if revoke:
+            # Unexpired JWTs outlive their row; keep them revoked
+            result = await db.execute(query.returning(model.token))
+            tokens = result.scalars().all()
+            await revoke_tokens(db, tokens)
+            count = len(tokens)
+        else:
+            count = (await db.execute(query)).rowcount
+        await db.commit()
+        purged += count
+        if count < batch_size:
+            return purged
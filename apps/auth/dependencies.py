@@ -16,7 +16,7 @@ async def authenticate_user(
     result = await db.execute(query)
     user = result.scalars().first()
 
-    if user and verify_password(
+    if user and await verify_password(
         token_data.password.get_secret_value(),
         user.password,
     ):
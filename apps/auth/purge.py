@@ -0,0 +1,51 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from ad_looper.metrics import Counter
+from database.models import AsyncSessionLocal, DeviceToken, RevokedToken, Token
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+tokens_purged_total = Counter(
+    "tokens_purged_total",
+    "Expired or inactive tokens deleted by the purger",
+    ["table"],
+)
+
+
+async def purge_expired_tokens(batch_size: int) -> dict[str, int]:
+    now = datetime.utcnow()
+    # Inactive tokens may not have expired yet, so they are revoked as they
+    # are deleted
+    targets = [
+        (Token, Token.expires_at < now, False),
+        (Token, Token.is_active.is_(False), True),
+        (DeviceToken, DeviceToken.expires_at < now, False),
+        (DeviceToken, DeviceToken.is_active.is_(False), True),
+        (RevokedToken, RevokedToken.expires_at < now, False),
+    ]
+    purged = dict.fromkeys(
+        (model.__tablename__ for model, _, _ in targets), 0
+    )
+    async with AsyncSessionLocal() as db:
+        for model, condition, revoke in targets:
+            purged[model.__tablename__] += await crud.purge_tokens(
+                db, model, condition, batch_size, revoke=revoke
+            )
+
+    for table, count in purged.items():
+        tokens_purged_total.labels(table).inc(count)
+    return purged
+
+
+async def run_token_purger(interval: float, batch_size: int) -> None:
+    while True:
+        try:
+            purged = await purge_expired_tokens(batch_size)
+            logger.info("Purged tokens: %s", purged)
+        except Exception:
+            logger.exception("Failed to purge expired tokens")
+        await asyncio.sleep(interval)
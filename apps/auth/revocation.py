@@ -0,0 +1,27 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from apps.common.revocation import revoked_tokens
+from database.models import AsyncSessionLocal
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+
+async def load_revoked_tokens() -> None:
+    now = datetime.utcnow()
+    async with AsyncSessionLocal() as db:
+        revoked_tokens.update(await crud.get_revoked_tokens(db, now))
+    revoked_tokens.prune(now)
+
+
+# Picks up tokens revoked by other workers
+async def sync_revoked_tokens(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await load_revoked_tokens()
+        except Exception:
+            logger.exception("Failed to reload revoked tokens")
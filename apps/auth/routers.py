@@ -1,15 +1,24 @@
-from datetime import datetime, timedelta
-
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from apps.auth.dependencies import authenticate_user
-from apps.auth.schemas import AccessTokenResponse, TokenRefresh, TokenResponse
-from apps.auth.utils import create_jwt_token
-from apps.common.dependencies import get_db, get_request_user
+from apps.auth.schemas import (
+    AccessTokenResponse,
+    DeviceTokenBulkCreate,
+    TokenRefresh,
+    TokenResponse,
+)
+from apps.common.dependencies import (
+    get_db,
+    get_request_user,
+    get_valid_token,
+)
+from apps.common.schemas import TokenInfo
+from apps.common.utils import iter_ndjson_models
 from database.models import User
 
-from . import crud
+from . import crud, services
 from apps.display_devices import crud as display_device_crud
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
@@ -20,27 +29,7 @@ async def login(
     user: User = Depends(authenticate_user),
     db: AsyncSession = Depends(get_db),
 ) -> AccessTokenResponse:
-    access_token = create_jwt_token(
-        data={"sub": user.username},
-    )
-    refresh_token = create_jwt_token(
-        data={"sub": user.username},
-        expires_delta=timedelta(days=10),
-    )
-    await crud.create_token(
-        db,
-        token=access_token,
-        token_type="access",
-        expires_at=datetime.utcnow() + timedelta(minutes=30),
-        owner_id=user.id,
-    )
-    await crud.create_token(
-        db,
-        token=refresh_token,
-        token_type="refresh",
-        expires_at=datetime.utcnow() + timedelta(days=10),
-        owner_id=user.id,
-    )
+    access_token, refresh_token = await services.issue_login_tokens(db, user)
     return AccessTokenResponse(
         access_token=access_token, refresh_token=refresh_token
     )
@@ -51,50 +40,53 @@ async def refresh(
     token_data: TokenRefresh,
     db: AsyncSession = Depends(get_db),
 ) -> TokenResponse:
-    token = await crud.get_token(db, token=token_data.token)
-    if not token:
-        raise HTTPException(status_code=401, detail="Invalid token")
-
-    if token.token_type != "refresh":
-        raise HTTPException(status_code=401, detail="Refresh token required")
-
-    if token.expires_at < datetime.utcnow():
-        raise HTTPException(status_code=401, detail="Token expired")
-
-    access_token = create_jwt_token(
-        data={"sub": (await token.awaitable_attrs.owner).username},
-    )
-    await crud.update_token(
-        db,
-        token_id=token.id,
-        token=access_token,
-        token_type="access",
-        expires_at=datetime.utcnow() + timedelta(minutes=30),
-    )
+    access_token = await services.refresh_access_token(db, token_data.token)
     return TokenResponse(token=access_token, token_type="access")
 
 
 @router.delete("/logout")
 async def delete_existing_access_token(
-    user: User = Depends(get_request_user),
+    token: TokenInfo = Depends(get_valid_token),
     db: AsyncSession = Depends(get_db),
 ):
-    token = await crud.get_token(db, owner_id=user.id, token_type="access")
+    if token.token_type != "access":
+        raise HTTPException(status_code=400, detail="User token required")
     return await crud.delete_token(db, token_id=token.id)
 
 
+@router.post(
+    "/display_devices/register",
+    description=(
+        "Mints tokens for many devices in one transaction. Streams one "
+        "NDJSON line per requested id, with an HTTP-style `status` and "
+        "either the `token` or an error `detail`"
+    ),
+)
+async def register_display_devices(
+    data: DeviceTokenBulkCreate,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+):
+    results = await services.register_display_devices(
+        db, user, data.display_device_ids
+    )
+    return StreamingResponse(
+        iter_ndjson_models(results), media_type="application/x-ndjson"
+    )
+
+
 @router.post("/display_devices/{display_device_id}/register")
 async def register_display_device(
     display_device_id: int,
     user: User = Depends(get_request_user),
     db: AsyncSession = Depends(get_db),
 ):
-    token = create_jwt_token(
-        data={"sub": user.username, "display_device_id": display_device_id},
-    )
+    token, expires_at = services.mint_device_token(user, display_device_id)
     device = await display_device_crud.get_display_device(
         db, id=display_device_id
     )
+    if user != device.owner:
+        raise HTTPException(status_code=403, detail="Forbidden")
     if await crud.device_token_exists(db, display_device_id=display_device_id):
         raise HTTPException(
             status_code=409, detail="Device already registered"
@@ -103,7 +95,7 @@ async def register_display_device(
         db,
         token=token,
         token_type="access_display_device",
-        expires_at=datetime.utcnow() + timedelta(days=365),
+        expires_at=expires_at,
         display_device_id=device.id,
         owner_id=user.id,
     )
@@ -113,8 +105,14 @@ async def register_display_device(
 @router.delete("/display_devices/{display_device_id}/unlink")
 async def unlink_display_device(
     display_device_id: int,
+    user: User = Depends(get_request_user),
     db: AsyncSession = Depends(get_db),
 ):
+    device_token = await crud.get_device_token(
+        db, display_device_id=display_device_id
+    )
+    if device_token.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
     return await crud.delete_device_token(
-        db, device_token_id=display_device_id
+        db, device_token_id=device_token.id
     )
@@ -1,4 +1,4 @@
-from pydantic import BaseModel, SecretStr
+from pydantic import BaseModel, Field, SecretStr
 
 
 class TokenCreate(BaseModel):
@@ -21,3 +21,15 @@ class DeviceTokenCreate(BaseModel): ...
 
 class TokenRefresh(BaseModel):
     token: str
+
+
+class DeviceTokenBulkCreate(BaseModel):
+    display_device_ids: list[int] = Field(min_length=1, max_length=5000)
+
+
+class DeviceTokenBulkResult(BaseModel):
+    index: int
+    display_device_id: int
+    status: int
+    token: str | None = None
+    detail: str | None = None
@@ -0,0 +1,136 @@
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ad_looper.config import settings
+from apps.auth.utils import create_jwt_token, decode_token_claims
+from apps.common.events import EntityEvent, publish
+from apps.common.utils import hash_token
+from database.models import User
+
+from . import crud
+from .schemas import DeviceTokenBulkResult
+
+DEVICE_TOKEN_LIFETIME = timedelta(days=365)
+
+
+async def issue_login_tokens(db: AsyncSession, user: User) -> tuple[str, str]:
+    now = datetime.utcnow()
+    access_delta = timedelta(minutes=settings.token.access_token_expire_minutes)
+    refresh_delta = timedelta(days=settings.token.refresh_token_expire_days)
+    access_token = create_jwt_token(
+        data={"sub": user.username}, expires_delta=access_delta
+    )
+    refresh_token = create_jwt_token(
+        data={"sub": user.username}, expires_delta=refresh_delta
+    )
+    await crud.create_tokens(
+        db,
+        owner_id=user.id,
+        tokens=[
+            (access_token, "access", now + access_delta),
+            (refresh_token, "refresh", now + refresh_delta),
+        ],
+    )
+    return access_token, refresh_token
+
+
+async def refresh_access_token(db: AsyncSession, refresh_token: str) -> str:
+    # The username comes from the refresh token itself, so the owner row
+    # is never loaded; the database still decides whether it is usable
+    claims = decode_token_claims(refresh_token)
+    if claims is None or "sub" not in claims:
+        raise HTTPException(status_code=401, detail="Invalid token")
+
+    access_delta = timedelta(minutes=settings.token.access_token_expire_minutes)
+    access_token = create_jwt_token(
+        data={"sub": claims["sub"]}, expires_delta=access_delta
+    )
+    token_hash = hash_token(refresh_token)
+    now = datetime.utcnow()
+    token_id = await crud.exchange_refresh_token(
+        db,
+        token_hash=token_hash,
+        token=access_token,
+        expires_at=now + access_delta,
+        now=now,
+    )
+    if token_id is None:
+        raise HTTPException(
+            status_code=401,
+            detail=await crud.refresh_failure_reason(db, token_hash, now),
+        )
+    await publish(EntityEvent("token", token_hash.hex()))
+    return access_token
+
+
+def mint_device_token(
+    user: User, display_device_id: int
+) -> tuple[str, datetime]:
+    token = create_jwt_token(
+        data={
+            "sub": user.username,
+            "owner_id": user.id,
+            "display_device_id": display_device_id,
+        },
+        expires_delta=DEVICE_TOKEN_LIFETIME,
+    )
+    return token, datetime.utcnow() + DEVICE_TOKEN_LIFETIME
+
+
+async def register_display_devices(
+    db: AsyncSession, user: User, display_device_ids: list[int]
+) -> list[DeviceTokenBulkResult]:
+    status = await crud.get_registration_status(db, display_device_ids)
+    results = []
+    tokens = []
+    for index, device_id in enumerate(display_device_ids):
+        if device_id not in status:
+            results.append(
+                DeviceTokenBulkResult(
+                    index=index,
+                    display_device_id=device_id,
+                    status=404,
+                    detail="Display device not found",
+                )
+            )
+            continue
+        owner_id, registered = status[device_id]
+        if owner_id != user.id:
+            results.append(
+                DeviceTokenBulkResult(
+                    index=index,
+                    display_device_id=device_id,
+                    status=403,
+                    detail="Forbidden",
+                )
+            )
+            continue
+        if registered:
+            results.append(
+                DeviceTokenBulkResult(
+                    index=index,
+                    display_device_id=device_id,
+                    status=409,
+                    detail="Device already registered",
+                )
+            )
+            continue
+
+        # A repeated id in the same request gets one token, not two
+        status[device_id] = (owner_id, True)
+        token, expires_at = mint_device_token(user, device_id)
+        tokens.append((token, expires_at, device_id))
+        results.append(
+            DeviceTokenBulkResult(
+                index=index,
+                display_device_id=device_id,
+                status=201,
+                token=token,
+            )
+        )
+
+    if tokens:
+        await crud.create_device_tokens(db, owner_id=user.id, tokens=tokens)
+    return results
@@ -1,6 +1,10 @@
+import asyncio
+import uuid
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 
 import jwt
+from fastapi import HTTPException
 from passlib.context import CryptContext
 
 from ad_looper.config import settings
@@ -17,7 +21,7 @@ def create_jwt_token(
         expire = datetime.utcnow() + timedelta(
             minutes=settings.token.access_token_expire_minutes
         )
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(
         to_encode,
         settings.token.secret_key,
@@ -40,12 +44,54 @@ def decode_access_token(token: str) -> dict:
         raise Exception("Decoded invalid token")
 
 
+def decode_token_claims(token: str) -> dict | None:
+    # Signature is still checked, only an expired token is accepted
+    try:
+        return jwt.decode(
+            token,
+            settings.token.secret_key,
+            algorithms=[settings.token.algorithm],
+            options={"verify_exp": False},
+        )
+    except jwt.InvalidTokenError:
+        return None
+
+
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
+# bcrypt blocks for 100+ ms, so it runs on its own threads instead of the
+# event loop, with at most `workers` hashes in flight at a time
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.password.workers,
+    thread_name_prefix="password",
+)
+password_slots = asyncio.Semaphore(settings.password.workers)
+
 
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+async def run_password_task(func, *args):
+    try:
+        await asyncio.wait_for(
+            password_slots.acquire(), settings.password.queue_timeout
+        )
+    except TimeoutError:
+        raise HTTPException(
+            status_code=503,
+            detail="Too many concurrent password checks",
+            headers={"Retry-After": "1"},
+        )
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            password_executor, func, *args
+        )
+    finally:
+        password_slots.release()
+
+
+async def verify_password(plain_password: str, hashed_password: str) -> bool:
+    return await run_password_task(
+        pwd_context.verify, plain_password, hashed_password
+    )
 
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await run_password_task(pwd_context.hash, password)
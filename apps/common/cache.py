@@ -0,0 +1,167 @@
+from collections import OrderedDict
+from time import monotonic
+from typing import Callable, Generic, Hashable, NamedTuple, TypeVar
+
+from ad_looper.config import settings
+from ad_looper.metrics import Counter, Gauge
+from apps.common.schemas import TokenInfo
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+class TTLCache(Generic[K, V]):
+    def __init__(
+        self,
+        maxsize: int,
+        ttl: float,
+        on_evict: Callable[[K, V], None] | None = None,
+    ) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # Called for every entry that leaves the cache, however it leaves
+        self.on_evict = on_evict
+        self._entries: OrderedDict[K, tuple[float, V]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _evicted(self, key: K, value: V) -> None:
+        if self.on_evict is not None:
+            self.on_evict(key, value)
+
+    def get(self, key: K) -> V | None:
+        entry = self._entries.get(key)
+        if entry is None or monotonic() - entry[0] > self.ttl:
+            if entry is not None:
+                del self._entries[key]
+                self._evicted(key, entry[1])
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, key: K, value: V) -> None:
+        previous = self._entries.get(key)
+        self._entries[key] = (monotonic(), value)
+        self._entries.move_to_end(key)
+        if previous is not None:
+            self._evicted(key, previous[1])
+        if len(self._entries) > self.maxsize:
+            evicted_key, (_, evicted) = self._entries.popitem(last=False)
+            self._evicted(evicted_key, evicted)
+
+    def invalidate(self, key: K) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._evicted(key, entry[1])
+
+    def clear(self) -> None:
+        entries = self._entries
+        self._entries = OrderedDict()
+        for key, (_, value) in entries.items():
+            self._evicted(key, value)
+
+
+# Keyed by the token's SHA-256, so events about it never carry the token
+class TokenCache(TTLCache[bytes, TokenInfo]):
+    def invalidate_owner(self, owner_id: int) -> None:
+        for key, (_, token_info) in list(self._entries.items()):
+            if token_info.owner_id == owner_id:
+                del self._entries[key]
+
+
+token_cache = TokenCache(
+    maxsize=settings.token.cache_size,
+    ttl=settings.token.cache_ttl,
+)
+
+Counter(
+    "token_cache_hits_total",
+    "Bearer tokens validated from the in-process cache",
+    function=lambda: token_cache.hits,
+)
+Counter(
+    "token_cache_misses_total",
+    "Bearer tokens that had to be looked up in the database",
+    function=lambda: token_cache.misses,
+)
+Gauge(
+    "token_cache_size",
+    "Validated tokens held in the in-process cache",
+    function=lambda: len(token_cache),
+)
+
+
+class DeviceTarget(NamedTuple):
+    owner_id: int
+    media_group_id: int | None
+
+
+class CompiledPlaylist(NamedTuple):
+    body: bytes
+    etag: str
+    media_ids: frozenset[int]
+
+
+class PlaylistCache:
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.devices: TTLCache[int, DeviceTarget] = TTLCache(maxsize, ttl)
+        self.playlists: TTLCache[int, CompiledPlaylist] = TTLCache(
+            maxsize, ttl, on_evict=self._forget_playlist
+        )
+        # Media id to the groups whose cached playlist lists it. Only holds
+        # playlists that are still cached
+        self._media_groups: dict[int, set[int]] = {}
+
+    def set_playlist(
+        self, media_group_id: int, playlist: CompiledPlaylist
+    ) -> None:
+        self.playlists.set(media_group_id, playlist)
+        for media_id in playlist.media_ids:
+            self._media_groups.setdefault(media_id, set()).add(media_group_id)
+
+    def _forget_playlist(
+        self, media_group_id: int, playlist: CompiledPlaylist
+    ) -> None:
+        for media_id in playlist.media_ids:
+            media_groups = self._media_groups.get(media_id)
+            if media_groups is None:
+                continue
+            media_groups.discard(media_group_id)
+            if not media_groups:
+                del self._media_groups[media_id]
+
+    def invalidate_device(self, device_id: int) -> None:
+        self.devices.invalidate(device_id)
+
+    def invalidate_media_group(self, media_group_id: int) -> None:
+        self.playlists.invalidate(media_group_id)
+
+    def invalidate_media(self, media_id: int) -> None:
+        for media_group_id in self._media_groups.pop(media_id, ()):
+            self.playlists.invalidate(media_group_id)
+
+    def clear(self) -> None:
+        self.devices.clear()
+        self.playlists.clear()
+
+
+playlist_cache = PlaylistCache(
+    maxsize=settings.playlist.cache_size,
+    ttl=settings.playlist.cache_ttl,
+)
+
+Counter(
+    "playlist_cache_hits_total",
+    "Playlists served from the in-process cache",
+    function=lambda: playlist_cache.playlists.hits,
+)
+Counter(
+    "playlist_cache_misses_total",
+    "Playlists that had to be compiled from the database",
+    function=lambda: playlist_cache.playlists.misses,
+)
@@ -1,10 +1,17 @@
 from datetime import datetime
 
-from fastapi import Depends, HTTPException
+from fastapi import Depends, HTTPException, Request
 from fastapi.security import HTTPAuthorizationCredentials, HTTPBearer
-from sqlalchemy import select
+from sqlalchemy import Integer, cast, null, select, union_all
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.requests import HTTPConnection
 
+from ad_looper.config import settings
+from apps.auth.utils import decode_access_token
+from apps.common.cache import token_cache
+from apps.common.revocation import revoked_tokens
+from apps.common.schemas import TokenInfo
+from apps.common.utils import hash_token
 from database.models import AsyncSessionLocal, DeviceToken, Token, User
 
 
@@ -19,21 +26,75 @@ async def get_db():
 BearerToken = HTTPBearer()
 
 
-async def get_valid_token(
-    raw_token: HTTPAuthorizationCredentials = Depends(BearerToken),
-    db: AsyncSession = Depends(get_db),
-) -> Token | DeviceToken:
-    query1 = select(Token).filter(Token.token == raw_token.credentials)
-    result1 = await db.execute(query1)
-    user_token = result1.scalars().first()
+async def get_token_info(
+    db: AsyncSession, token_hash: bytes
+) -> TokenInfo | None:
+    query = union_all(
+        select(
+            Token.id,
+            Token.owner_id,
+            Token.token_type,
+            Token.is_active,
+            Token.expires_at,
+            cast(null(), Integer).label("display_device_id"),
+        ).filter(Token.token_hash == token_hash),
+        select(
+            DeviceToken.id,
+            DeviceToken.owner_id,
+            DeviceToken.token_type,
+            DeviceToken.is_active,
+            DeviceToken.expires_at,
+            DeviceToken.display_device_id,
+        ).filter(DeviceToken.token_hash == token_hash),
+    )
+    result = await db.execute(query)
+    row = result.first()
+    if row is None:
+        return None
+    return TokenInfo.model_validate(row)
 
-    query2 = select(DeviceToken).filter(
-        DeviceToken.token == raw_token.credentials
+
+def get_stateless_token(
+    request: HTTPConnection, raw_token: str
+) -> TokenInfo | None:
+    # The logging middleware has usually decoded the token already
+    if hasattr(request.state, "token_data"):
+        claims = request.state.token_data
+    else:
+        try:
+            claims = decode_access_token(raw_token)
+        except Exception:
+            claims = None
+
+    if not claims or not {"jti", "owner_id", "display_device_id"} <= set(
+        claims
+    ):
+        return None
+    if claims["jti"] in revoked_tokens:
+        raise HTTPException(status_code=401, detail="Invalid or revoked token")
+    return TokenInfo(
+        owner_id=claims["owner_id"],
+        token_type="access_display_device",
+        is_active=True,
+        expires_at=datetime.utcfromtimestamp(claims["exp"]),
+        display_device_id=claims["display_device_id"],
     )
-    result2 = await db.execute(query2)
-    device_token = result2.scalars().first()
 
-    token = user_token or device_token
+
+async def validate_token(
+    connection: HTTPConnection, raw_token: str, db: AsyncSession
+) -> TokenInfo:
+    if settings.token.stateless_device_auth:
+        token = get_stateless_token(connection, raw_token)
+        if token is not None:
+            return token
+
+    token_hash = hash_token(raw_token)
+    token = token_cache.get(token_hash)
+    if token is None:
+        token = await get_token_info(db, token_hash)
+        if token is not None:
+            token_cache.set(token_hash, token)
 
     if not token or not token.is_active:
         raise HTTPException(status_code=401, detail="Invalid or revoked token")
@@ -44,5 +105,19 @@ async def get_valid_token(
     return token
 
 
-async def get_request_user(token: Token = Depends(get_valid_token)) -> User:
-    return await token.awaitable_attrs.owner
+async def get_valid_token(
+    request: Request,
+    raw_token: HTTPAuthorizationCredentials = Depends(BearerToken),
+    db: AsyncSession = Depends(get_db),
+) -> TokenInfo:
+    return await validate_token(request, raw_token.credentials, db)
+
+
+async def get_request_user(
+    token: TokenInfo = Depends(get_valid_token),
+    db: AsyncSession = Depends(get_db),
+) -> User:
+    user = await db.get(User, token.owner_id)
+    if user is None:
+        raise HTTPException(status_code=401, detail="Invalid or revoked token")
+    return user
@@ -0,0 +1,162 @@
+import asyncio
+import inspect
+import json
+import logging
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Any, Awaitable, Callable
+
+import asyncpg
+from sqlalchemy.engine import make_url
+
+from ad_looper.config import settings
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class EntityEvent:
+    entity: str
+    id: int | str | None
+    owner_id: int | None = None
+    data: dict[str, Any] = field(default_factory=dict)
+
+
+Evictor = Callable[[EntityEvent], Awaitable[None] | None]
+
+
+# In-process only. Used as is by tests and single-worker setups
+class EventBus:
+    def __init__(self) -> None:
+        self._evictors: dict[str, list[Evictor]] = defaultdict(list)
+        self._resync_handlers: list[Callable[[], Awaitable[None] | None]] = []
+
+    def register(self, entity: str, evictor: Evictor) -> None:
+        self._evictors[entity].append(evictor)
+
+    # Called when events from other workers may have been missed
+    def register_resync(
+        self, handler: Callable[[], Awaitable[None] | None]
+    ) -> None:
+        self._resync_handlers.append(handler)
+
+    async def resync(self) -> None:
+        for handler in self._resync_handlers:
+            try:
+                result = handler()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Failed to resync after missed events")
+
+    async def publish(self, event: EntityEvent) -> None:
+        await self.dispatch(event)
+
+    async def dispatch(self, event: EntityEvent) -> None:
+        for evictor in self._evictors.get(event.entity, ()):
+            try:
+                result = evictor(event)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception:
+                logger.exception("Failed to handle %s event", event.entity)
+
+
+# Events are applied locally right away, then sent to the other workers
+# with NOTIFY over one dedicated connection that also LISTENs for theirs
+class PostgresEventBus(EventBus):
+    def __init__(
+        self,
+        dsn: str,
+        channel: str,
+        reconnect_delay: float = 1.0,
+        reconnect_max_delay: float = 30.0,
+    ) -> None:
+        super().__init__()
+        self.dsn = dsn
+        self.channel = channel
+        self.reconnect_delay = reconnect_delay
+        self.reconnect_max_delay = reconnect_max_delay
+        self._connection: asyncpg.Connection | None = None
+        self._lock = asyncio.Lock()
+        self._tasks: set[asyncio.Task] = set()
+        self._reconnecting: asyncio.Task | None = None
+
+    async def start(self) -> None:
+        await self._connect()
+
+    async def _connect(self) -> None:
+        connection = await asyncpg.connect(self.dsn)
+        await connection.add_listener(self.channel, self._on_notify)
+        connection.add_termination_listener(self._on_terminate)
+        self._connection = connection
+
+    async def stop(self) -> None:
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+            await asyncio.gather(self._reconnecting, return_exceptions=True)
+            self._reconnecting = None
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+    async def publish(self, event: EntityEvent) -> None:
+        await self.dispatch(event)
+        if self._connection is None:
+            return
+        try:
+            async with self._lock:
+                await self._connection.execute(
+                    "SELECT pg_notify($1, $2)",
+                    self.channel,
+                    json.dumps(asdict(event)),
+                )
+        except Exception:
+            # Other workers catch up when their cache entries expire
+            logger.exception("Failed to publish %s event", event.entity)
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str):
+        # Our own events were dispatched when they were published
+        if pid == connection.get_server_pid():
+            return
+        event = EntityEvent(**json.loads(payload))
+        task = asyncio.get_running_loop().create_task(self.dispatch(event))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _on_terminate(self, connection) -> None:
+        if self._connection is connection:
+            logger.error("Lost the event bus connection, reconnecting")
+            self._connection = None
+            self._reconnecting = asyncio.get_running_loop().create_task(
+                self._reconnect()
+            )
+
+    async def _reconnect(self) -> None:
+        delay = self.reconnect_delay
+        while True:
+            await asyncio.sleep(delay)
+            try:
+                await self._connect()
+                break
+            except Exception:
+                logger.exception("Failed to reconnect the event bus")
+                delay = min(delay * 2, self.reconnect_max_delay)
+        self._reconnecting = None
+        logger.info("Event bus reconnected")
+        # Whatever other workers published in the meantime is lost
+        await self.resync()
+
+
+event_bus = PostgresEventBus(
+    make_url(settings.db.url)
+    .set(drivername="postgresql")
+    .render_as_string(hide_password=False),
+    channel=settings.events.channel,
+    reconnect_delay=settings.events.reconnect_delay,
+    reconnect_max_delay=settings.events.reconnect_max_delay,
+)
+
+
+async def publish(event: EntityEvent) -> None:
+    await event_bus.publish(event)
@@ -0,0 +1,100 @@
+from datetime import datetime, time
+
+from ad_looper.config import settings
+from apps.auth.revocation import load_revoked_tokens
+from apps.common.cache import playlist_cache, token_cache
+from apps.common.events import EntityEvent, EventBus
+from apps.common.push import push_hub
+from apps.common.revocation import revoked_tokens
+from apps.common.timeline import schedule_timeline
+from apps.schedules.timeline import load_schedule_timeline
+
+
+def evict_token(event: EntityEvent) -> None:
+    token_cache.invalidate(bytes.fromhex(event.id))
+    if "jti" in event.data:
+        revoked_tokens.revoke(
+            event.data["jti"], datetime.fromisoformat(event.data["expires_at"])
+        )
+    if "display_device_id" in event.data:
+        push_hub.disconnect_device(event.data["display_device_id"])
+
+
+def evict_revoked_tokens(event: EntityEvent) -> None:
+    revoked_tokens.update(
+        (jti, datetime.fromisoformat(expires_at))
+        for jti, expires_at in event.data["tokens"]
+    )
+
+
+def evict_user(event: EntityEvent) -> None:
+    token_cache.invalidate_owner(event.id)
+
+
+def evict_display_device(event: EntityEvent) -> None:
+    playlist_cache.invalidate_device(event.id)
+    if event.data.get("deleted"):
+        push_hub.disconnect_device(event.id)
+    else:
+        push_hub.move_device(event.id, event.data.get("media_group_id"))
+
+
+def evict_display_device_group(event: EntityEvent) -> None:
+    # Devices bulk-moved into the group in `event.id`
+    display_device_ids = event.data["display_device_ids"]
+    for display_device_id in display_device_ids:
+        playlist_cache.invalidate_device(display_device_id)
+    push_hub.move_devices(display_device_ids, event.id)
+
+
+def evict_media(event: EntityEvent) -> None:
+    playlist_cache.invalidate_media(event.id)
+    for media_group_id in event.data.get("media_group_ids", ()):
+        push_hub.notify_media_group(media_group_id)
+
+
+def evict_media_group(event: EntityEvent) -> None:
+    playlist_cache.invalidate_media_group(event.id)
+    push_hub.notify_media_group(event.id)
+    if event.data.get("deleted"):
+        schedule_timeline.remove_group(event.id)
+
+
+def evict_schedule(event: EntityEvent) -> None:
+    if event.data.get("deleted"):
+        schedule_timeline.remove(event.id)
+    else:
+        schedule_timeline.add(
+            event.id,
+            event.data["media_group_id"],
+            event.data["media_id"],
+            time.fromisoformat(event.data["trigger_time"]),
+        )
+    # A schedule moved to another group changes both playlists
+    media_group_id = event.data["media_group_id"]
+    previous = event.data.get("previous_media_group_id", media_group_id)
+    for changed_group_id in {media_group_id, previous}:
+        playlist_cache.invalidate_media_group(changed_group_id)
+        push_hub.notify_media_group(changed_group_id)
+
+
+async def resync() -> None:
+    token_cache.clear()
+    playlist_cache.clear()
+    # Devices may have been moved; they resubscribe with their new group
+    push_hub.disconnect_all()
+    await load_schedule_timeline()
+    if settings.token.stateless_device_auth:
+        await load_revoked_tokens()
+
+
+def register_evictors(bus: EventBus) -> None:
+    bus.register("token", evict_token)
+    bus.register("revoked_tokens", evict_revoked_tokens)
+    bus.register("user", evict_user)
+    bus.register("display_device", evict_display_device)
+    bus.register("display_device_group", evict_display_device_group)
+    bus.register("media", evict_media)
+    bus.register("media_group", evict_media_group)
+    bus.register("schedule", evict_schedule)
+    bus.register_resync(resync)
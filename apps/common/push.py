@@ -0,0 +1,144 @@
+import asyncio
+import json
+import logging
+from typing import Iterable
+
+from starlette.websockets import WebSocket
+
+from ad_looper.config import settings
+from ad_looper.metrics import Gauge
+
+logger = logging.getLogger(__name__)
+
+
+class Subscriber:
+    # One per open connection, so it is kept as small as possible
+    __slots__ = ("websocket", "display_device_id", "media_group_id")
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        display_device_id: int,
+        media_group_id: int | None,
+    ) -> None:
+        self.websocket = websocket
+        self.display_device_id = display_device_id
+        self.media_group_id = media_group_id
+
+
+# Device connections indexed by media group and by device. There is no
+# queue or task per connection: a change is serialized once and sent to
+# the affected connections only
+class PushHub:
+    def __init__(self, send_timeout: float) -> None:
+        self.send_timeout = send_timeout
+        self._groups: dict[int | None, set[Subscriber]] = {}
+        self._devices: dict[int, set[Subscriber]] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return sum(len(subscribers) for subscribers in self._devices.values())
+
+    def subscribe(
+        self,
+        websocket: WebSocket,
+        display_device_id: int,
+        media_group_id: int | None,
+    ) -> Subscriber:
+        subscriber = Subscriber(websocket, display_device_id, media_group_id)
+        self._groups.setdefault(media_group_id, set()).add(subscriber)
+        self._devices.setdefault(display_device_id, set()).add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        for index, key in (
+            (self._groups, subscriber.media_group_id),
+            (self._devices, subscriber.display_device_id),
+        ):
+            subscribers = index.get(key)
+            if subscribers is None:
+                continue
+            subscribers.discard(subscriber)
+            if not subscribers:
+                del index[key]
+
+    def notify_media_group(self, media_group_id: int) -> None:
+        self._send(
+            self._groups.get(media_group_id, ()),
+            {"type": "invalidate", "media_group_id": media_group_id},
+        )
+
+    def move_device(
+        self, display_device_id: int, media_group_id: int | None
+    ) -> None:
+        self._send(
+            self._regroup(display_device_id, media_group_id),
+            {
+                "type": "invalidate",
+                "display_device_id": display_device_id,
+                "media_group_id": media_group_id,
+            },
+        )
+
+    def move_devices(
+        self, display_device_ids: Iterable[int], media_group_id: int | None
+    ) -> None:
+        moved = []
+        for display_device_id in display_device_ids:
+            moved.extend(self._regroup(display_device_id, media_group_id))
+        self._send(
+            moved, {"type": "invalidate", "media_group_id": media_group_id}
+        )
+
+    def disconnect_device(self, display_device_id: int) -> None:
+        for subscriber in self._devices.get(display_device_id, ()):
+            self._spawn(subscriber.websocket.close(code=1008))
+
+    def disconnect_all(self) -> None:
+        # 1012 (service restart) asks clients to reconnect
+        for subscribers in self._devices.values():
+            for subscriber in subscribers:
+                self._spawn(subscriber.websocket.close(code=1012))
+
+    def _regroup(
+        self, display_device_id: int, media_group_id: int | None
+    ) -> list[Subscriber]:
+        subscribers = list(self._devices.get(display_device_id, ()))
+        for subscriber in subscribers:
+            self.unsubscribe(subscriber)
+            subscriber.media_group_id = media_group_id
+            self._groups.setdefault(media_group_id, set()).add(subscriber)
+            self._devices.setdefault(display_device_id, set()).add(subscriber)
+        return subscribers
+
+    def _send(self, subscribers, message: dict) -> None:
+        if not subscribers:
+            return
+        text = json.dumps(message)
+        for subscriber in list(subscribers):
+            self._spawn(self._send_one(subscriber, text))
+
+    async def _send_one(self, subscriber: Subscriber, text: str) -> None:
+        try:
+            async with asyncio.timeout(self.send_timeout):
+                await subscriber.websocket.send_text(text)
+        except Exception:
+            # The connection's receive loop unsubscribes it once it is gone
+            logger.debug(
+                "Dropped push to display device %s",
+                subscriber.display_device_id,
+            )
+
+    def _spawn(self, coroutine) -> None:
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+
+push_hub = PushHub(send_timeout=settings.push.send_timeout)
+
+Gauge(
+    "push_connections",
+    "Open display device push connections",
+    function=lambda: len(push_hub),
+)
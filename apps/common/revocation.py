@@ -0,0 +1,39 @@
+from datetime import datetime
+from typing import Iterable
+
+from ad_looper.metrics import Gauge
+
+
+# Ids (jti) of revoked tokens. Only unexpired ones are kept, so the exact
+# set stays small enough that no probabilistic filter is needed in front
+class RevocationList:
+    def __init__(self) -> None:
+        self._entries: dict[str, datetime] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, jti: str) -> bool:
+        return jti in self._entries
+
+    def revoke(self, jti: str, expires_at: datetime) -> None:
+        self._entries[jti] = expires_at
+
+    def update(self, entries: Iterable[tuple[str, datetime]]) -> None:
+        self._entries.update(entries)
+
+    def prune(self, now: datetime) -> None:
+        self._entries = {
+            jti: expires_at
+            for jti, expires_at in self._entries.items()
+            if expires_at > now
+        }
+
+
+revoked_tokens = RevocationList()
+
+Gauge(
+    "revoked_tokens",
+    "Revoked, unexpired token ids held in memory",
+    function=lambda: len(revoked_tokens),
+)
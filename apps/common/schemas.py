@@ -1,4 +1,4 @@
-from datetime import time
+from datetime import datetime, time
 from pydantic import BaseModel, ConfigDict
 
 
@@ -16,6 +16,9 @@ class MediaSimpleResponse(BaseModel):
     id: int
     name: str
     filename: str | None
+    size: int | None = None
+    sha256: str | None = None
+    content_type: str | None = None
     owner_id: int
 
 
@@ -26,3 +29,15 @@ class ScheduleSimpleResponse(BaseModel):
     trigger_time: time
     media_id: int
     media_group_id: int
+
+
+class TokenInfo(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    # Unknown for device tokens validated from their claims alone
+    id: int | None = None
+    owner_id: int
+    token_type: str
+    is_active: bool
+    expires_at: datetime
+    display_device_id: int | None = None
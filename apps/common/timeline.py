@@ -0,0 +1,106 @@
+from bisect import bisect_right, insort
+from datetime import time
+from typing import Iterable, NamedTuple
+
+from ad_looper.metrics import Gauge
+
+
+class TimelineEntry(NamedTuple):
+    trigger_time: time
+    schedule_id: int
+    media_id: int
+
+
+# Schedules of each media group, sorted by trigger time, so what plays at a
+# given time is one bisect instead of a scan over the group's schedules
+class ScheduleTimeline:
+    def __init__(self) -> None:
+        self._groups: dict[int, list[TimelineEntry]] = {}
+        self._schedules: dict[int, tuple[int, TimelineEntry]] = {}
+        # Changes made while a reload is reading the database
+        self._pending: list[tuple[str, tuple]] | None = None
+
+    def __len__(self) -> int:
+        return len(self._schedules)
+
+    def begin_load(self) -> None:
+        # Changes applied from here on are replayed on top of the rows
+        # passed to `load`, which may have been read before them
+        self._pending = []
+
+    def cancel_load(self) -> None:
+        self._pending = None
+
+    def load(
+        self, schedules: Iterable[tuple[int, int, int, time]]
+    ) -> None:
+        groups: dict[int, list[TimelineEntry]] = {}
+        entries = {}
+        for schedule_id, media_group_id, media_id, trigger_time in schedules:
+            entry = TimelineEntry(trigger_time, schedule_id, media_id)
+            groups.setdefault(media_group_id, []).append(entry)
+            entries[schedule_id] = (media_group_id, entry)
+        for group in groups.values():
+            group.sort()
+        self._groups, self._schedules = groups, entries
+
+        pending, self._pending = self._pending, None
+        for method, args in pending or ():
+            getattr(self, method)(*args)
+
+    def add(
+        self,
+        schedule_id: int,
+        media_group_id: int,
+        media_id: int,
+        trigger_time: time,
+    ) -> None:
+        if self._pending is not None:
+            self._pending.append(
+                ("add", (schedule_id, media_group_id, media_id, trigger_time))
+            )
+        self._remove(schedule_id)
+        entry = TimelineEntry(trigger_time, schedule_id, media_id)
+        insort(self._groups.setdefault(media_group_id, []), entry)
+        self._schedules[schedule_id] = (media_group_id, entry)
+
+    def remove(self, schedule_id: int) -> None:
+        if self._pending is not None:
+            self._pending.append(("remove", (schedule_id,)))
+        self._remove(schedule_id)
+
+    def _remove(self, schedule_id: int) -> None:
+        if schedule_id not in self._schedules:
+            return
+        media_group_id, entry = self._schedules.pop(schedule_id)
+        group = self._groups[media_group_id]
+        group.remove(entry)
+        if not group:
+            del self._groups[media_group_id]
+
+    def remove_group(self, media_group_id: int) -> None:
+        if self._pending is not None:
+            self._pending.append(("remove_group", (media_group_id,)))
+        for entry in self._groups.pop(media_group_id, ()):
+            self._schedules.pop(entry.schedule_id, None)
+
+    def at(
+        self, media_group_id: int, when: time
+    ) -> tuple[TimelineEntry | None, TimelineEntry | None]:
+        # Triggers repeat daily: before the first trigger the last one of
+        # the previous day is still playing, after the last one the first
+        # one of the next day is up next
+        group = self._groups.get(media_group_id)
+        if not group:
+            return None, None
+        index = bisect_right(group, (when, float("inf")))
+        return group[index - 1], group[index % len(group)]
+
+
+schedule_timeline = ScheduleTimeline()
+
+Gauge(
+    "schedule_timeline_entries",
+    "Schedules held in the in-memory timeline",
+    function=lambda: len(schedule_timeline),
+)
@@ -1,5 +1,8 @@
 import asyncio
-from typing import Sequence
+import hashlib
+from typing import Iterable, Iterator, Sequence
+
+from pydantic import BaseModel
 
 from database.models import Base
 
@@ -13,3 +16,23 @@ async def load_awaitable_attrs(obj: Base | Sequence[Base], *attrs):
             tasks.append(getattr(obj, attr))
 
     await asyncio.gather(*tasks)
+
+
+def hash_token(token: str) -> bytes:
+    return hashlib.sha256(token.encode()).digest()
+
+
+def iter_ndjson_models(
+    items: Iterable[BaseModel], chunk_size: int = 65536
+) -> Iterator[str]:
+    lines = []
+    size = 0
+    for item in items:
+        line = item.model_dump_json(exclude_none=True) + "\n"
+        lines.append(line)
+        size += len(line)
+        if size >= chunk_size:
+            yield "".join(lines)
+            lines.clear()
+            size = 0
+    yield "".join(lines)
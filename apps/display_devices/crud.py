@@ -1,8 +1,32 @@
+from datetime import datetime
+from typing import Sequence
+
 from fastapi import HTTPException
-from sqlalchemy import select
+from sqlalchemy import (
+    ARRAY,
+    DateTime,
+    Integer,
+    any_,
+    bindparam,
+    column,
+    exists,
+    insert,
+    or_,
+    select,
+    update,
+    values,
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from database.models import DisplayDevice
+from apps.auth import crud as auth_crud
+from apps.common.events import EntityEvent, publish
+from database.models import (
+    DisplayDevice,
+    Media,
+    MediaGroup,
+    MediaGroupMedia,
+    Schedule,
+)
 
 from .schemas import DisplayDeviceCreate, DisplayDeviceUpdate
 
@@ -24,6 +48,46 @@ async def create_display_device(
     return db_display_device
 
 
+async def create_display_devices(
+    db: AsyncSession,
+    display_devices: Sequence[DisplayDeviceCreate],
+    owner_id: int,
+):
+    # Not committed here, so the caller can add the devices' tokens to the
+    # same transaction
+    query = insert(DisplayDevice).returning(
+        DisplayDevice.id,
+        DisplayDevice.name,
+        DisplayDevice.description,
+        DisplayDevice.owner_id,
+        DisplayDevice.media_group_id,
+        sort_by_parameter_order=True,
+    )
+    result = await db.execute(
+        query,
+        [
+            {
+                "name": display_device.name,
+                "description": display_device.description,
+                "owner_id": owner_id,
+                "media_group_id": display_device.media_group_id,
+            }
+            for display_device in display_devices
+        ],
+    )
+    return result.all()
+
+
+async def get_media_group_owners(
+    db: AsyncSession, media_group_ids: Sequence[int]
+) -> dict[int, int]:
+    query = select(MediaGroup.id, MediaGroup.owner_id).filter(
+        MediaGroup.id.in_(media_group_ids)
+    )
+    result = await db.execute(query)
+    return dict(result.tuples().all())
+
+
 async def get_display_device(db: AsyncSession, **kwargs) -> DisplayDevice:
     query = select(DisplayDevice)
     for key, value in kwargs.items():
@@ -51,6 +115,54 @@ async def get_display_devices(db: AsyncSession, **kwargs):
     return result.scalars().all()
 
 
+async def get_playlist_target(
+    db: AsyncSession, device_id: int
+) -> tuple[int, int | None]:
+    query = select(DisplayDevice.owner_id, DisplayDevice.media_group_id).filter(
+        DisplayDevice.id == device_id
+    )
+    result = await db.execute(query)
+    row = result.first()
+    if row is None:
+        raise HTTPException(status_code=404, detail="Display device not found")
+    return tuple(row)
+
+
+async def get_playlist_targets(
+    db: AsyncSession, device_ids: Sequence[int]
+) -> dict[int, tuple[int, int | None]]:
+    query = select(
+        DisplayDevice.id, DisplayDevice.owner_id, DisplayDevice.media_group_id
+    ).filter(DisplayDevice.id.in_(device_ids))
+    result = await db.execute(query)
+    return {
+        device_id: (owner_id, media_group_id)
+        for device_id, owner_id, media_group_id in result.tuples()
+    }
+
+
+async def get_playlist_media(db: AsyncSession, media_group_id: int):
+    # Plain columns, so none of the selectin relationships are loaded
+    query = (
+        select(Media.id, Media.name, Media.filename, Media.size, Media.sha256)
+        .join(MediaGroupMedia, MediaGroupMedia.media_id == Media.id)
+        .filter(MediaGroupMedia.media_group_id == media_group_id)
+        .order_by(Media.id)
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
+async def get_playlist_schedules(db: AsyncSession, media_group_id: int):
+    query = (
+        select(Schedule.media_id, Schedule.trigger_time)
+        .filter(Schedule.media_group_id == media_group_id)
+        .order_by(Schedule.trigger_time, Schedule.media_id)
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
 async def update_display_device(
     db: AsyncSession,
     device_id: int,
@@ -75,11 +187,158 @@ async def update_display_device(
 
     db.add(db_display_device)
     await db.commit()
+    await publish(
+        EntityEvent(
+            "display_device",
+            device_id,
+            db_display_device.owner_id,
+            {"media_group_id": db_display_device.media_group_id},
+        )
+    )
     await db.refresh(db_display_device)
     return db_display_device
 
 
+# NOTIFY payloads are capped at 8000 bytes, so large moves are announced
+# in several events
+EVENT_DEVICE_IDS_CHUNK = 500
+
+
+async def reassign_display_devices(
+    db: AsyncSession,
+    owner_id: int,
+    media_group_id: int | None,
+    display_device_ids: Sequence[int] | None = None,
+    name_prefix: str | None = None,
+):
+    # Ownership of both the devices and the group is checked by the UPDATE
+    # itself. Devices already in the group are left untouched
+    query = update(DisplayDevice).where(
+        DisplayDevice.owner_id == owner_id,
+        DisplayDevice.media_group_id.is_distinct_from(media_group_id),
+    )
+    if display_device_ids is not None:
+        query = query.where(
+            DisplayDevice.id
+            == any_(
+                bindparam(
+                    "display_device_ids",
+                    list(display_device_ids),
+                    type_=ARRAY(Integer),
+                )
+            )
+        )
+    if name_prefix is not None:
+        query = query.where(
+            DisplayDevice.name.startswith(name_prefix, autoescape=True)
+        )
+    if media_group_id is not None:
+        query = query.where(
+            exists().where(
+                MediaGroup.id == media_group_id,
+                MediaGroup.owner_id == owner_id,
+            )
+        )
+    query = query.values(media_group_id=media_group_id).returning(
+        DisplayDevice.id,
+        DisplayDevice.name,
+        DisplayDevice.description,
+        DisplayDevice.owner_id,
+        DisplayDevice.media_group_id,
+    )
+    # Nothing is loaded in the session that would need syncing
+    result = await db.execute(
+        query, execution_options={"synchronize_session": False}
+    )
+    rows = sorted(result.all(), key=lambda row: row.id)
+    await db.commit()
+
+    ids = [row.id for row in rows]
+    for start in range(0, len(ids), EVENT_DEVICE_IDS_CHUNK):
+        await publish(
+            EntityEvent(
+                "display_device_group",
+                media_group_id,
+                owner_id,
+                {
+                    "display_device_ids": ids[
+                        start : start + EVENT_DEVICE_IDS_CHUNK
+                    ]
+                },
+            )
+        )
+    return rows
+
+
 async def delete_display_device(db: AsyncSession, device_id: int) -> None:
     db_display_device = await get_display_device(db, id=device_id)
+    tokens = await auth_crud.delete_display_device_tokens(db, device_id)
+    revoked = [
+        await auth_crud.revoke_token(db, token) for token, _ in tokens
+    ]
     await db.delete(db_display_device)
     await db.commit()
+    await publish(
+        EntityEvent(
+            "display_device",
+            device_id,
+            db_display_device.owner_id,
+            {"deleted": True},
+        )
+    )
+    for (_, token_hash), data in zip(tokens, revoked):
+        await publish(
+            EntityEvent(
+                "token", token_hash.hex(), db_display_device.owner_id, data
+            )
+        )
+
+
+async def get_owned_devices(db: AsyncSession, owner_id: int):
+    query = (
+        select(DisplayDevice.id, DisplayDevice.name)
+        .filter(DisplayDevice.owner_id == owner_id)
+        .order_by(DisplayDevice.id)
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
+async def get_last_seen(
+    db: AsyncSession, since: datetime | None = None
+) -> Sequence[tuple[int, datetime]]:
+    query = select(DisplayDevice.id, DisplayDevice.last_seen_at).filter(
+        DisplayDevice.last_seen_at.is_not(None)
+    )
+    if since is not None:
+        query = query.filter(DisplayDevice.last_seen_at > since)
+    result = await db.execute(query)
+    return result.tuples().all()
+
+
+async def update_last_seen(
+    db: AsyncSession, heartbeats: Sequence[tuple[int, datetime]]
+) -> None:
+    # One UPDATE ... FROM (VALUES ...) for the whole batch
+    heartbeat_values = values(
+        column("id", Integer),
+        column("last_seen_at", DateTime),
+        name="heartbeats",
+    ).data(heartbeats)
+    query = (
+        update(DisplayDevice)
+        .where(
+            DisplayDevice.id == heartbeat_values.c.id,
+            or_(
+                DisplayDevice.last_seen_at.is_(None),
+                DisplayDevice.last_seen_at < heartbeat_values.c.last_seen_at,
+            ),
+        )
+        # A heartbeat is not an edit, so updated_at is left alone
+        .values(
+            last_seen_at=heartbeat_values.c.last_seen_at,
+            updated_at=DisplayDevice.updated_at,
+        )
+    )
+    await db.execute(query)
+    await db.commit()
@@ -0,0 +1,120 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from itertools import islice
+
+from ad_looper.config import settings
+from ad_looper.metrics import Counter, Gauge
+from database.models import AsyncSessionLocal
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+
+class HeartbeatTracker:
+    def __init__(self, batch_size: int, flush_interval: float) -> None:
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.received = 0
+        self.written = 0
+        self.failed = 0
+        self.last_seen: dict[int, datetime] = {}
+        # Heartbeats not written to the database yet, newest per device
+        self.pending: dict[int, datetime] = {}
+        self._synced_at: datetime | None = None
+        self._task: asyncio.Task | None = None
+
+    def beat(self, device_id: int, seen_at: datetime | None = None) -> None:
+        seen_at = seen_at or datetime.utcnow()
+        self.last_seen[device_id] = seen_at
+        self.pending[device_id] = seen_at
+        self.received += 1
+
+    def merge(self, rows) -> None:
+        for device_id, seen_at in rows:
+            if seen_at is not None and seen_at > self.last_seen.get(
+                device_id, datetime.min
+            ):
+                self.last_seen[device_id] = seen_at
+
+    async def load(self) -> None:
+        async with AsyncSessionLocal() as db:
+            self._synced_at = datetime.utcnow()
+            self.merge(await crud.get_last_seen(db))
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        await self.flush()
+
+    async def flush(self) -> None:
+        pending, self.pending = self.pending, {}
+        items = iter(pending.items())
+        async with AsyncSessionLocal() as db:
+            while batch := list(islice(items, self.batch_size)):
+                try:
+                    await crud.update_last_seen(db, batch)
+                except Exception:
+                    await db.rollback()
+                    self.failed += len(batch)
+                    logger.exception(
+                        "Failed to write %d device heartbeats", len(batch)
+                    )
+                    # Retried with the next flush unless a newer one came in
+                    for device_id, seen_at in batch:
+                        self.pending.setdefault(device_id, seen_at)
+                else:
+                    self.written += len(batch)
+
+    async def sync(self) -> None:
+        # Heartbeats other workers wrote since the last sync. The margin
+        # covers their flushes that were still in flight back then
+        since = self._synced_at - timedelta(seconds=self.flush_interval * 2)
+        async with AsyncSessionLocal() as db:
+            self._synced_at = datetime.utcnow()
+            self.merge(await crud.get_last_seen(db, since=since))
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+                if self._synced_at is not None:
+                    await self.sync()
+            except Exception:
+                logger.exception("Failed to sync device heartbeats")
+
+
+heartbeat_tracker = HeartbeatTracker(
+    batch_size=settings.heartbeat.batch_size,
+    flush_interval=settings.heartbeat.flush_interval,
+)
+
+Counter(
+    "heartbeats_received_total",
+    "Device heartbeats received by this worker",
+    function=lambda: heartbeat_tracker.received,
+)
+Counter(
+    "heartbeats_written_total",
+    "Device last-seen times written to the database",
+    function=lambda: heartbeat_tracker.written,
+)
+Counter(
+    "heartbeats_failed_total",
+    "Device last-seen times whose write failed and was retried",
+    function=lambda: heartbeat_tracker.failed,
+)
+Gauge(
+    "heartbeats_pending",
+    "Devices whose last heartbeat is not written yet",
+    function=lambda: len(heartbeat_tracker.pending),
+)
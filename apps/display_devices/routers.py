@@ -1,17 +1,40 @@
 from typing import Sequence
 
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Request,
+    Response,
+    WebSocket,
+)
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from apps.common.dependencies import get_db, get_request_user
-from database.models import User
+from apps.common.dependencies import (
+    get_db,
+    get_request_user,
+    get_valid_token,
+    validate_token,
+)
+from apps.common.push import push_hub
+from apps.common.schemas import TokenInfo
+from apps.common.utils import iter_ndjson_models
+from database.models import AsyncSessionLocal, User
 
-from . import crud
+from . import crud, services
 from .schemas import (
+    DisplayDeviceBulkCreate,
     DisplayDeviceCreate,
+    DisplayDeviceReassign,
+    DisplayDeviceReassignResult,
     DisplayDeviceResponse,
     DisplayDeviceUpdate,
+    FleetStatus,
+    Playlist,
 )
+from .heartbeat import heartbeat_tracker
+from .utils import etag_matches
 
 router = APIRouter(prefix="/display_devices", tags=["DisplayDevices"])
 
@@ -23,6 +46,33 @@ async def read_display_devices(
     return await user.awaitable_attrs.display_devices
 
 
+@router.post(
+    "/heartbeat",
+    status_code=204,
+    description="Marks the calling device as online. Needs a device token",
+)
+async def display_device_heartbeat(
+    token: TokenInfo = Depends(get_valid_token),
+):
+    if token.display_device_id is None:
+        raise HTTPException(status_code=403, detail="Device token required")
+    heartbeat_tracker.beat(token.display_device_id)
+
+
+@router.get(
+    "/status",
+    description=(
+        "Online, stale and offline counts and each device's last heartbeat, "
+        "for all of the user's devices"
+    ),
+)
+async def read_fleet_status(
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> FleetStatus:
+    return await services.get_fleet_status(db, user)
+
+
 @router.get("/{device_id}")
 async def read_display_device(
     device_id: int,
@@ -37,6 +87,76 @@ async def read_display_device(
     return display_device
 
 
+@router.websocket("/ws")
+async def display_device_updates(websocket: WebSocket):
+    # Pushes {"type": "invalidate", ...} whenever the device's playlist
+    # changes. Browsers can't set headers on a WebSocket, so the device
+    # token may also be passed as ?token=
+    raw_token = websocket.query_params.get("token") or websocket.headers.get(
+        "authorization", ""
+    ).removeprefix("Bearer ")
+    # A short-lived session, so no connection is held while the socket idles
+    async with AsyncSessionLocal() as db:
+        try:
+            token = await validate_token(websocket, raw_token, db)
+            if token.display_device_id is None:
+                raise HTTPException(status_code=403, detail="Forbidden")
+            target = await services.get_device_target(
+                db, token.display_device_id
+            )
+        except HTTPException:
+            await websocket.close(code=1008)
+            return
+
+    await websocket.accept()
+    subscriber = push_hub.subscribe(
+        websocket, token.display_device_id, target.media_group_id
+    )
+    try:
+        await websocket.send_json(
+            {"type": "subscribed", "media_group_id": target.media_group_id}
+        )
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                break
+    finally:
+        push_hub.unsubscribe(subscriber)
+
+
+@router.get(
+    "/{device_id}/playlist",
+    description=(
+        "Media and schedule triggers of the device's media group. Send the "
+        "`ETag` back as `If-None-Match` to get a 304 while it is unchanged"
+    ),
+    responses={
+        200: {"model": Playlist},
+        304: {"description": "Playlist unchanged"},
+    },
+)
+async def read_display_device_playlist(
+    device_id: int,
+    request: Request,
+    token: TokenInfo = Depends(get_valid_token),
+    db: AsyncSession = Depends(get_db),
+) -> Response:
+    # Device tokens may only read their own playlist
+    if token.display_device_id not in (None, device_id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    target = await services.get_device_target(db, device_id)
+    if token.owner_id != target.owner_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    playlist = await services.get_playlist(db, target.media_group_id)
+    headers = {"ETag": playlist.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request.headers.get("if-none-match"), playlist.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(
+        playlist.body, media_type="application/json", headers=headers
+    )
+
+
 @router.post("", status_code=201)
 async def create_display_device(
     display_device: DisplayDeviceCreate,
@@ -46,6 +166,44 @@ async def create_display_device(
     return await crud.create_display_device(db, display_device, user.id)  # type: ignore
 
 
+@router.post(
+    "/bulk",
+    description=(
+        "Creates many devices, and with `mint_tokens` their device tokens, in "
+        "one transaction. Streams one NDJSON line per requested device, "
+        "with an HTTP-style `status` and either the device or an error "
+        "`detail`"
+    ),
+)
+async def create_display_devices(
+    data: DisplayDeviceBulkCreate,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+):
+    results = await services.provision_display_devices(
+        db, user, data.display_devices, data.mint_tokens
+    )
+    return StreamingResponse(
+        iter_ndjson_models(results), media_type="application/x-ndjson"
+    )
+
+
+@router.post(
+    "/reassign",
+    description=(
+        "Moves the user's devices, picked by id and/or name prefix, to one "
+        "media group (or out of any group with `null`) in a single update. "
+        "Returns only the devices that moved"
+    ),
+)
+async def reassign_display_devices(
+    data: DisplayDeviceReassign,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> DisplayDeviceReassignResult:
+    return await services.reassign_display_devices(db, user, data)
+
+
 @router.patch("/{device_id}", status_code=200)
 async def update_display_device(
     device_id: int,
@@ -1,4 +1,7 @@
-from pydantic import BaseModel, ConfigDict
+from datetime import datetime, time
+from typing import Literal
+
+from pydantic import BaseModel, ConfigDict, Field, model_validator
 
 
 class DisplayDeviceCreate(BaseModel):
@@ -21,3 +24,73 @@ class DisplayDeviceResponse(BaseModel):
     description: str | None = None
     owner_id: int
     media_group_id: int | None = None
+
+
+class DisplayDeviceBulkCreate(BaseModel):
+    display_devices: list[DisplayDeviceCreate] = Field(
+        min_length=1, max_length=5000
+    )
+    mint_tokens: bool = True
+
+
+class DisplayDeviceBulkResult(BaseModel):
+    index: int
+    status: int
+    display_device: DisplayDeviceResponse | None = None
+    token: str | None = None
+    detail: str | None = None
+
+
+class DisplayDeviceReassign(BaseModel):
+    # Devices are picked by id, by name prefix, or by both
+    display_device_ids: list[int] | None = Field(None, max_length=5000)
+    name_prefix: str | None = Field(None, min_length=1)
+    media_group_id: int | None
+
+    @model_validator(mode="after")
+    def check_selection(self):
+        if self.display_device_ids is None and self.name_prefix is None:
+            raise ValueError("Pass display_device_ids or name_prefix")
+        return self
+
+
+class DisplayDeviceReassignResult(BaseModel):
+    media_group_id: int | None
+    display_devices: list[DisplayDeviceResponse]
+
+
+class PlaylistMedia(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    name: str
+    filename: str | None = None
+    size: int | None = None
+    sha256: str | None = None
+
+
+class PlaylistSchedule(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    media_id: int
+    trigger_time: time
+
+
+class Playlist(BaseModel):
+    media_group_id: int | None = None
+    media: list[PlaylistMedia] = []
+    schedules: list[PlaylistSchedule] = []
+
+
+class DeviceStatus(BaseModel):
+    id: int
+    name: str
+    last_seen_at: datetime | None = None
+    status: Literal["online", "stale", "offline"]
+
+
+class FleetStatus(BaseModel):
+    online: int = 0
+    stale: int = 0
+    offline: int = 0
+    devices: list[DeviceStatus] = []
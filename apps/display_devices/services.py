@@ -0,0 +1,201 @@
+import hashlib
+from datetime import datetime, timedelta
+from typing import Sequence
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ad_looper.config import settings
+from apps.auth import crud as auth_crud
+from apps.auth.services import mint_device_token
+from apps.common.cache import CompiledPlaylist, DeviceTarget, playlist_cache
+from database.models import User
+
+from . import crud
+from .heartbeat import heartbeat_tracker
+from .schemas import (
+    DeviceStatus,
+    DisplayDeviceBulkResult,
+    DisplayDeviceCreate,
+    DisplayDeviceReassign,
+    DisplayDeviceReassignResult,
+    DisplayDeviceResponse,
+    FleetStatus,
+    Playlist,
+    PlaylistMedia,
+    PlaylistSchedule,
+)
+
+
+async def provision_display_devices(
+    db: AsyncSession,
+    user: User,
+    display_devices: list[DisplayDeviceCreate],
+    mint_tokens: bool,
+) -> list[DisplayDeviceBulkResult]:
+    media_group_owners = await crud.get_media_group_owners(
+        db,
+        {
+            display_device.media_group_id
+            for display_device in display_devices
+            if display_device.media_group_id is not None
+        },
+    )
+    results: list[DisplayDeviceBulkResult | None] = []
+    accepted = []
+    for index, display_device in enumerate(display_devices):
+        media_group_id = display_device.media_group_id
+        if media_group_id is None:
+            pass
+        elif media_group_id not in media_group_owners:
+            results.append(
+                DisplayDeviceBulkResult(
+                    index=index, status=404, detail="Media group not found"
+                )
+            )
+            continue
+        elif media_group_owners[media_group_id] != user.id:
+            results.append(
+                DisplayDeviceBulkResult(
+                    index=index, status=403, detail="Forbidden"
+                )
+            )
+            continue
+        # Filled in once the insert has returned the device ids
+        results.append(None)
+        accepted.append((index, display_device))
+
+    if not accepted:
+        return results
+
+    rows = await crud.create_display_devices(
+        db, [display_device for _, display_device in accepted], user.id
+    )
+    tokens = []
+    for (index, _), row in zip(accepted, rows):
+        token = None
+        if mint_tokens:
+            token, expires_at = mint_device_token(user, row.id)
+            tokens.append((token, expires_at, row.id))
+        results[index] = DisplayDeviceBulkResult(
+            index=index,
+            status=201,
+            display_device=DisplayDeviceResponse.model_validate(row),
+            token=token,
+        )
+
+    if tokens:
+        await auth_crud.create_device_tokens(
+            db, owner_id=user.id, tokens=tokens
+        )
+    else:
+        await db.commit()
+    return results
+
+
+async def reassign_display_devices(
+    db: AsyncSession, user: User, data: DisplayDeviceReassign
+) -> DisplayDeviceReassignResult:
+    rows = await crud.reassign_display_devices(
+        db,
+        owner_id=user.id,
+        media_group_id=data.media_group_id,
+        display_device_ids=data.display_device_ids,
+        name_prefix=data.name_prefix,
+    )
+    # An empty result may also mean the group isn't the user's; only then
+    # is it looked up separately
+    if not rows and data.media_group_id is not None:
+        owners = await crud.get_media_group_owners(db, [data.media_group_id])
+        if data.media_group_id not in owners:
+            raise HTTPException(status_code=404, detail="MediaGroup not found")
+        if owners[data.media_group_id] != user.id:
+            raise HTTPException(status_code=403, detail="Forbidden")
+    return DisplayDeviceReassignResult(
+        media_group_id=data.media_group_id,
+        display_devices=rows,
+    )
+
+
+def compile_playlist(playlist: Playlist) -> CompiledPlaylist:
+    body = playlist.model_dump_json().encode()
+    return CompiledPlaylist(
+        body=body,
+        etag=f'"{hashlib.sha256(body).hexdigest()}"',
+        media_ids=frozenset(media.id for media in playlist.media),
+    )
+
+
+async def get_device_target(db: AsyncSession, device_id: int) -> DeviceTarget:
+    target = playlist_cache.devices.get(device_id)
+    if target is None:
+        target = DeviceTarget(*await crud.get_playlist_target(db, device_id))
+        playlist_cache.devices.set(device_id, target)
+    return target
+
+
+async def get_device_targets(
+    db: AsyncSession, device_ids: Sequence[int]
+) -> dict[int, DeviceTarget]:
+    targets = {}
+    missing = []
+    for device_id in device_ids:
+        target = playlist_cache.devices.get(device_id)
+        if target is None:
+            missing.append(device_id)
+        else:
+            targets[device_id] = target
+    if missing:
+        rows = await crud.get_playlist_targets(db, missing)
+        for device_id, row in rows.items():
+            targets[device_id] = DeviceTarget(*row)
+            playlist_cache.devices.set(device_id, targets[device_id])
+    return targets
+
+
+async def get_playlist(
+    db: AsyncSession, media_group_id: int | None
+) -> CompiledPlaylist:
+    if media_group_id is None:
+        return compile_playlist(Playlist())
+
+    playlist = playlist_cache.playlists.get(media_group_id)
+    if playlist is None:
+        media = await crud.get_playlist_media(db, media_group_id)
+        schedules = await crud.get_playlist_schedules(db, media_group_id)
+        playlist = compile_playlist(
+            Playlist(
+                media_group_id=media_group_id,
+                media=[PlaylistMedia.model_validate(row) for row in media],
+                schedules=[
+                    PlaylistSchedule.model_validate(row) for row in schedules
+                ],
+            )
+        )
+        playlist_cache.set_playlist(media_group_id, playlist)
+    return playlist
+
+
+async def get_fleet_status(db: AsyncSession, user: User) -> FleetStatus:
+    now = datetime.utcnow()
+    stale_since = now - timedelta(seconds=settings.heartbeat.stale_after)
+    offline_since = now - timedelta(seconds=settings.heartbeat.offline_after)
+    fleet = FleetStatus()
+    for device_id, name in await crud.get_owned_devices(db, user.id):
+        last_seen_at = heartbeat_tracker.last_seen.get(device_id)
+        if last_seen_at is None or last_seen_at < offline_since:
+            status = "offline"
+        elif last_seen_at < stale_since:
+            status = "stale"
+        else:
+            status = "online"
+        setattr(fleet, status, getattr(fleet, status) + 1)
+        fleet.devices.append(
+            DeviceStatus(
+                id=device_id,
+                name=name,
+                last_seen_at=last_seen_at,
+                status=status,
+            )
+        )
+    return fleet
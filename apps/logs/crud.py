@@ -1,8 +1,14 @@
+from collections import Counter
+from datetime import datetime
+from typing import Sequence
+
 from fastapi import HTTPException
+from sqlalchemy import delete, func, insert, literal_column, tuple_
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from database.models import Log
+from database.models import DisplayDevice, HourlyLogRollup, Log, LogRollup
 
 
 async def create_log(
@@ -21,6 +27,69 @@ async def create_log(
     return db_log
 
 
+async def create_logs(db: AsyncSession, logs: Sequence[dict]) -> None:
+    await db.execute(insert(Log), logs)
+    await upsert_log_rollups(db, logs)
+    await db.commit()
+
+
+def _rollup_upsert(model, keys: Sequence[str], counts: Counter):
+    # Sorted keys keep concurrent writers from deadlocking on the same rows
+    stmt = pg_insert(model).values(
+        [
+            dict(zip(keys, key), requests=requests)
+            for key, requests in sorted(counts.items())
+        ]
+    )
+    return stmt.on_conflict_do_update(
+        index_elements=[getattr(model, key) for key in keys],
+        set_={"requests": model.requests + stmt.excluded.requests},
+    )
+
+
+async def upsert_log_rollups(db: AsyncSession, logs: Sequence[dict]) -> None:
+    minutes = Counter(
+        (
+            log["device_id"],
+            log["created_at"].replace(second=0, microsecond=0),
+            log["method"],
+            log["url"],
+            log["status_code"] // 100,
+        )
+        for log in logs
+        if log["device_id"] is not None
+    )
+    if not minutes:
+        return
+
+    hours = Counter()
+    for (device_id, bucket, _, _, status_class), requests in minutes.items():
+        hours[device_id, bucket.replace(minute=0), status_class] += requests
+
+    await db.execute(
+        _rollup_upsert(
+            LogRollup,
+            ("device_id", "bucket", "method", "url", "status_class"),
+            minutes,
+        )
+    )
+    await db.execute(
+        _rollup_upsert(
+            HourlyLogRollup, ("device_id", "bucket", "status_class"), hours
+        )
+    )
+
+
+async def delete_expired_log_rollups(
+    db: AsyncSession, cutoff: datetime
+) -> int:
+    deleted = 0
+    for model in (LogRollup, HourlyLogRollup):
+        result = await db.execute(delete(model).filter(model.bucket < cutoff))
+        deleted += result.rowcount
+    return deleted
+
+
 async def get_log(db: AsyncSession, **kwargs) -> Log:
     query = select(Log)
     for key, value in kwargs.items():
@@ -48,6 +117,101 @@ async def get_log_list(db: AsyncSession, **kwargs):
     return result.scalars().all()
 
 
+def _device_logs_query(
+    query, device_id: int, since: datetime | None, until: datetime | None
+):
+    query = query.filter(Log.device_id == device_id)
+    if since is not None:
+        query = query.filter(Log.created_at >= since)
+    if until is not None:
+        query = query.filter(Log.created_at < until)
+    return query.order_by(Log.created_at.desc(), Log.id.desc())
+
+
+async def get_device_log_page(
+    db: AsyncSession,
+    device_id: int,
+    limit: int,
+    after: tuple[datetime, int] | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+) -> Sequence[Log]:
+    query = _device_logs_query(select(Log), device_id, since, until)
+    if after is not None:
+        query = query.filter(tuple_(Log.created_at, Log.id) < tuple_(*after))
+    result = await db.execute(query.limit(limit))
+    return result.scalars().all()
+
+
+async def stream_device_logs(
+    db: AsyncSession,
+    device_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+):
+    query = _device_logs_query(
+        select(
+            Log.id,
+            Log.created_at,
+            Log.url,
+            Log.method,
+            Log.status_code,
+            Log.duration_ms,
+        ),
+        device_id,
+        since,
+        until,
+    )
+    result = await db.stream(query.execution_options(yield_per=1000))
+    async for row in result:
+        yield row
+
+
+async def get_traffic(
+    db: AsyncSession,
+    since: datetime,
+    until: datetime,
+    bucket_size: str,
+    device_id: int | None = None,
+    owner_id: int | None = None,
+):
+    if bucket_size == "minute":
+        model = LogRollup
+    else:
+        model = HourlyLogRollup
+        # The first hour is counted whole, as the minute buckets would
+        since = since.replace(minute=0, second=0, microsecond=0)
+    # Inlined so the GROUP BY expression matches the selected one exactly
+    bucket = func.date_trunc(
+        literal_column(f"'{bucket_size}'"), model.bucket
+    ).label("bucket")
+    query = (
+        select(
+            bucket,
+            func.sum(model.requests).label("requests"),
+            func.coalesce(
+                func.sum(model.requests).filter(model.status_class >= 4),
+                0,
+            ).label("errors"),
+        )
+        .filter(model.bucket >= since, model.bucket < until)
+        .group_by(bucket)
+        .order_by(bucket)
+    )
+    if device_id is not None:
+        query = query.filter(model.device_id == device_id)
+    if owner_id is not None:
+        query = query.filter(
+            model.device_id.in_(
+                select(DisplayDevice.id).filter(
+                    DisplayDevice.owner_id == owner_id
+                )
+            )
+        )
+    result = await db.execute(query)
+    return result.all()
+
+
 async def delete_log(db: AsyncSession, log_id: int) -> None:
     db_log = await get_log(db, id=log_id)
     if db_log is None:
@@ -0,0 +1,88 @@
+from datetime import date, datetime, time, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ad_looper.config import settings
+from database.models import AsyncSessionLocal
+
+from . import crud
+
+PARTITION_PREFIX = "logs_p"
+PARTITION_INTERVAL = timedelta(days=7)
+
+
+def partition_start(day: date) -> date:
+    return day - timedelta(days=day.weekday())
+
+
+def partition_name(start: date) -> str:
+    return f"{PARTITION_PREFIX}{start:%Y%m%d}"
+
+
+async def get_partitions(db: AsyncSession) -> dict[str, date]:
+    result = await db.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = 'logs'"
+        )
+    )
+    partitions = {}
+    for name in result.scalars():
+        if name.startswith(PARTITION_PREFIX):
+            start = name.removeprefix(PARTITION_PREFIX)
+            partitions[name] = datetime.strptime(start, "%Y%m%d").date()
+    return partitions
+
+
+async def create_partitions(
+    db: AsyncSession, today: date, partitions_ahead: int
+) -> list[str]:
+    existing = await get_partitions(db)
+    created = []
+    start = partition_start(today)
+    for _ in range(partitions_ahead + 1):
+        name = partition_name(start)
+        end = start + PARTITION_INTERVAL
+        if name not in existing:
+            await db.execute(
+                text(
+                    f"CREATE TABLE {name} PARTITION OF logs "
+                    f"FOR VALUES FROM ('{start}') TO ('{end}')"
+                )
+            )
+            created.append(name)
+        start = end
+    return created
+
+
+async def drop_expired_partitions(
+    db: AsyncSession, today: date, retention_days: int
+) -> list[str]:
+    cutoff = today - timedelta(days=retention_days)
+    dropped = []
+    for name, start in sorted((await get_partitions(db)).items()):
+        if start + PARTITION_INTERVAL <= cutoff:
+            await db.execute(text(f"DROP TABLE {name}"))
+            dropped.append(name)
+    return dropped
+
+
+async def maintain_partitions() -> tuple[list[str], list[str], int]:
+    today = datetime.utcnow().date()
+    async with AsyncSessionLocal() as db:
+        created = await create_partitions(
+            db, today, settings.logs.partitions_ahead
+        )
+        dropped = await drop_expired_partitions(
+            db, today, settings.logs.retention_days
+        )
+        # Rollups are kept exactly as long as the logs they summarize
+        cutoff = today - timedelta(days=settings.logs.retention_days)
+        pruned = await crud.delete_expired_log_rollups(
+            db, datetime.combine(cutoff, time())
+        )
+        await db.commit()
+    return created, dropped, pruned
@@ -1,21 +1,32 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import datetime, timedelta
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from apps.common.dependencies import get_db, get_request_user
-from apps.logs.schemas import LogResponse
-from database.models import User
+from apps.logs.schemas import LogPage, TrafficSeries
+from apps.logs.utils import (
+    choose_bucket_size,
+    decode_cursor,
+    encode_cursor,
+    iter_csv,
+    iter_ndjson,
+)
+from database.models import AsyncSessionLocal, User
 from . import crud
 from apps.display_devices import crud as display_device_crud
 
 router = APIRouter(prefix="/logs", tags=["Logs"])
 
+TRAFFIC_DESCRIPTION = (
+    "Requests and errors (4xx and 5xx responses) per time bucket. "
+    "Defaults to the last 24 hours, the bucket size is picked from the range"
+)
 
-@router.get("/devices/{device_id}/logs")
-async def get_device_logs(
-    device_id: int,
-    user: User = Depends(get_request_user),
-    db: AsyncSession = Depends(get_db),
-) -> LogResponse:
+
+async def check_device_owner(device_id: int, user: User, db: AsyncSession):
     if (
         user
         != (
@@ -23,4 +34,98 @@ async def get_device_logs(
         ).owner
     ):
         raise HTTPException(status_code=403, detail="Forbidden")
-    return await crud.get_log_list(db, device_id=device_id)
+
+
+@router.get(
+    "/devices/{device_id}/logs",
+    description="Newest logs first. Pass `next_cursor` back as `cursor` to get the next page",
+)
+async def get_device_logs(
+    device_id: int,
+    cursor: str | None = None,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    limit: int = Query(100, ge=1, le=1000),
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> LogPage:
+    await check_device_owner(device_id, user, db)
+    logs = await crud.get_device_log_page(
+        db,
+        device_id,
+        limit=limit + 1,
+        after=decode_cursor(cursor) if cursor else None,
+        since=since,
+        until=until,
+    )
+    next_cursor = None
+    if len(logs) > limit:
+        logs = logs[:limit]
+        next_cursor = encode_cursor(logs[-1].created_at, logs[-1].id)
+    return LogPage(items=logs, next_cursor=next_cursor)
+
+
+@router.get(
+    "/devices/{device_id}/logs/export",
+    description="Streams every matching log as NDJSON or CSV",
+)
+async def export_device_logs(
+    device_id: int,
+    export_format: Literal["ndjson", "csv"] = Query("ndjson", alias="format"),
+    since: datetime | None = None,
+    until: datetime | None = None,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> StreamingResponse:
+    await check_device_owner(device_id, user, db)
+
+    # The request session is closed before the body is streamed
+    async def rows():
+        async with AsyncSessionLocal() as export_db:
+            async for row in crud.stream_device_logs(
+                export_db, device_id, since, until
+            ):
+                yield row
+
+    if export_format == "csv":
+        return StreamingResponse(iter_csv(rows()), media_type="text/csv")
+    return StreamingResponse(
+        iter_ndjson(rows()), media_type="application/x-ndjson"
+    )
+
+
+async def get_traffic_series(
+    db: AsyncSession,
+    since: datetime | None,
+    until: datetime | None,
+    **filters,
+) -> TrafficSeries:
+    until = until or datetime.utcnow()
+    since = since or until - timedelta(days=1)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="Invalid time range")
+    bucket_size = choose_bucket_size(since, until)
+    points = await crud.get_traffic(db, since, until, bucket_size, **filters)
+    return TrafficSeries(bucket_size=bucket_size, points=points)
+
+
+@router.get("/traffic", description=TRAFFIC_DESCRIPTION)
+async def get_fleet_traffic(
+    since: datetime | None = None,
+    until: datetime | None = None,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> TrafficSeries:
+    return await get_traffic_series(db, since, until, owner_id=user.id)
+
+
+@router.get("/devices/{device_id}/traffic", description=TRAFFIC_DESCRIPTION)
+async def get_device_traffic(
+    device_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> TrafficSeries:
+    await check_device_owner(device_id, user, db)
+    return await get_traffic_series(db, since, until, device_id=device_id)
@@ -1,3 +1,5 @@
+from datetime import datetime
+
 from pydantic import BaseModel, ConfigDict
 
 
@@ -6,6 +8,7 @@ class LogCreate(BaseModel):
     method: str
     status_code: int
     device_id: int | None = None
+    duration_ms: float | None = None
 
 
 class LogResponse(BaseModel):
@@ -16,3 +19,23 @@ class LogResponse(BaseModel):
     method: str
     status_code: int
     device_id: int | None = None
+    duration_ms: float | None = None
+    created_at: datetime
+
+
+class LogPage(BaseModel):
+    items: list[LogResponse]
+    next_cursor: str | None = None
+
+
+class TrafficPoint(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    bucket: datetime
+    requests: int
+    errors: int
+
+
+class TrafficSeries(BaseModel):
+    bucket_size: str
+    points: list[TrafficPoint]
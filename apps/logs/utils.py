@@ -0,0 +1,79 @@
+import base64
+import csv
+import io
+import json
+from datetime import datetime, timedelta
+from typing import Any, AsyncIterator, Sequence
+
+from fastapi import HTTPException
+
+EXPORT_COLUMNS = (
+    "id",
+    "created_at",
+    "url",
+    "method",
+    "status_code",
+    "duration_ms",
+)
+EXPORT_CHUNK_SIZE = 65536
+
+# Widest range served with each bucket size, anything longer uses days
+TRAFFIC_BUCKETS = (
+    ("minute", timedelta(hours=6)),
+    ("hour", timedelta(days=14)),
+)
+
+
+def encode_cursor(created_at: datetime, log_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{log_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode()
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    try:
+        created_at, log_id = (
+            base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+        )
+        return datetime.fromisoformat(created_at), int(log_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def choose_bucket_size(since: datetime, until: datetime) -> str:
+    for bucket_size, max_range in TRAFFIC_BUCKETS:
+        if until - since <= max_range:
+            return bucket_size
+    return "day"
+
+
+def _row_values(row: Sequence[Any]) -> list[Any]:
+    return [
+        value.isoformat() if isinstance(value, datetime) else value
+        for value in row
+    ]
+
+
+async def iter_ndjson(rows: AsyncIterator[Sequence[Any]]):
+    buffer = io.StringIO()
+    async for row in rows:
+        json.dump(dict(zip(EXPORT_COLUMNS, _row_values(row))), buffer)
+        buffer.write("\n")
+        # Emit the export in chunks instead of one message per row
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+async def iter_csv(rows: AsyncIterator[Sequence[Any]]):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    async for row in rows:
+        writer.writerow(_row_values(row))
+        if buffer.tell() >= EXPORT_CHUNK_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
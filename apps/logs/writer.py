@@ -0,0 +1,142 @@
+import asyncio
+import logging
+from datetime import datetime
+
+from ad_looper.config import settings
+from ad_looper.metrics import Counter, Gauge
+from database.models import AsyncSessionLocal
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class LogWriter:
+    def __init__(
+        self,
+        queue_size: int,
+        batch_size: int,
+        flush_interval: float,
+    ) -> None:
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self._task: asyncio.Task | None = None
+
+    def put(
+        self,
+        url: str,
+        method: str,
+        status_code: int,
+        device_id: int,
+        duration_ms: float | None = None,
+    ) -> None:
+        now = datetime.utcnow()
+        record = {
+            "url": url,
+            "method": method,
+            "status_code": status_code,
+            "device_id": device_id,
+            "duration_ms": duration_ms,
+            "created_at": now,
+            "updated_at": now,
+        }
+        # Never make the request wait for the database, drop instead
+        try:
+            self.queue.put_nowait(record)
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        await self.queue.put(_STOP)
+        await self._task
+        self._task = None
+
+        # Anything logged while the writer was shutting down
+        batch = []
+        while not self.queue.empty():
+            record = self.queue.get_nowait()
+            if record is not _STOP:
+                batch.append(record)
+        if batch:
+            await self._flush(batch)
+
+    async def write(self, batch: list[dict]) -> None:
+        async with AsyncSessionLocal() as db:
+            await crud.create_logs(db, batch)
+
+    async def _flush(self, batch: list[dict]) -> None:
+        try:
+            await self.write(batch)
+        except Exception:
+            self.failed += len(batch)
+            logger.exception("Failed to write %d request logs", len(batch))
+        else:
+            self.written += len(batch)
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            record = await self.queue.get()
+            if record is _STOP:
+                break
+            batch = [record]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    record = self.queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        record = await asyncio.wait_for(
+                            self.queue.get(), timeout
+                        )
+                    except TimeoutError:
+                        break
+                if record is _STOP:
+                    stopping = True
+                    break
+                batch.append(record)
+            await self._flush(batch)
+
+
+log_writer = LogWriter(
+    queue_size=settings.logs.queue_size,
+    batch_size=settings.logs.batch_size,
+    flush_interval=settings.logs.flush_interval,
+)
+
+Counter(
+    "log_writer_written_total",
+    "Request logs written to the database",
+    function=lambda: log_writer.written,
+)
+Counter(
+    "log_writer_dropped_total",
+    "Request logs dropped because the queue was full",
+    function=lambda: log_writer.dropped,
+)
+Counter(
+    "log_writer_failed_total",
+    "Request logs lost to failed database writes",
+    function=lambda: log_writer.failed,
+)
+Gauge(
+    "log_writer_queue_size",
+    "Request logs waiting to be written",
+    function=lambda: log_writer.queue.qsize(),
+)
@@ -0,0 +1,35 @@
+import asyncio
+import logging
+
+from ad_looper.metrics import Counter
+from database.models import AsyncSessionLocal
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+media_blobs_collected_total = Counter(
+    "media_blobs_collected_total",
+    "Unused media blobs deleted with their files",
+)
+
+
+async def collect_blobs(batch_size: int) -> int:
+    total = 0
+    async with AsyncSessionLocal() as db:
+        while True:
+            collected = await crud.collect_blobs(db, batch_size)
+            total += collected
+            media_blobs_collected_total.inc(collected)
+            if collected < batch_size:
+                break
+    return total
+
+
+async def run_blob_collector(interval: float, batch_size: int) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await collect_blobs(batch_size)
+        except Exception:
+            logger.exception("Failed to collect unused media blobs")
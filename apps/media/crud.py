@@ -1,10 +1,21 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Collection, Sequence
+
 from fastapi import HTTPException
+from sqlalchemy import delete, func, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
+from starlette.concurrency import run_in_threadpool
 
-from database.models import Media
+from ad_looper.config import settings
+from apps.common.events import EntityEvent, publish
+from database.models import Media, MediaBlob, UploadChunk, UploadSession
 
-from .schemas import MediaCreate, MediaUpdate
+from . import store
+from .schemas import MediaCreate, MediaUpdate, UploadSessionCreate
 
 
 async def create_media(
@@ -32,6 +43,19 @@ async def get_media(db: AsyncSession, **kwargs) -> Media:
     return db_media
 
 
+async def get_media_file(db: AsyncSession, media_id: int):
+    # Only what a download needs, without the relationship loads
+    query = select(
+        Media.owner_id,
+        Media.filename,
+        Media.sha256,
+        Media.content_type,
+        Media.legacy_filename,
+    ).filter(Media.id == media_id)
+    result = await db.execute(query)
+    return result.first()
+
+
 async def get_media_list(db: AsyncSession, **kwargs):
     query = select(Media)
     for key, value in kwargs.items():
@@ -58,20 +82,127 @@ async def update_media(
 
     db.add(db_media)
     await db.commit()  # Commit the transaction
+    await publish_media_event(db_media)
     await db.refresh(db_media)  # Refresh the media instance
     return db_media
 
 
+async def acquire_blob(db: AsyncSession, sha256: str, size: int) -> None:
+    # The row stays locked until commit, so the blob can't be collected
+    # while the file is being put in place
+    stmt = pg_insert(MediaBlob).values(sha256=sha256, size=size, ref_count=1)
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[MediaBlob.sha256],
+        set_={"ref_count": MediaBlob.ref_count + 1},
+    )
+    await db.execute(stmt)
+
+
+async def release_blobs(db: AsyncSession, counts: Counter[str]) -> None:
+    # Referencing media rows must be flushed away before this. Sorted so
+    # concurrent releases lock rows in the same order. Unused blobs keep
+    # their row at zero: the file can only go once this has committed
+    for sha256, count in sorted(counts.items()):
+        await db.execute(
+            update(MediaBlob)
+            .where(MediaBlob.sha256 == sha256)
+            .values(ref_count=MediaBlob.ref_count - count),
+            execution_options={"synchronize_session": False},
+        )
+
+
+async def collect_blobs(db: AsyncSession, batch_size: int) -> int:
+    # Rows locked by acquire_blob are being reused and are skipped. If the
+    # commit fails the row stays at zero without its file, which the next
+    # upload of that content puts back and the next pass deletes
+    result = await db.execute(
+        select(MediaBlob.sha256)
+        .filter(MediaBlob.ref_count == 0)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    unused = result.scalars().all()
+    for sha256 in unused:
+        await run_in_threadpool(store.remove_blob, sha256)
+    if unused:
+        await db.execute(
+            delete(MediaBlob).where(MediaBlob.sha256.in_(unused)),
+            execution_options={"synchronize_session": False},
+        )
+    await db.commit()
+    return len(unused)
+
+
+async def release_legacy_files(
+    db: AsyncSession, legacy_filenames: Collection[str]
+) -> list[str]:
+    # Before the store, media with the same filename shared one flat file.
+    # Returns the files no flushed media row uses, to remove after commit
+    result = await db.execute(
+        select(Media.legacy_filename).filter(
+            Media.legacy_filename.in_(legacy_filenames)
+        )
+    )
+    used = set(result.scalars().all())
+    return [name for name in legacy_filenames if name not in used]
+
+
+async def get_owner_blob_counts(
+    db: AsyncSession, owner_id: int
+) -> Counter[str]:
+    result = await db.execute(
+        select(Media.sha256).filter(
+            Media.owner_id == owner_id, Media.sha256.is_not(None)
+        )
+    )
+    return Counter(result.scalars().all())
+
+
+async def get_owner_legacy_filenames(
+    db: AsyncSession, owner_id: int
+) -> set[str]:
+    result = await db.execute(
+        select(Media.legacy_filename).filter(
+            Media.owner_id == owner_id, Media.legacy_filename.is_not(None)
+        )
+    )
+    return set(result.scalars().all())
+
+
 async def set_media_filename(
-    db: AsyncSession, media_id: int, filename: str
+    db: AsyncSession,
+    media_id: int,
+    filename: str,
+    temp_path: Path,
+    size: int,
+    sha256: str,
+    content_type: str | None = None,
 ) -> Media:
     db_media = await get_media(db, id=media_id)
     if db_media is None:
         raise HTTPException(status_code=404, detail="Media not found")
 
+    previous = db_media.sha256
+    legacy_filename = db_media.legacy_filename
+    await acquire_blob(db, sha256, size)
+    await run_in_threadpool(store.place_blob, temp_path, sha256)
+
     db_media.filename = filename
+    db_media.size = size
+    db_media.sha256 = sha256
+    db_media.content_type = content_type
+    db_media.legacy_filename = None
     db.add(db_media)
+    unused = []
+    if previous is not None or legacy_filename is not None:
+        await db.flush()
+    if previous is not None:
+        await release_blobs(db, Counter([previous]))
+    if legacy_filename is not None:
+        unused = await release_legacy_files(db, [legacy_filename])
     await db.commit()  # Commit the transaction
+    await run_in_threadpool(store.remove_legacy_files, unused)
+    await publish_media_event(db_media)
     await db.refresh(db_media)  # Refresh the media instance
     return db_media
 
@@ -82,4 +213,160 @@ async def delete_media(db: AsyncSession, media_id: int) -> None:
         raise HTTPException(status_code=404, detail="Media not found")
 
     await db.delete(db_media)
+    unused = []
+    if db_media.sha256 is not None or db_media.legacy_filename is not None:
+        await db.flush()
+    if db_media.sha256 is not None:
+        await release_blobs(db, Counter([db_media.sha256]))
+    if db_media.legacy_filename is not None:
+        unused = await release_legacy_files(db, [db_media.legacy_filename])
     await db.commit()  # Commit the transaction
+    await run_in_threadpool(store.remove_legacy_files, unused)
+    await publish_media_event(db_media)
+
+
+def upload_expiry() -> datetime:
+    return datetime.utcnow() + timedelta(
+        seconds=settings.media.upload_session_ttl
+    )
+
+
+async def create_upload_session(
+    db: AsyncSession,
+    media_id: int,
+    owner_id: int,
+    upload: UploadSessionCreate,
+    filename: str,
+) -> UploadSession:
+    db_session = UploadSession(
+        media_id=media_id,
+        owner_id=owner_id,
+        filename=filename,
+        content_type=upload.content_type,
+        size=upload.size,
+        sha256=upload.sha256,
+        expires_at=upload_expiry(),
+    )
+    db.add(db_session)
+    await db.flush()
+    return db_session
+
+
+async def get_upload_session(
+    db: AsyncSession, session_id: int
+) -> UploadSession:
+    db_session = await db.get(UploadSession, session_id)
+    if db_session is None or db_session.expires_at < datetime.utcnow():
+        raise HTTPException(status_code=404, detail="Upload session not found")
+    return db_session
+
+
+async def get_upload_chunks(
+    db: AsyncSession, session_id: int
+) -> Sequence[tuple[int, int]]:
+    result = await db.execute(
+        select(UploadChunk.offset, UploadChunk.length).filter(
+            UploadChunk.session_id == session_id
+        )
+    )
+    return result.tuples().all()
+
+
+async def begin_upload_chunk(db: AsyncSession, session_id: int) -> bool:
+    # Counts the writer in before any byte is written. A worker that dies
+    # mid-chunk leaves the count up, and the session can only expire
+    result = await db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == session_id, UploadSession.status == "open")
+        .values(writers=UploadSession.writers + 1)
+        .returning(UploadSession.id),
+        execution_options={"synchronize_session": False},
+    )
+    await db.commit()
+    return result.scalar() is not None
+
+
+async def finish_upload_chunk(
+    db: AsyncSession, session_id: int, offset: int, length: int
+) -> None:
+    # Records what was written, if anything, as the writer leaves
+    if length:
+        stmt = pg_insert(UploadChunk).values(
+            session_id=session_id, offset=offset, length=length
+        )
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[UploadChunk.session_id, UploadChunk.offset],
+            set_={"length": func.greatest(UploadChunk.length, length)},
+        )
+        await db.execute(stmt)
+    # Every chunk keeps the session alive
+    await db.execute(
+        update(UploadSession)
+        .where(UploadSession.id == session_id)
+        .values(writers=UploadSession.writers - 1, expires_at=upload_expiry()),
+        execution_options={"synchronize_session": False},
+    )
+    await db.commit()
+
+
+async def set_upload_status(
+    db: AsyncSession, session_id: int, status: str, expected: str
+) -> bool:
+    # Compare-and-set, so only one request can finalize a session, and only
+    # once no chunk is being written to it
+    result = await db.execute(
+        update(UploadSession)
+        .where(
+            UploadSession.id == session_id,
+            UploadSession.status == expected,
+            UploadSession.writers == 0,
+        )
+        .values(status=status)
+        .returning(UploadSession.id),
+        execution_options={"synchronize_session": False},
+    )
+    await db.commit()
+    return result.scalar() is not None
+
+
+async def delete_upload_session(db: AsyncSession, session_id: int) -> None:
+    await db.execute(
+        delete(UploadSession).where(UploadSession.id == session_id),
+        execution_options={"synchronize_session": False},
+    )
+    await db.commit()
+
+
+async def delete_expired_upload_sessions(db: AsyncSession) -> list[int]:
+    result = await db.execute(
+        delete(UploadSession)
+        .where(UploadSession.expires_at < datetime.utcnow())
+        .returning(UploadSession.id),
+        execution_options={"synchronize_session": False},
+    )
+    await db.commit()
+    return list(result.scalars().all())
+
+
+async def get_upload_session_ids(
+    db: AsyncSession, session_ids: Sequence[int]
+) -> set[int]:
+    result = await db.execute(
+        select(UploadSession.id).filter(UploadSession.id.in_(session_ids))
+    )
+    return set(result.scalars().all())
+
+
+async def publish_media_event(db_media: Media) -> None:
+    await publish(
+        EntityEvent(
+            "media",
+            db_media.id,
+            db_media.owner_id,
+            {
+                "media_group_ids": [
+                    media_group.id for media_group in db_media.media_groups
+                ]
+            },
+        )
+    )
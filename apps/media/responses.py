@@ -0,0 +1,211 @@
+import os
+import secrets
+from email.utils import formatdate, parsedate_to_datetime
+from pathlib import Path
+from typing import BinaryIO
+from urllib.parse import quote
+
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+from ad_looper.config import settings
+from apps.display_devices.utils import etag_matches
+
+from .utils import RangeNotSatisfiable, parse_range
+
+
+def _read(file: BinaryIO, offset: int, size: int) -> bytes:
+    file.seek(offset)
+    return file.read(size)
+
+
+class MediaFileResponse(Response):
+    # Sends `ranges` of the file, as one body for a single range and as
+    # multipart/byteranges for several
+    def __init__(
+        self,
+        path: Path,
+        file_size: int,
+        ranges: list[tuple[int, int]],
+        status_code: int,
+        headers: dict[str, str],
+        media_type: str,
+    ) -> None:
+        self.path = path
+        self.status_code = status_code
+        self.parts = []
+        headers = dict(headers)
+        if len(ranges) > 1:
+            boundary = secrets.token_hex(16)
+            for start, end in ranges:
+                preamble = (
+                    f"--{boundary}\r\n"
+                    f"Content-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end}/{file_size}\r\n\r\n"
+                )
+                self.parts.append((preamble.encode(), start, end, b"\r\n"))
+            self.epilogue = f"--{boundary}--\r\n".encode()
+            headers["Content-Type"] = (
+                f"multipart/byteranges; boundary={boundary}"
+            )
+        else:
+            start, end = ranges[0]
+            self.parts.append((b"", start, end, b""))
+            self.epilogue = b""
+            headers["Content-Type"] = media_type
+            if status_code == 206:
+                headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+        headers["Content-Length"] = str(
+            sum(
+                len(preamble) + end - start + 1 + len(trailer)
+                for preamble, start, end, trailer in self.parts
+            )
+            + len(self.epilogue)
+        )
+        self.init_headers(headers)
+        self.background = None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        await send(
+            {
+                "type": "http.response.start",
+                "status": self.status_code,
+                "headers": self.raw_headers,
+            }
+        )
+        chunk_size = settings.media.chunk_size
+        file = await run_in_threadpool(open, self.path, "rb")
+        try:
+            for preamble, start, end, trailer in self.parts:
+                if preamble:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": preamble,
+                            "more_body": True,
+                        }
+                    )
+                offset = start
+                while offset <= end:
+                    size = min(chunk_size, end - offset + 1)
+                    chunk = await run_in_threadpool(_read, file, offset, size)
+                    if not chunk:
+                        # Shrunk while being sent; nothing sane to add
+                        raise RuntimeError(f"{self.path} was truncated")
+                    offset += len(chunk)
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": chunk,
+                            "more_body": True,
+                        }
+                    )
+                if trailer:
+                    await send(
+                        {
+                            "type": "http.response.body",
+                            "body": trailer,
+                            "more_body": True,
+                        }
+                    )
+        finally:
+            await run_in_threadpool(file.close)
+        await send({"type": "http.response.body", "body": self.epilogue})
+
+
+def not_modified_since(if_modified_since: str | None, mtime: float) -> bool:
+    if not if_modified_since:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since).timestamp()
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have whole seconds
+    return int(mtime) <= since
+
+
+def range_applies(if_range: str | None, etag: str | None, last_modified: str):
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('"'):
+        # Only a strong, exact match counts here
+        return etag is not None and if_range == etag
+    return if_range == last_modified
+
+
+def offloaded_response(
+    path: Path, delivery: str, headers: dict[str, str], media_type: str
+) -> Response:
+    # The proxy replaces the empty body with the file and takes care of
+    # Range itself
+    if delivery == "x-accel-redirect":
+        prefix = settings.media.accel_redirect_prefix
+        relative = path.relative_to(settings.media_folder).as_posix()
+        headers["X-Accel-Redirect"] = prefix + quote(relative)
+    else:
+        headers["X-Sendfile"] = str(path.resolve())
+    return Response(status_code=200, headers=headers, media_type=media_type)
+
+
+async def media_file_response(
+    request_headers: Headers,
+    path: Path,
+    filename: str | None,
+    sha256: str | None,
+    content_type: str | None,
+    delivery: str = "stream",
+) -> Response:
+    stat = await run_in_threadpool(os.stat, path)
+    file_size = stat.st_size
+    media_type = content_type or "application/octet-stream"
+    # The content hash is a strong validator; files without one get none
+    etag = f'"{sha256}"' if sha256 else None
+    last_modified = formatdate(stat.st_mtime, usegmt=True)
+    headers = {"Accept-Ranges": "bytes", "Last-Modified": last_modified}
+    if etag:
+        headers["ETag"] = etag
+
+    if_none_match = request_headers.get("if-none-match")
+    if etag and etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers=headers)
+    if if_none_match is None and not_modified_since(
+        request_headers.get("if-modified-since"), stat.st_mtime
+    ):
+        return Response(status_code=304, headers=headers)
+
+    if filename:
+        quoted = quote(filename)
+        if quoted == filename:
+            disposition = f'attachment; filename="{filename}"'
+        else:
+            disposition = f"attachment; filename*=utf-8''{quoted}"
+        headers["Content-Disposition"] = disposition
+
+    if delivery != "stream":
+        return offloaded_response(path, delivery, headers, media_type)
+
+    ranges = None
+    range_header = request_headers.get("range")
+    if range_header and range_applies(
+        request_headers.get("if-range"), etag, last_modified
+    ):
+        try:
+            ranges = parse_range(range_header, file_size)
+        except RangeNotSatisfiable:
+            headers["Content-Range"] = f"bytes */{file_size}"
+            return Response(status_code=416, headers=headers)
+
+    if ranges is None:
+        if file_size == 0:
+            return Response(
+                status_code=200, headers=headers, media_type=media_type
+            )
+        return MediaFileResponse(
+            path, file_size, [(0, file_size - 1)], 200, headers, media_type
+        )
+    return MediaFileResponse(
+        path, file_size, ranges, 206, headers, media_type
+    )
@@ -1,18 +1,82 @@
-from pathlib import Path
-from typing import Sequence
+from typing import AsyncIterator, Sequence
 
-from fastapi import APIRouter, Depends, HTTPException, UploadFile
+from fastapi import (
+    APIRouter,
+    Depends,
+    HTTPException,
+    Query,
+    Request,
+    UploadFile,
+)
+from fastapi.routing import APIRoute
 from sqlalchemy.ext.asyncio import AsyncSession
-from starlette.responses import FileResponse
+from starlette.concurrency import run_in_threadpool
 
+from ad_looper.config import settings
 from apps.common.dependencies import get_db, get_request_user
-from apps.media.utils import write_file
-from database.models import User
+from apps.media.responses import media_file_response
+from apps.media.store import media_file_path
+from apps.media.utils import (
+    discard_file,
+    iter_upload,
+    safe_filename,
+    write_stream,
+)
+from database.models import Media, UploadSession, User
 
 from . import crud
-from .schemas import MediaCreate, MediaResponse, MediaUpdate
+from .schemas import (
+    MediaCreate,
+    MediaResponse,
+    MediaUpdate,
+    ReceivedRange,
+    UploadSessionCreate,
+    UploadSessionResponse,
+)
+from .uploads import (
+    create_part_file,
+    hash_file,
+    merge_ranges,
+    part_path,
+    remove_part_files,
+    write_chunk,
+)
+
+
+class UploadSizeRoute(APIRoute):
+    # Form bodies are spooled to disk before the endpoint runs, so oversized
+    # requests are turned away on their Content-Length before that
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def route_handler(request: Request):
+            content_length = request.headers.get("content-length")
+            if content_length is None:
+                content_type = request.headers.get("content-type", "")
+                if content_type.startswith("multipart/"):
+                    raise HTTPException(
+                        status_code=411, detail="Content-Length required"
+                    )
+                return await handler(request)
+
+            try:
+                size = int(content_length)
+            except ValueError:
+                size = -1
+            if size < 0:
+                raise HTTPException(
+                    status_code=400, detail="Invalid Content-Length"
+                )
+            if size > settings.media.max_upload_size:
+                raise HTTPException(status_code=413, detail="File too large")
+            return await handler(request)
+
+        return route_handler
+
 
-router = APIRouter(prefix="/media", tags=["Media"])
+router = APIRouter(
+    prefix="/media", tags=["Media"], route_class=UploadSizeRoute
+)
 
 
 @router.get("")
@@ -38,27 +102,41 @@ async def read_media_item(
 
 @router.get(
     "/{media_id}/download",
-    description="The file will be sent in bytes",
+    description=(
+        "The file will be sent in bytes. Supports `Range` (also several "
+        "ranges at once), `If-Range`, and `If-None-Match` with the `ETag`, "
+        "which is the file's SHA-256"
+    ),
+    responses={
+        206: {"description": "Part of the file"},
+        304: {"description": "File unchanged"},
+        416: {"description": "Range not satisfiable"},
+    },
 )
 async def download_media_item(
     media_id: int,
+    request: Request,
     user: User = Depends(get_request_user),
     db: AsyncSession = Depends(get_db),
 ):
-    media_item = await crud.get_media(db, id=media_id)
-    if media_item is None:
+    media_file = await crud.get_media_file(db, media_id)
+    if media_file is None:
         raise HTTPException(status_code=404, detail="Media not found")
-    if user != media_item.owner:
+    if user.id != media_file.owner_id:
         raise HTTPException(status_code=403, detail="Forbidden")
-    file_path = Path("uploaded_media") / str(media_item.filename)
-
-    if not file_path.is_file():
+    file_path = await run_in_threadpool(
+        media_file_path, media_file.sha256, media_file.legacy_filename
+    )
+    if file_path is None:
         raise HTTPException(status_code=404, detail="File not found")
 
-    return FileResponse(
+    return await media_file_response(
+        request.headers,
         file_path,
-        filename=media_item.filename,
-        media_type="application/octet-stream",
+        media_file.filename,
+        media_file.sha256,
+        media_file.content_type,
+        delivery=settings.media.delivery,
     )
 
 
@@ -75,10 +153,49 @@ async def create_media_item(
     return await crud.create_media(db, media, user.id)
 
 
+async def check_upload_target(
+    db: AsyncSession, user: User, media_id: int
+) -> None:
+    if user != (await crud.get_media(db, id=media_id)).owner:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    # Gives the connection back to the pool for the length of the upload
+    await db.rollback()
+
+
+async def store_upload(
+    db: AsyncSession,
+    media_id: int,
+    filename: str,
+    chunks: AsyncIterator[bytes],
+    content_type: str | None,
+) -> Media:
+    temp_path, size, sha256 = await write_stream(
+        chunks, settings.media.max_upload_size
+    )
+    try:
+        return await crud.set_media_filename(
+            db,
+            media_id,
+            filename,
+            temp_path,
+            size=size,
+            sha256=sha256,
+            content_type=content_type,
+        )
+    finally:
+        # Already moved into the store unless something failed
+        await run_in_threadpool(discard_file, temp_path)
+
+
 @router.post(
     "/{media_id}/upload",
     status_code=201,
-    description="The file should be uploaded using this endpoint. Only bytes should be sent",
+    description=(
+        "Uploads the file as multipart form data. Deprecated: the form is "
+        "buffered to disk before it is stored, use `PUT /media/{media_id}"
+        "/content` instead"
+    ),
+    deprecated=True,
 )
 async def upload_media_item(
     media_id: int,
@@ -86,14 +203,45 @@ async def upload_media_item(
     user: User = Depends(get_request_user),
     db: AsyncSession = Depends(get_db),
 ) -> MediaResponse:
-    if user != (await crud.get_media(db, id=media_id)).owner:
-        raise HTTPException(status_code=403, detail="Forbidden")
-    if file.filename is None:
-        raise HTTPException(status_code=400, detail="Error reading filename")
+    filename = safe_filename(file.filename)
+    await check_upload_target(db, user, media_id)
+
+    return await store_upload(
+        db,
+        media_id,
+        filename,
+        iter_upload(file),
+        content_type=file.content_type,
+    )
 
-    await write_file(file)
 
-    return await crud.set_media_filename(db, media_id, file.filename)
+@router.put(
+    "/{media_id}/content",
+    status_code=201,
+    description=(
+        "Uploads the file as the raw request body, streamed to disk as it "
+        "arrives. Preferred over `upload` for large files"
+    ),
+)
+async def put_media_content(
+    media_id: int,
+    request: Request,
+    filename: str = Query(),
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> MediaResponse:
+    filename = safe_filename(filename)
+    await check_upload_target(db, user, media_id)
+
+    return await store_upload(
+        db,
+        media_id,
+        filename,
+        request.stream(),
+        content_type=request.headers.get(
+            "content-type", "application/octet-stream"
+        ),
+    )
 
 
 @router.patch("/{media_id}")
@@ -124,3 +272,166 @@ async def delete_media_item(
         raise HTTPException(status_code=403, detail="Forbidden")
     await crud.delete_media(db, media_id)
     return
+
+
+async def get_owned_upload_session(
+    db: AsyncSession, user: User, session_id: int
+) -> UploadSession:
+    upload = await crud.get_upload_session(db, session_id)
+    if upload.owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return upload
+
+
+async def upload_session_response(
+    db: AsyncSession, upload: UploadSession
+) -> UploadSessionResponse:
+    chunks = await crud.get_upload_chunks(db, upload.id)
+    response = UploadSessionResponse.model_validate(upload)
+    response.received = [
+        ReceivedRange(offset=offset, length=length)
+        for offset, length in merge_ranges(chunks)
+    ]
+    return response
+
+
+@router.post(
+    "/{media_id}/uploads",
+    status_code=201,
+    description=(
+        "Starts a resumable upload. Send the file in chunks to "
+        "`/media/uploads/{id}/chunks?offset=`, in any order and in "
+        "parallel, then finalize it. `received` lists what has arrived"
+    ),
+)
+async def create_upload_session(
+    media_id: int,
+    upload: UploadSessionCreate,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> UploadSessionResponse:
+    filename = safe_filename(upload.filename)
+    if upload.size > settings.media.max_upload_size:
+        raise HTTPException(status_code=413, detail="File too large")
+    media_file = await crud.get_media_file(db, media_id)
+    if media_file is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    if user.id != media_file.owner_id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+    db_session = await crud.create_upload_session(
+        db, media_id, user.id, upload, filename
+    )
+    await run_in_threadpool(
+        create_part_file, part_path(db_session.id), upload.size
+    )
+    await db.commit()
+    return UploadSessionResponse.model_validate(db_session)
+
+
+@router.get("/uploads/{session_id}")
+async def read_upload_session(
+    session_id: int,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> UploadSessionResponse:
+    upload = await get_owned_upload_session(db, user, session_id)
+    return await upload_session_response(db, upload)
+
+
+@router.put(
+    "/uploads/{session_id}/chunks",
+    status_code=204,
+    description=(
+        "Writes the raw request body at `offset`. Re-sending a chunk is "
+        "safe, so a failed one can simply be retried"
+    ),
+)
+async def put_upload_chunk(
+    session_id: int,
+    request: Request,
+    offset: int = Query(ge=0),
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+):
+    upload = await get_owned_upload_session(db, user, session_id)
+    if offset >= upload.size:
+        raise HTTPException(status_code=416, detail="Offset past the end")
+    limit = upload.size - offset
+    # Also gives the connection back to the pool while the chunk arrives
+    if not await crud.begin_upload_chunk(db, session_id):
+        raise HTTPException(status_code=409, detail="Upload is finalizing")
+
+    length = 0
+    try:
+        length = await write_chunk(
+            request.stream(), part_path(session_id), offset, limit
+        )
+    finally:
+        await crud.finish_upload_chunk(db, session_id, offset, length)
+    if length == 0:
+        raise HTTPException(status_code=400, detail="Empty chunk")
+
+
+@router.post(
+    "/uploads/{session_id}/finalize",
+    description=(
+        "Checks that every byte arrived and that the hash matches, then "
+        "makes the file the media's content"
+    ),
+)
+async def finalize_upload(
+    session_id: int,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> MediaResponse:
+    upload = await get_owned_upload_session(db, user, session_id)
+    if not await crud.set_upload_status(db, session_id, "finalizing", "open"):
+        raise HTTPException(
+            status_code=409, detail="Upload is finalizing or receiving chunks"
+        )
+
+    path = part_path(session_id)
+    try:
+        received = merge_ranges(await crud.get_upload_chunks(db, session_id))
+        # Gives the connection back to the pool while the file is hashed.
+        # A commit, unlike a rollback, leaves `upload` loaded
+        await db.commit()
+        if received != [(0, upload.size)]:
+            raise HTTPException(status_code=409, detail="Upload incomplete")
+        sha256 = await run_in_threadpool(hash_file, path)
+        if upload.sha256 is not None and sha256 != upload.sha256:
+            raise HTTPException(status_code=422, detail="Checksum mismatch")
+
+        # The part file is renamed into the store, not copied
+        db_media = await crud.set_media_filename(
+            db,
+            upload.media_id,
+            upload.filename,
+            path,
+            size=upload.size,
+            sha256=sha256,
+            content_type=upload.content_type,
+        )
+    except BaseException:
+        await db.rollback()
+        if await run_in_threadpool(path.exists):
+            await crud.set_upload_status(db, session_id, "open", "finalizing")
+        else:
+            # The part file already went into the store, so there is
+            # nothing left to finalize again
+            await crud.delete_upload_session(db, session_id)
+        raise
+    await crud.delete_upload_session(db, session_id)
+    return db_media
+
+
+@router.delete("/uploads/{session_id}", status_code=204)
+async def delete_upload_session(
+    session_id: int,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+):
+    await get_owned_upload_session(db, user, session_id)
+    await crud.delete_upload_session(db, session_id)
+    await run_in_threadpool(remove_part_files, [session_id])
@@ -1,6 +1,7 @@
+from datetime import datetime
 from typing import Sequence
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ConfigDict, Field
 
 from apps.common.schemas import MediaGroupSimpleResponse, MediaSimpleResponse
 from apps.media_groups.schemas import MediaGroupResponse
@@ -18,3 +19,28 @@ class MediaUpdate(BaseModel):
 class MediaResponse(MediaSimpleResponse):
     media_groups: Sequence[MediaGroupSimpleResponse]
     schedules: Sequence[ScheduleResponse]
+
+
+class UploadSessionCreate(BaseModel):
+    filename: str
+    size: int = Field(gt=0)
+    sha256: str | None = Field(None, pattern="^[0-9a-f]{64}$")
+    content_type: str | None = None
+
+
+class ReceivedRange(BaseModel):
+    offset: int
+    length: int
+
+
+class UploadSessionResponse(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    media_id: int
+    filename: str
+    size: int
+    sha256: str | None = None
+    status: str
+    expires_at: datetime
+    received: list[ReceivedRange] = []
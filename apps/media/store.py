@@ -0,0 +1,59 @@
+import os
+from pathlib import Path
+from typing import Iterable
+
+from ad_looper.config import settings
+
+
+# Two levels of 256 directories keep each one small even with millions of
+# blobs: ab/cd/abcd...
+def blob_path(sha256: str) -> Path:
+    return settings.media_folder / sha256[:2] / sha256[2:4] / sha256
+
+
+# Media uploaded before the content-addressed store keep their file under
+# the name it was uploaded with
+def legacy_path(legacy_filename: str) -> Path:
+    return settings.media_folder / legacy_filename
+
+
+def media_file_path(
+    sha256: str | None, legacy_filename: str | None
+) -> Path | None:
+    if sha256 is not None:
+        path = blob_path(sha256)
+        if path.is_file():
+            return path
+    if legacy_filename is not None:
+        path = legacy_path(legacy_filename)
+        if path.is_file():
+            return path
+    return None
+
+
+def fsync_directory(path: Path) -> None:
+    directory = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(directory)
+    finally:
+        os.close(directory)
+
+
+def place_blob(temp_path: Path, sha256: str) -> None:
+    path = blob_path(sha256)
+    if path.is_file():
+        # Same content is already stored
+        temp_path.unlink(missing_ok=True)
+        return
+    path.parent.mkdir(parents=True, exist_ok=True)
+    os.replace(temp_path, path)
+    fsync_directory(path.parent)
+
+
+def remove_blob(sha256: str) -> None:
+    blob_path(sha256).unlink(missing_ok=True)
+
+
+def remove_legacy_files(legacy_filenames: Iterable[str]) -> None:
+    for legacy_filename in legacy_filenames:
+        legacy_path(legacy_filename).unlink(missing_ok=True)
@@ -0,0 +1,143 @@
+import asyncio
+import hashlib
+import logging
+import os
+import time
+from pathlib import Path
+from typing import AsyncIterator, Sequence
+
+from fastapi import HTTPException
+from starlette.concurrency import run_in_threadpool
+
+from ad_looper.config import settings
+from ad_looper.metrics import Counter
+from database.models import AsyncSessionLocal
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+upload_sessions_purged_total = Counter(
+    "upload_sessions_purged_total",
+    "Expired upload sessions deleted with their part files",
+)
+
+
+# Inside media_folder so a finished part file can be renamed into the store
+def uploads_folder() -> Path:
+    return settings.media_folder / ".uploads"
+
+
+def part_path(session_id: int) -> Path:
+    return uploads_folder() / f"{session_id}.part"
+
+
+def create_part_file(path: Path, size: int) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # Sparse, so chunks can land anywhere without allocating the rest
+    with open(path, "wb") as file:
+        file.truncate(size)
+
+
+def _pwrite(fd: int, data: bytearray, offset: int) -> None:
+    view = memoryview(data)
+    while view:
+        written = os.pwrite(fd, view, offset)
+        view = view[written:]
+        offset += written
+
+
+async def write_chunk(
+    chunks: AsyncIterator[bytes], path: Path, offset: int, limit: int
+) -> int:
+    # Writes the request body at `offset`, at most `limit` bytes. Chunks of
+    # one session can be written concurrently, each with its own fd
+    fd = await run_in_threadpool(os.open, path, os.O_WRONLY)
+    length = 0
+    buffer = bytearray()
+    try:
+        async for chunk in chunks:
+            if length + len(buffer) + len(chunk) > limit:
+                raise HTTPException(
+                    status_code=413, detail="Chunk goes past the upload size"
+                )
+            buffer += chunk
+            if len(buffer) >= settings.media.chunk_size:
+                await run_in_threadpool(_pwrite, fd, buffer, offset + length)
+                length += len(buffer)
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_pwrite, fd, buffer, offset + length)
+            length += len(buffer)
+        # A chunk is only recorded once it is on disk
+        await run_in_threadpool(os.fsync, fd)
+    finally:
+        await run_in_threadpool(os.close, fd)
+    return length
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        while chunk := file.read(settings.media.chunk_size):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def merge_ranges(chunks: Sequence[tuple[int, int]]) -> list[tuple[int, int]]:
+    # (offset, length) pairs in, received (offset, length) spans out
+    merged: list[list[int]] = []
+    for offset, length in sorted(chunks):
+        if merged and offset <= merged[-1][0] + merged[-1][1]:
+            last = merged[-1]
+            last[1] = max(last[1], offset + length - last[0])
+        else:
+            merged.append([offset, length])
+    return [(offset, length) for offset, length in merged]
+
+
+def remove_part_files(session_ids: Sequence[int]) -> None:
+    for session_id in session_ids:
+        part_path(session_id).unlink(missing_ok=True)
+
+
+def find_orphaned_part_files(max_age: float) -> dict[int, Path]:
+    # Part files old enough that their session can't still be committing
+    folder = uploads_folder()
+    if not folder.is_dir():
+        return {}
+    cutoff = time.time() - max_age
+    orphans = {}
+    for path in folder.glob("*.part"):
+        if path.stem.isdigit() and path.stat().st_mtime < cutoff:
+            orphans[int(path.stem)] = path
+    return orphans
+
+
+async def purge_upload_sessions() -> int:
+    async with AsyncSessionLocal() as db:
+        expired = await crud.delete_expired_upload_sessions(db)
+        await run_in_threadpool(remove_part_files, expired)
+
+        # Files whose session is gone, e.g. deleted with its media
+        candidates = await run_in_threadpool(
+            find_orphaned_part_files, settings.media.upload_session_ttl
+        )
+        if candidates:
+            live = await crud.get_upload_session_ids(db, list(candidates))
+            for session_id, path in candidates.items():
+                if session_id not in live:
+                    await run_in_threadpool(path.unlink, missing_ok=True)
+
+    upload_sessions_purged_total.inc(len(expired))
+    return len(expired)
+
+
+async def run_upload_cleaner(interval: float) -> None:
+    while True:
+        try:
+            purged = await purge_upload_sessions()
+            logger.info("Purged %d expired upload sessions", purged)
+        except Exception:
+            logger.exception("Failed to purge upload sessions")
+        await asyncio.sleep(interval)
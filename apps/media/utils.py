@@ -1,14 +1,123 @@
-import aiofiles
-from fastapi import UploadFile
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+from typing import AsyncIterator, BinaryIO
+
+from fastapi import HTTPException, UploadFile
+from starlette.concurrency import run_in_threadpool
 
 from ad_looper.config import settings
 
 
-async def write_file(file: UploadFile):
-    path = settings.media_folder / str(file.filename)
-    async with aiofiles.open(path, "wb") as buffer:
-        while True:
-            chunk = await file.read(1024)
-            if not chunk:
-                break
-            await buffer.write(chunk)
+def safe_filename(filename: str | None) -> str:
+    # Only the last path component, so a name can't escape media_folder
+    name = Path(filename or "").name
+    if name in ("", ".", ".."):
+        raise HTTPException(status_code=400, detail="Invalid filename")
+    return name
+
+
+async def iter_upload(file: UploadFile) -> AsyncIterator[bytes]:
+    while chunk := await file.read(settings.media.chunk_size):
+        yield chunk
+
+
+def _write(file: BinaryIO, digest, data: bytearray) -> None:
+    # hashlib releases the GIL for large buffers, so hashing happens in
+    # the same thread hop as the write
+    digest.update(data)
+    file.write(data)
+
+
+def _finish(file: BinaryIO) -> None:
+    file.flush()
+    os.fsync(file.fileno())
+    file.close()
+
+
+def discard_file(temp_path: Path) -> None:
+    temp_path.unlink(missing_ok=True)
+
+
+async def write_stream(
+    chunks: AsyncIterator[bytes], max_size: int
+) -> tuple[Path, int, str]:
+    # Staged in a temp file on the same filesystem as the store, so it can
+    # be renamed into place once its hash is known
+    folder = settings.media_folder
+    folder.mkdir(parents=True, exist_ok=True)
+    fd, temp_name = tempfile.mkstemp(dir=folder, prefix=".upload-")
+    temp_path = Path(temp_name)
+    file = os.fdopen(fd, "wb", buffering=0)
+    digest = hashlib.sha256()
+    size = 0
+    buffer = bytearray()
+    try:
+        async for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise HTTPException(status_code=413, detail="File too large")
+            buffer += chunk
+            # Request bodies arrive in small chunks; writing them in large
+            # ones keeps the number of thread pool hops low
+            if len(buffer) >= settings.media.chunk_size:
+                await run_in_threadpool(_write, file, digest, buffer)
+                buffer.clear()
+        if buffer:
+            await run_in_threadpool(_write, file, digest, buffer)
+        await run_in_threadpool(_finish, file)
+    except BaseException:
+        file.close()
+        await run_in_threadpool(discard_file, temp_path)
+        raise
+    return temp_path, size, digest.hexdigest()
+
+
+# More ranges than this are answered with the whole file
+MAX_RANGES = 16
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def parse_range(header: str, size: int) -> list[tuple[int, int]] | None:
+    # Inclusive (start, end) pairs, sorted and merged. None means the
+    # header is to be ignored and the whole file sent
+    unit, _, specs = header.partition("=")
+    if unit.strip().lower() != "bytes":
+        return None
+    ranges = []
+    for spec in specs.split(","):
+        first, dash, last = spec.strip().partition("-")
+        if not dash or not (first or last):
+            return None
+        if not (first or "0").isdigit() or not (last or "0").isdigit():
+            return None
+        if not first:
+            # Suffix range: the last N bytes, of which an empty file has none
+            if int(last) == 0 or size == 0:
+                continue
+            ranges.append((max(size - int(last), 0), size - 1))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            end = int(last) if last else size - 1
+            ranges.append((start, min(end, size - 1)))
+
+    if not ranges:
+        raise RangeNotSatisfiable
+    ranges.sort()
+    merged = [ranges[0]]
+    for start, end in ranges[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    if len(merged) > MAX_RANGES:
+        return None
+    return merged
@@ -4,6 +4,7 @@ from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
+from apps.common.events import EntityEvent, publish
 from database.models import MediaGroup, MediaGroupMedia
 
 from .schemas import MediaGroupCreate, MediaGroupUpdate
@@ -73,6 +74,14 @@ async def delete_media_group(db: AsyncSession, media_group_id: int) -> None:
 
     await db.delete(db_media_group)
     await db.commit()  # Commit the transaction
+    await publish(
+        EntityEvent(
+            "media_group",
+            media_group_id,
+            db_media_group.owner_id,
+            {"deleted": True},
+        )
+    )
 
 
 async def add_media_to_media_group(
@@ -83,6 +92,7 @@ async def add_media_to_media_group(
     )
     db.add(media_group_media_db)
     await db.commit()
+    await publish(EntityEvent("media_group", media_group_id))
     await db.refresh(media_group_media_db)
     return media_group_media_db
 
@@ -102,5 +112,6 @@ async def remove_media_from_media_group(
         raise HTTPException(status_code=404, detail="Media not found")
     await db.delete(db_media_group_media)
     await db.commit()
+    await publish(EntityEvent("media_group", media_group_id))
 
     return db_media_group_media
@@ -0,0 +1,3 @@
+from .routers import router as router
+
+__all__ = ['router']
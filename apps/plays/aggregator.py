@@ -0,0 +1,37 @@
+import asyncio
+import logging
+
+from ad_looper.metrics import Counter
+from database.models import AsyncSessionLocal
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+play_events_aggregated_total = Counter(
+    "play_events_aggregated_total",
+    "Play events folded into the hourly rollups",
+)
+
+
+async def aggregate_plays(batch_size: int, max_batches: int) -> int:
+    total = 0
+    async with AsyncSessionLocal() as db:
+        for _ in range(max_batches):
+            aggregated = await crud.aggregate_play_events(db, batch_size)
+            total += aggregated
+            play_events_aggregated_total.inc(aggregated)
+            if aggregated < batch_size:
+                break
+    return total
+
+
+async def run_play_aggregator(
+    interval: float, batch_size: int, max_batches: int
+) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await aggregate_plays(batch_size, max_batches)
+        except Exception:
+            logger.exception("Failed to aggregate play events")
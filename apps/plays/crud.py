@@ -0,0 +1,178 @@
+from datetime import datetime
+from typing import Sequence
+
+from sqlalchemy import delete, func, insert, literal_column, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.models import DisplayDevice, Media, PlayEvent, PlayRollup
+
+PLAY_EVENT_COLUMNS = ("device_id", "media_id", "started_at", "duration")
+
+
+async def get_owned_media_ids(
+    db: AsyncSession, owner_id: int, media_ids: Sequence[int]
+) -> set[int]:
+    query = select(Media.id).filter(
+        Media.id.in_(media_ids), Media.owner_id == owner_id
+    )
+    result = await db.execute(query)
+    return set(result.scalars().all())
+
+
+async def create_play_events(
+    db: AsyncSession, records: Sequence[tuple[int, int, datetime, float]]
+) -> None:
+    connection = await db.connection()
+    if connection.dialect.driver == "asyncpg":
+        # COPY skips per-row statement overhead, which dominates for
+        # batches of thousands of small rows
+        raw = await connection.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            PlayEvent.__tablename__,
+            records=records,
+            columns=PLAY_EVENT_COLUMNS,
+        )
+    else:
+        await db.execute(
+            insert(PlayEvent),
+            [dict(zip(PLAY_EVENT_COLUMNS, record)) for record in records],
+        )
+    await db.commit()
+
+
+async def aggregate_play_events(db: AsyncSession, batch_size: int) -> int:
+    # Takes a batch of events off the queue and folds it into the hourly
+    # rollups in one statement. SKIP LOCKED lets several workers aggregate
+    # at once without picking up the same events
+    pending = (
+        select(PlayEvent.id)
+        .order_by(PlayEvent.id)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    claimed = (
+        delete(PlayEvent)
+        .where(PlayEvent.id.in_(pending.scalar_subquery()))
+        .returning(
+            PlayEvent.media_id,
+            PlayEvent.device_id,
+            PlayEvent.started_at,
+            PlayEvent.duration,
+        )
+        .cte("claimed")
+    )
+    # Inlined so the GROUP BY expression matches the selected one exactly
+    bucket = func.date_trunc(literal_column("'hour'"), claimed.c.started_at)
+    rows = (
+        select(
+            claimed.c.media_id,
+            claimed.c.device_id,
+            bucket,
+            func.count(),
+            func.sum(claimed.c.duration),
+        )
+        .group_by(claimed.c.media_id, claimed.c.device_id, bucket)
+        # Sorted keys keep concurrent aggregators from deadlocking
+        .order_by(claimed.c.media_id, claimed.c.device_id, bucket)
+    )
+    rollup = pg_insert(PlayRollup).from_select(
+        ["media_id", "device_id", "bucket", "plays", "play_seconds"], rows
+    )
+    rollup = rollup.on_conflict_do_update(
+        index_elements=[
+            PlayRollup.media_id,
+            PlayRollup.device_id,
+            PlayRollup.bucket,
+        ],
+        set_={
+            "plays": PlayRollup.plays + rollup.excluded.plays,
+            "play_seconds": PlayRollup.play_seconds
+            + rollup.excluded.play_seconds,
+        },
+    )
+    query = (
+        select(func.count())
+        .select_from(claimed)
+        .add_cte(rollup.cte("rolled_up"))
+    )
+    aggregated = (await db.execute(query)).scalar_one()
+    await db.commit()
+    return aggregated
+
+
+def _rollup_range(query, since: datetime, until: datetime):
+    return query.filter(PlayRollup.bucket >= since, PlayRollup.bucket < until)
+
+
+async def get_media_plays_by_device(
+    db: AsyncSession, media_id: int, since: datetime, until: datetime
+):
+    query = _rollup_range(
+        select(
+            PlayRollup.device_id,
+            func.sum(PlayRollup.plays).label("plays"),
+            func.sum(PlayRollup.play_seconds).label("play_seconds"),
+        )
+        .filter(PlayRollup.media_id == media_id)
+        .group_by(PlayRollup.device_id)
+        .order_by(PlayRollup.device_id),
+        since,
+        until,
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
+async def get_media_play_series(
+    db: AsyncSession, media_id: int, since: datetime, until: datetime
+):
+    query = _rollup_range(
+        select(
+            PlayRollup.bucket,
+            func.sum(PlayRollup.plays).label("plays"),
+            func.sum(PlayRollup.play_seconds).label("play_seconds"),
+        )
+        .filter(PlayRollup.media_id == media_id)
+        .group_by(PlayRollup.bucket)
+        .order_by(PlayRollup.bucket),
+        since,
+        until,
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
+async def get_device_plays_by_media(
+    db: AsyncSession, device_id: int, since: datetime, until: datetime
+):
+    query = _rollup_range(
+        select(
+            PlayRollup.media_id,
+            func.sum(PlayRollup.plays).label("plays"),
+            func.sum(PlayRollup.play_seconds).label("play_seconds"),
+        )
+        .filter(PlayRollup.device_id == device_id)
+        .group_by(PlayRollup.media_id)
+        .order_by(PlayRollup.media_id),
+        since,
+        until,
+    )
+    result = await db.execute(query)
+    return result.all()
+
+
+async def get_media_owner_id(db: AsyncSession, media_id: int) -> int | None:
+    result = await db.execute(
+        select(Media.owner_id).filter(Media.id == media_id)
+    )
+    return result.scalar()
+
+
+async def get_display_device_owner_id(
+    db: AsyncSession, device_id: int
+) -> int | None:
+    result = await db.execute(
+        select(DisplayDevice.owner_id).filter(DisplayDevice.id == device_id)
+    )
+    return result.scalar()
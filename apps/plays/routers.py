@@ -0,0 +1,74 @@
+from datetime import datetime
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from apps.common.dependencies import get_db, get_request_user, get_valid_token
+from apps.common.schemas import TokenInfo
+from database.models import User
+
+from . import services
+from .schemas import (
+    DevicePlayReport,
+    MediaPlayReport,
+    MediaPlaySeries,
+    PlayBatch,
+    PlayBatchResult,
+)
+
+router = APIRouter(prefix="/plays", tags=["Plays"])
+
+REPORT_DESCRIPTION = (
+    "Read from the hourly rollups, so plays from the last aggregation "
+    "interval may be missing. Defaults to the last 7 days"
+)
+
+
+@router.post(
+    "",
+    description=(
+        "Records a batch of plays for the calling device. Needs a device "
+        "token. Plays of unknown or foreign media are reported back by index"
+    ),
+)
+async def create_plays(
+    batch: PlayBatch,
+    token: TokenInfo = Depends(get_valid_token),
+    db: AsyncSession = Depends(get_db),
+) -> PlayBatchResult:
+    if token.display_device_id is None:
+        raise HTTPException(status_code=403, detail="Device token required")
+    return await services.ingest_plays(db, token, batch)
+
+
+@router.get("/media/{media_id}", description=REPORT_DESCRIPTION)
+async def read_media_plays(
+    media_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> MediaPlayReport:
+    return await services.get_media_report(db, user, media_id, since, until)
+
+
+@router.get("/media/{media_id}/hourly", description=REPORT_DESCRIPTION)
+async def read_media_play_series(
+    media_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> MediaPlaySeries:
+    return await services.get_media_series(db, user, media_id, since, until)
+
+
+@router.get("/devices/{device_id}", description=REPORT_DESCRIPTION)
+async def read_device_plays(
+    device_id: int,
+    since: datetime | None = None,
+    until: datetime | None = None,
+    user: User = Depends(get_request_user),
+    db: AsyncSession = Depends(get_db),
+) -> DevicePlayReport:
+    return await services.get_device_report(db, user, device_id, since, until)
@@ -0,0 +1,63 @@
+from datetime import datetime
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class PlayEventCreate(BaseModel):
+    media_id: int
+    started_at: datetime
+    # Seconds the media was on screen
+    duration: float = Field(ge=0)
+
+
+class PlayBatch(BaseModel):
+    events: list[PlayEventCreate] = Field(min_length=1, max_length=10_000)
+
+
+class PlayRejection(BaseModel):
+    index: int
+    media_id: int
+    detail: str
+
+
+class PlayBatchResult(BaseModel):
+    accepted: int
+    rejected: list[PlayRejection]
+
+
+class PlayTotals(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    plays: int
+    play_seconds: float
+
+
+class DevicePlays(PlayTotals):
+    device_id: int
+
+
+class MediaPlays(PlayTotals):
+    media_id: int
+
+
+class PlayPoint(PlayTotals):
+    bucket: datetime
+
+
+class MediaPlayReport(PlayTotals):
+    media_id: int
+    since: datetime
+    until: datetime
+    devices: list[DevicePlays]
+
+
+class MediaPlaySeries(BaseModel):
+    media_id: int
+    points: list[PlayPoint]
+
+
+class DevicePlayReport(PlayTotals):
+    device_id: int
+    since: datetime
+    until: datetime
+    media: list[MediaPlays]
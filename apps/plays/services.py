@@ -0,0 +1,147 @@
+from datetime import datetime, timedelta, timezone
+
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ad_looper.metrics import Counter
+from apps.common.schemas import TokenInfo
+from database.models import User
+
+from . import crud
+from .schemas import (
+    DevicePlayReport,
+    MediaPlayReport,
+    MediaPlaySeries,
+    PlayBatch,
+    PlayBatchResult,
+    PlayRejection,
+)
+
+play_events_received_total = Counter(
+    "play_events_received_total",
+    "Play events accepted from devices",
+)
+play_events_rejected_total = Counter(
+    "play_events_rejected_total",
+    "Play events rejected because the media is missing or not the owner's",
+)
+
+
+def to_utc(value: datetime) -> datetime:
+    # The play_events columns are naive UTC like the rest of the schema
+    if value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+async def ingest_plays(
+    db: AsyncSession, token: TokenInfo, batch: PlayBatch
+) -> PlayBatchResult:
+    owned = await crud.get_owned_media_ids(
+        db, token.owner_id, {event.media_id for event in batch.events}
+    )
+    records = []
+    rejected = []
+    for index, event in enumerate(batch.events):
+        if event.media_id not in owned:
+            rejected.append(
+                PlayRejection(
+                    index=index,
+                    media_id=event.media_id,
+                    detail="Media not found",
+                )
+            )
+            continue
+        records.append(
+            (
+                token.display_device_id,
+                event.media_id,
+                to_utc(event.started_at),
+                event.duration,
+            )
+        )
+
+    if records:
+        await crud.create_play_events(db, records)
+    play_events_received_total.inc(len(records))
+    play_events_rejected_total.inc(len(rejected))
+    return PlayBatchResult(accepted=len(records), rejected=rejected)
+
+
+def get_report_range(
+    since: datetime | None, until: datetime | None
+) -> tuple[datetime, datetime]:
+    until = to_utc(until) if until else datetime.utcnow()
+    since = to_utc(since) if since else until - timedelta(days=7)
+    if since >= until:
+        raise HTTPException(status_code=400, detail="Invalid time range")
+    return since, until
+
+
+async def check_media_owner(db: AsyncSession, user: User, media_id: int):
+    owner_id = await crud.get_media_owner_id(db, media_id)
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="Media not found")
+    if owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+async def check_device_owner(db: AsyncSession, user: User, device_id: int):
+    owner_id = await crud.get_display_device_owner_id(db, device_id)
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="DisplayDevice not found")
+    if owner_id != user.id:
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+async def get_media_report(
+    db: AsyncSession,
+    user: User,
+    media_id: int,
+    since: datetime | None,
+    until: datetime | None,
+) -> MediaPlayReport:
+    since, until = get_report_range(since, until)
+    await check_media_owner(db, user, media_id)
+    devices = await crud.get_media_plays_by_device(db, media_id, since, until)
+    return MediaPlayReport(
+        media_id=media_id,
+        since=since,
+        until=until,
+        plays=sum(row.plays for row in devices),
+        play_seconds=sum(row.play_seconds for row in devices),
+        devices=devices,
+    )
+
+
+async def get_media_series(
+    db: AsyncSession,
+    user: User,
+    media_id: int,
+    since: datetime | None,
+    until: datetime | None,
+) -> MediaPlaySeries:
+    since, until = get_report_range(since, until)
+    await check_media_owner(db, user, media_id)
+    points = await crud.get_media_play_series(db, media_id, since, until)
+    return MediaPlaySeries(media_id=media_id, points=points)
+
+
+async def get_device_report(
+    db: AsyncSession,
+    user: User,
+    device_id: int,
+    since: datetime | None,
+    until: datetime | None,
+) -> DevicePlayReport:
+    since, until = get_report_range(since, until)
+    await check_device_owner(db, user, device_id)
+    media = await crud.get_device_plays_by_media(db, device_id, since, until)
+    return DevicePlayReport(
+        device_id=device_id,
+        since=since,
+        until=until,
+        plays=sum(row.plays for row in media),
+        play_seconds=sum(row.play_seconds for row in media),
+        media=media,
+    )
@@ -4,7 +4,8 @@ from fastapi import HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 
-from database.models import Schedule
+from apps.common.events import EntityEvent, publish
+from database.models import MediaGroup, Schedule
 
 from .schemas import ScheduleCreate, ScheduleUpdate
 
@@ -40,6 +41,7 @@ async def create_schedule(
     )
     db.add(db_schedule)
     await db.commit()
+    await publish_schedule_event(db_schedule)
     await db.refresh(db_schedule)
     return db_schedule
 
@@ -79,6 +81,7 @@ async def update_schedule(
     db_schedule = result.scalars().first()
     if db_schedule is None:
         raise HTTPException(status_code=404, detail="Schedule not found")
+    old_media_group_id = db_schedule.media_group_id
 
     if schedule_update.trigger_time is not None:
         db_schedule.trigger_time = schedule_update.trigger_time
@@ -89,6 +92,9 @@ async def update_schedule(
 
     db.add(db_schedule)
     await db.commit()  # Commit the transaction
+    await publish_schedule_event(
+        db_schedule, previous_media_group_id=old_media_group_id
+    )
     await db.refresh(db_schedule)  # Refresh the schedule instance
     return db_schedule
 
@@ -100,3 +106,43 @@ async def delete_schedule(db: AsyncSession, schedule_id: int) -> None:
 
     await db.delete(db_schedule)
     await db.commit()  # Commit the transaction
+    await publish_schedule_event(db_schedule, deleted=True)
+
+
+async def publish_schedule_event(
+    db_schedule: Schedule,
+    previous_media_group_id: int | None = None,
+    deleted: bool = False,
+) -> None:
+    data = {
+        "media_group_id": db_schedule.media_group_id,
+        "media_id": db_schedule.media_id,
+        "trigger_time": db_schedule.trigger_time.isoformat(),
+    }
+    if previous_media_group_id is not None:
+        data["previous_media_group_id"] = previous_media_group_id
+    if deleted:
+        data["deleted"] = True
+    await publish(
+        EntityEvent("schedule", db_schedule.id, db_schedule.owner_id, data)
+    )
+
+
+async def get_timeline_rows(db: AsyncSession):
+    query = select(
+        Schedule.id,
+        Schedule.media_group_id,
+        Schedule.media_id,
+        Schedule.trigger_time,
+    )
+    result = await db.execute(query)
+    return result.tuples().all()
+
+
+async def get_media_group_owner(db: AsyncSession, media_group_id: int) -> int:
+    query = select(MediaGroup.owner_id).filter(MediaGroup.id == media_group_id)
+    result = await db.execute(query)
+    owner_id = result.scalar()
+    if owner_id is None:
+        raise HTTPException(status_code=404, detail="MediaGroup not found")
+    return owner_id
@@ -1,11 +1,22 @@
+from datetime import datetime, time
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from apps.common.dependencies import get_db, get_request_user
+from apps.common.dependencies import get_db, get_request_user, get_valid_token
+from apps.common.schemas import TokenInfo
+from apps.display_devices import services as display_device_services
 from database.models import User
 
-from . import crud
-from .schemas import ScheduleCreate, ScheduleResponse, ScheduleUpdate
+from . import crud, services
+from .schemas import (
+    DeviceNowPlaying,
+    NowPlaying,
+    NowPlayingBatch,
+    ScheduleCreate,
+    ScheduleResponse,
+    ScheduleUpdate,
+)
 
 router = APIRouter(prefix="/schedules", tags=["Schedules"])
 
@@ -17,6 +28,68 @@ async def read_schedules(
     return await user.awaitable_attrs.schedules
 
 
+@router.get(
+    "/now/{media_group_id}",
+    description=(
+        "The schedule playing in a media group at `at` (server time, now "
+        "by default) and the one after it. Triggers repeat every day"
+    ),
+)
+async def read_now_playing(
+    media_group_id: int,
+    at: time | None = None,
+    token: TokenInfo = Depends(get_valid_token),
+    db: AsyncSession = Depends(get_db),
+) -> NowPlaying:
+    if token.owner_id != await crud.get_media_group_owner(db, media_group_id):
+        raise HTTPException(status_code=403, detail="Forbidden")
+    return services.now_playing(media_group_id, at or datetime.now().time())
+
+
+@router.post(
+    "/now",
+    description=(
+        "What plays now on each of many devices. Every item carries an "
+        "HTTP-style `status`, failures have a `detail` instead of a schedule"
+    ),
+)
+async def read_now_playing_batch(
+    data: NowPlayingBatch,
+    token: TokenInfo = Depends(get_valid_token),
+    db: AsyncSession = Depends(get_db),
+) -> list[DeviceNowPlaying]:
+    at = data.at or datetime.now().time()
+    targets = await display_device_services.get_device_targets(
+        db, data.display_device_ids
+    )
+    results = []
+    for device_id in data.display_device_ids:
+        target = targets.get(device_id)
+        if target is None:
+            status, detail = 404, "Display device not found"
+        elif token.owner_id != target.owner_id or (
+            token.display_device_id not in (None, device_id)
+        ):
+            status, detail = 403, "Forbidden"
+        else:
+            playing = services.now_playing(target.media_group_id, at)
+            results.append(
+                DeviceNowPlaying(
+                    display_device_id=device_id, **playing.model_dump()
+                )
+            )
+            continue
+        results.append(
+            DeviceNowPlaying(
+                display_device_id=device_id,
+                at=at,
+                status=status,
+                detail=detail,
+            )
+        )
+    return results
+
+
 @router.get("/{schedule_id}")
 async def read_schedule(
     schedule_id: int,
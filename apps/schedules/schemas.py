@@ -1,6 +1,6 @@
 from datetime import time
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 from apps.common.schemas import ScheduleSimpleResponse
 
@@ -19,3 +19,27 @@ class ScheduleUpdate(BaseModel):
 
 class ScheduleResponse(ScheduleSimpleResponse):
     pass
+
+
+class TimelineItem(BaseModel):
+    schedule_id: int
+    media_id: int
+    trigger_time: time
+
+
+class NowPlaying(BaseModel):
+    media_group_id: int | None = None
+    at: time
+    current: TimelineItem | None = None
+    next: TimelineItem | None = None
+
+
+class NowPlayingBatch(BaseModel):
+    display_device_ids: list[int] = Field(min_length=1, max_length=5000)
+    at: time | None = None
+
+
+class DeviceNowPlaying(NowPlaying):
+    display_device_id: int
+    status: int = 200
+    detail: str | None = None
@@ -0,0 +1,29 @@
+from datetime import time
+
+from apps.common.timeline import TimelineEntry, schedule_timeline
+
+from .schemas import NowPlaying, TimelineItem
+
+
+def _timeline_item(entry: TimelineEntry | None) -> TimelineItem | None:
+    if entry is None:
+        return None
+    return TimelineItem(
+        schedule_id=entry.schedule_id,
+        media_id=entry.media_id,
+        trigger_time=entry.trigger_time,
+    )
+
+
+def now_playing(media_group_id: int | None, at: time) -> NowPlaying:
+    current, upcoming = (
+        schedule_timeline.at(media_group_id, at)
+        if media_group_id is not None
+        else (None, None)
+    )
+    return NowPlaying(
+        media_group_id=media_group_id,
+        at=at,
+        current=_timeline_item(current),
+        next=_timeline_item(upcoming),
+    )
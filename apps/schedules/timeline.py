@@ -0,0 +1,31 @@
+import asyncio
+import logging
+
+from apps.common.timeline import schedule_timeline
+from database.models import AsyncSessionLocal
+
+from . import crud
+
+logger = logging.getLogger(__name__)
+
+
+async def load_schedule_timeline() -> None:
+    # Events handled while the query runs are newer than its snapshot
+    schedule_timeline.begin_load()
+    try:
+        async with AsyncSessionLocal() as db:
+            rows = await crud.get_timeline_rows(db)
+    except BaseException:
+        schedule_timeline.cancel_load()
+        raise
+    schedule_timeline.load(rows)
+
+
+# Picks up schedules changed by other workers
+async def sync_schedule_timeline(interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await load_schedule_timeline()
+        except Exception:
+            logger.exception("Failed to reload the schedule timeline")
@@ -1,8 +1,13 @@
 from fastapi import HTTPException
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import run_in_threadpool
 
+from apps.auth import crud as auth_crud
 from apps.auth.utils import hash_password
+from apps.common.events import EntityEvent, publish
+from apps.media import crud as media_crud
+from apps.media.store import remove_legacy_files
 from database.models import User
 
 from .schemas import UserCreate, UserUpdate
@@ -21,7 +26,7 @@ async def create_user(db: AsyncSession, user: UserCreate) -> User:
     db_user = User(
         username=user.username,
         email=user.email,
-        password=hash_password(user.password.get_secret_value()),
+        password=await hash_password(user.password.get_secret_value()),
     )
 
     # Add user and commit transaction
@@ -92,7 +97,7 @@ async def update_user(
         db_user.email = user_update.email
 
     if user_update.password is not None:
-        db_user.password = hash_password(
+        db_user.password = await hash_password(
             user_update.password.get_secret_value()
         )
 
@@ -104,5 +109,24 @@ async def update_user(
 
 async def delete_user(db: AsyncSession, user_id: int) -> None:
     db_user = await get_user(db, id=user_id)
+    # The user's media go with it, and so do their blob references
+    blob_counts = await media_crud.get_owner_blob_counts(db, user_id)
+    legacy_filenames = await media_crud.get_owner_legacy_filenames(
+        db, user_id
+    )
+    # Only device tokens are accepted without a lookup, so only they
+    # need to stay revoked once their rows are gone
+    tokens = await auth_crud.get_owner_device_tokens(db, user_id)
+    revoked = await auth_crud.revoke_tokens(db, tokens)
     await db.delete(db_user)
+    unused = []
+    if blob_counts or legacy_filenames:
+        await db.flush()
+    if blob_counts:
+        await media_crud.release_blobs(db, blob_counts)
+    if legacy_filenames:
+        unused = await media_crud.release_legacy_files(db, legacy_filenames)
     await db.commit()
+    await run_in_threadpool(remove_legacy_files, unused)
+    await publish(EntityEvent("user", user_id, user_id, {"deleted": True}))
+    await auth_crud.publish_revoked_tokens(user_id, revoked)
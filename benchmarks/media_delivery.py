@@ -0,0 +1,159 @@
+"""Worker CPU time per download in each delivery mode.
+
+Starts the app under uvicorn once per ``settings.media.delivery`` mode and
+downloads the same file repeatedly, then reads the worker's CPU time from
+its resource usage after it exits. There is no front proxy here: in the
+offloaded modes the worker only answers with the redirect header and no
+file bytes are sent, so what the proxy spends sending them is not
+measured. Run with ``python -m benchmarks.media_delivery`` from the
+project root.
+"""
+
+import asyncio
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request
+
+from apps.media.responses import media_file_response
+from apps.media.store import blob_path
+
+FILE_SIZE = 256 * 1024 * 1024
+# Offloaded downloads cost too little to measure against startup in a few
+DOWNLOADS = {"stream": 16, "x-accel-redirect": 2000, "x-sendfile": 2000}
+CONCURRENCY = 4
+PORT = 8766
+SHA256 = "ab" * 32
+
+
+def build_app(delivery: str) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/media/{media_id}/download")
+    async def download(media_id: int, request: Request):
+        return await media_file_response(
+            request.headers,
+            blob_path(SHA256),
+            "loop.mp4",
+            SHA256,
+            "video/mp4",
+            delivery=delivery,
+        )
+
+    return app
+
+
+stream_app = build_app("stream")
+accel_app = build_app("x-accel-redirect")
+sendfile_app = build_app("x-sendfile")
+
+APPS = {
+    "stream": "stream_app",
+    "x-accel-redirect": "accel_app",
+    "x-sendfile": "sendfile_app",
+}
+
+
+def create_media_file(media_folder: Path) -> None:
+    path = media_folder / SHA256[:2] / SHA256[2:4] / SHA256
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "wb") as file:
+        block = os.urandom(1024 * 1024)
+        for _ in range(FILE_SIZE // len(block)):
+            file.write(block)
+
+
+async def wait_until_ready(client: httpx.AsyncClient) -> None:
+    for _ in range(100):
+        try:
+            await client.get("/docs")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def download_all(client: httpx.AsyncClient, downloads: int) -> int:
+    # Returns the body bytes received
+    queue = asyncio.Queue()
+    for _ in range(downloads):
+        queue.put_nowait(None)
+    received = 0
+
+    async def worker():
+        nonlocal received
+        while not queue.empty():
+            queue.get_nowait()
+            async with client.stream("GET", "/media/1/download") as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_raw():
+                    received += len(chunk)
+
+    await asyncio.gather(*(worker() for _ in range(CONCURRENCY)))
+    return received
+
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def serve(app_name: str, media_folder: Path) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            f"benchmarks.media_delivery:{app_name}",
+            "--port",
+            str(PORT),
+            "--log-level",
+            "warning",
+        ],
+        env={**os.environ, "MEDIA_FOLDER": str(media_folder)},
+    )
+
+
+async def run(
+    app_name: str, media_folder: Path, downloads: int
+) -> tuple[float, int]:
+    # CPU of a worker is only counted once it has exited, startup included
+    before = children_cpu()
+    server = serve(app_name, media_folder)
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{PORT}", timeout=None
+        ) as client:
+            await wait_until_ready(client)
+            received = await download_all(client, downloads)
+    finally:
+        server.terminate()
+        server.wait()
+    return children_cpu() - before, received
+
+
+async def main() -> None:
+    with tempfile.TemporaryDirectory() as folder:
+        media_folder = Path(folder)
+        create_media_file(media_folder)
+        # A run without downloads gives the startup cost to subtract
+        baseline, _ = await run(APPS["stream"], media_folder, 0)
+        for mode, app_name in APPS.items():
+            downloads = DOWNLOADS[mode]
+            cpu, received = await run(app_name, media_folder, downloads)
+            cpu -= baseline
+            print(
+                f"{mode:<17} {downloads:5d} downloads   "
+                f"worker CPU {cpu:7.3f} s   "
+                f"{cpu / downloads * 1000:7.2f} ms/download   "
+                f"{received / 1024**2:7.0f} MiB sent by the worker"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,108 @@
+"""Compare the request logging middleware before and after the ASGI rewrite.
+
+Run with ``python -m benchmarks.middleware`` from the project root.
+"""
+
+import asyncio
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+from fastapi import FastAPI, Request
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.responses import FileResponse
+
+from ad_looper.middleware import LogRequestResponseMiddleware
+from apps.auth.utils import create_jwt_token, decode_access_token
+from apps.logs.writer import log_writer
+
+REQUESTS = 2000
+FILE_SIZE = 8 * 1024 * 1024
+
+
+class BaseHTTPLogMiddleware(BaseHTTPMiddleware):
+    # The BaseHTTPMiddleware implementation this benchmark compares against
+    async def dispatch(self, request: Request, call_next):
+        response = await call_next(request)
+        try:
+            data = decode_access_token(
+                request.headers["Authorization"].removeprefix("Bearer ")
+            )
+            log_writer.put(
+                url=request.url.path,
+                method=request.method,
+                status_code=response.status_code,
+                device_id=data["display_device_id"],
+            )
+        except KeyError:
+            pass
+        return response
+
+
+def build_app(middleware, file_path: Path) -> FastAPI:
+    app = FastAPI()
+    app.add_middleware(middleware)
+
+    @app.get("/display_devices/{device_id}")
+    async def device(device_id: int):
+        return {"id": device_id, "name": "screen"}
+
+    @app.get("/media/{media_id}/download")
+    async def download(media_id: int):
+        return FileResponse(file_path)
+
+    return app
+
+
+async def measure(app: FastAPI, url: str, headers: dict) -> list[float]:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(
+        transport=transport, base_url="http://bench"
+    ) as client:
+        timings = []
+        for _ in range(REQUESTS):
+            start = time.perf_counter()
+            response = await client.get(url, headers=headers)
+            timings.append(time.perf_counter() - start)
+            assert response.status_code == 200
+            # Keep the log queue from filling up and dropping records
+            while not log_writer.queue.empty():
+                log_writer.queue.get_nowait()
+        return timings
+
+
+def report(name: str, timings: list[float]) -> None:
+    timings.sort()
+    p50 = statistics.median(timings) * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    print(f"{name:<40} p50 {p50:7.3f} ms   p99 {p99:7.3f} ms")
+
+
+async def main() -> None:
+    token = create_jwt_token({"sub": "bench", "display_device_id": 1})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    with tempfile.NamedTemporaryFile() as file:
+        file.write(b"\0" * FILE_SIZE)
+        file.flush()
+        file_path = Path(file.name)
+
+        for name, middleware in [
+            ("before (BaseHTTPMiddleware)", BaseHTTPLogMiddleware),
+            ("after (ASGI)", LogRequestResponseMiddleware),
+        ]:
+            app = build_app(middleware, file_path)
+            report(
+                f"{name} device",
+                await measure(app, "/display_devices/1", headers),
+            )
+            report(
+                f"{name} download",
+                await measure(app, "/media/1/download", headers),
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
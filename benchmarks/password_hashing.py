@@ -0,0 +1,116 @@
+"""Device endpoint latency while logins are hashing passwords.
+
+Starts the app under uvicorn once with bcrypt verified inline on the event
+loop and once with the offloaded ``verify_password``, then measures a
+device endpoint while concurrent logins are running. Run with
+``python -m benchmarks.password_hashing`` from the project root.
+"""
+
+import asyncio
+import subprocess
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+from apps.auth.utils import pwd_context, verify_password
+
+CONCURRENT_LOGINS = 4
+DURATION = 20
+PORT = 8765
+PASSWORD = "correct horse battery staple"
+
+
+def build_app(offload: bool) -> FastAPI:
+    app = FastAPI()
+    hashed = pwd_context.hash(PASSWORD)
+
+    @app.post("/auth/login")
+    async def login():
+        if offload:
+            return await verify_password(PASSWORD, hashed)
+        return pwd_context.verify(PASSWORD, hashed)
+
+    @app.get("/display_devices/{device_id}")
+    async def device(device_id: int):
+        return {"id": device_id}
+
+    return app
+
+
+inline_app = build_app(offload=False)
+offloaded_app = build_app(offload=True)
+
+
+async def wait_until_ready(client: httpx.AsyncClient) -> None:
+    for _ in range(100):
+        try:
+            await client.get("/display_devices/1")
+            return
+        except httpx.TransportError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError("Server did not start")
+
+
+async def run(app_name: str) -> list[float]:
+    server = subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "uvicorn",
+            f"benchmarks.password_hashing:{app_name}",
+            "--port",
+            str(PORT),
+            "--log-level",
+            "warning",
+        ]
+    )
+    try:
+        async with httpx.AsyncClient(
+            base_url=f"http://127.0.0.1:{PORT}", timeout=None
+        ) as client:
+            await wait_until_ready(client)
+            stop = asyncio.Event()
+
+            async def login_storm():
+                while not stop.is_set():
+                    await client.post("/auth/login")
+
+            storm = [
+                asyncio.create_task(login_storm())
+                for _ in range(CONCURRENT_LOGINS)
+            ]
+            await asyncio.sleep(1)
+
+            timings = []
+            deadline = time.perf_counter() + DURATION
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                await client.get("/display_devices/1")
+                timings.append(time.perf_counter() - start)
+
+            stop.set()
+            await asyncio.gather(*storm)
+            return sorted(timings)
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def report(name: str, timings: list[float]) -> None:
+    p50 = timings[len(timings) // 2] * 1000
+    p99 = timings[int(len(timings) * 0.99)] * 1000
+    print(
+        f"{name:<10} {len(timings):5d} device requests   "
+        f"p50 {p50:8.2f} ms   p99 {p99:8.2f} ms"
+    )
+
+
+async def main() -> None:
+    report("inline", await run("inline_app"))
+    report("offloaded", await run("offloaded_app"))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
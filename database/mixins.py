@@ -1,5 +1,5 @@
 from datetime import datetime
-from sqlalchemy import DateTime, ForeignKey, Integer, func
+from sqlalchemy import DateTime, ForeignKey, Integer, LargeBinary, func
 from sqlalchemy.orm import (
     Mapped,
     declared_attr,
@@ -28,7 +28,12 @@ class Owned:
 class TokenBase(TimestampMixin, Owned):
     @declared_attr
     def token(cls) -> Mapped[str]:
-        return mapped_column(unique=True, nullable=False)
+        return mapped_column(nullable=False)
+
+    # SHA-256 of `token`, tokens are looked up by this instead of the string
+    @declared_attr
+    def token_hash(cls) -> Mapped[bytes]:
+        return mapped_column(LargeBinary(32), unique=True, nullable=False)
 
     @declared_attr
     def token_type(cls) -> Mapped[str]:
@@ -40,4 +45,4 @@ class TokenBase(TimestampMixin, Owned):
 
     @declared_attr
     def expires_at(cls) -> Mapped[datetime]:
-        return mapped_column(nullable=False)
+        return mapped_column(nullable=False, index=True)
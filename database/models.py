@@ -1,6 +1,17 @@
-from datetime import time
-
-from sqlalchemy import ForeignKey, Integer, Time
+from datetime import datetime, time
+
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    Time,
+    event,
+    func,
+)
 from sqlalchemy.ext.asyncio import (
     AsyncAttrs,
     async_sessionmaker,
@@ -9,13 +20,16 @@ from sqlalchemy.ext.asyncio import (
 from sqlalchemy.orm import (
     DeclarativeBase,
     Mapped,
+    WriteOnlyMapped,
     declared_attr,
     mapped_column,
     relationship,
 )
 
 from ad_looper.config import settings
+from ad_looper.metrics import Gauge
 from database.mixins import Owned, TimestampMixin, TokenBase
+from database.pool import TimedQueuePool
 
 
 class Base(AsyncAttrs, DeclarativeBase):
@@ -53,6 +67,13 @@ class DeviceToken(Model, TokenBase):
     )
 
 
+class RevokedToken(Base):
+    __tablename__ = "revoked_tokens"
+
+    jti: Mapped[str] = mapped_column(primary_key=True)
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+
+
 class User(Model):
     __tablename__ = "users"
 
@@ -98,6 +119,7 @@ class DisplayDevice(Model, Owned, TimestampMixin):
     name: Mapped[str] = mapped_column(index=True)
     description: Mapped[str] = mapped_column(nullable=True)
     is_active: Mapped[bool] = mapped_column(default=True)
+    last_seen_at: Mapped[datetime] = mapped_column(nullable=True, index=True)
 
     media_group_id: Mapped[int] = mapped_column(
         Integer, ForeignKey("media_groups.id"), nullable=True
@@ -117,10 +139,13 @@ class DisplayDevice(Model, Owned, TimestampMixin):
         "DeviceToken",
         back_populates="display_device",
     )
-    logs: Mapped[list["Log"]] = relationship(
+    # Left to the database; write-only collections can't be loaded to
+    # null out their rows on delete
+    logs: WriteOnlyMapped["Log"] = relationship(
         "Log",
         back_populates="device",
-        lazy="selectin",
+        lazy="write_only",
+        passive_deletes=True,
     )
 
 
@@ -129,6 +154,14 @@ class Media(Model, Owned, TimestampMixin):
 
     name: Mapped[str]
     filename: Mapped[str] = mapped_column(nullable=True)
+    size: Mapped[int] = mapped_column(BigInteger, nullable=True)
+    sha256: Mapped[str] = mapped_column(
+        String(64), ForeignKey("media_blobs.sha256"), nullable=True
+    )
+    content_type: Mapped[str] = mapped_column(nullable=True)
+    # Set only for media uploaded before the content-addressed store, whose
+    # file is still stored flat under this name
+    legacy_filename: Mapped[str] = mapped_column(nullable=True)
 
     owner: Mapped["User"] = relationship("User", back_populates="media")
     media_groups: Mapped[list["MediaGroup"]] = relationship(
@@ -144,6 +177,44 @@ class Media(Model, Owned, TimestampMixin):
     )
 
 
+# One stored file, shared by every Media with the same content
+class MediaBlob(Base):
+    __tablename__ = "media_blobs"
+
+    sha256: Mapped[str] = mapped_column(String(64), primary_key=True)
+    size: Mapped[int] = mapped_column(BigInteger)
+    # Rows at zero are left for the blob collector to delete with the file
+    ref_count: Mapped[int] = mapped_column(default=0, index=True)
+
+
+class UploadSession(Model, Owned, TimestampMixin):
+    __tablename__ = "upload_sessions"
+
+    media_id: Mapped[int] = mapped_column(
+        ForeignKey("media.id", ondelete="CASCADE")
+    )
+    filename: Mapped[str]
+    content_type: Mapped[str] = mapped_column(nullable=True)
+    size: Mapped[int] = mapped_column(BigInteger)
+    # Expected hash, checked when the upload is finalized
+    sha256: Mapped[str] = mapped_column(String(64), nullable=True)
+    status: Mapped[str] = mapped_column(default="open")
+    # Chunks being written right now; finalize waits for them
+    writers: Mapped[int] = mapped_column(default=0)
+    expires_at: Mapped[datetime] = mapped_column(index=True)
+
+
+class UploadChunk(Base):
+    __tablename__ = "upload_chunks"
+
+    session_id: Mapped[int] = mapped_column(
+        ForeignKey("upload_sessions.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    offset: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    length: Mapped[int] = mapped_column(BigInteger)
+
+
 class MediaGroup(Model, Owned, TimestampMixin):
     __tablename__ = "media_groups"
 
@@ -201,13 +272,26 @@ class Schedule(Model, TimestampMixin, Owned):
 
 class Log(Model, TimestampMixin):
     __tablename__ = "logs"
+    __table_args__ = (
+        Index("ix_logs_device_id_created_at", "device_id", "created_at"),
+        {"postgresql_partition_by": "RANGE (created_at)"},
+    )
+
+    # The partition key has to be part of the primary key
+    id: Mapped[int] = mapped_column(
+        Integer, primary_key=True, autoincrement=True
+    )
+    created_at: Mapped[datetime] = mapped_column(
+        DateTime, default=func.now(), primary_key=True
+    )
 
     url: Mapped[str]
     method: Mapped[str]
     status_code: Mapped[int]
+    duration_ms: Mapped[float] = mapped_column(nullable=True)
 
     device_id: Mapped[int] = mapped_column(
-        ForeignKey("display_devices.id"), nullable=True
+        ForeignKey("display_devices.id", ondelete="SET NULL"), nullable=True
     )
 
     device: Mapped["DisplayDevice"] = relationship(
@@ -215,8 +299,86 @@ class Log(Model, TimestampMixin):
     )
 
 
-async_engine = create_async_engine(settings.db.url)
+class LogRollup(Base):
+    __tablename__ = "log_rollups"
+
+    device_id: Mapped[int] = mapped_column(
+        ForeignKey("display_devices.id", ondelete="CASCADE"), primary_key=True
+    )
+    # Indexed on its own for fleet-wide ranges and retention
+    bucket: Mapped[datetime] = mapped_column(
+        DateTime, primary_key=True, index=True
+    )
+    method: Mapped[str] = mapped_column(primary_key=True)
+    url: Mapped[str] = mapped_column(primary_key=True)
+    status_class: Mapped[int] = mapped_column(primary_key=True)
+    requests: Mapped[int] = mapped_column(default=0)
+
+
+# Hourly totals for the hour and day traffic series, which would otherwise
+# sum up every minute, method and url
+class HourlyLogRollup(Base):
+    __tablename__ = "hourly_log_rollups"
+
+    device_id: Mapped[int] = mapped_column(
+        ForeignKey("display_devices.id", ondelete="CASCADE"), primary_key=True
+    )
+    bucket: Mapped[datetime] = mapped_column(
+        DateTime, primary_key=True, index=True
+    )
+    status_class: Mapped[int] = mapped_column(primary_key=True)
+    requests: Mapped[int] = mapped_column(default=0)
+
+
+# A queue: the aggregator deletes events as it folds them into the rollups
+class PlayEvent(Base):
+    __tablename__ = "play_events"
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    device_id: Mapped[int] = mapped_column(
+        ForeignKey("display_devices.id", ondelete="CASCADE")
+    )
+    media_id: Mapped[int] = mapped_column(
+        ForeignKey("media.id", ondelete="CASCADE")
+    )
+    started_at: Mapped[datetime] = mapped_column(DateTime)
+    duration: Mapped[float]
+
+
+class PlayRollup(Base):
+    __tablename__ = "play_rollups"
+
+    media_id: Mapped[int] = mapped_column(
+        ForeignKey("media.id", ondelete="CASCADE"), primary_key=True
+    )
+    device_id: Mapped[int] = mapped_column(
+        ForeignKey("display_devices.id", ondelete="CASCADE"), primary_key=True
+    )
+    bucket: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
+    plays: Mapped[int] = mapped_column(default=0)
+    play_seconds: Mapped[float] = mapped_column(default=0)
+
+
+# Catches rows outside of the weekly partitions created by `partition_logs`
+event.listen(
+    Log.__table__,
+    "after_create",
+    DDL("CREATE TABLE logs_default PARTITION OF logs DEFAULT").execute_if(
+        dialect="postgresql"
+    ),
+)
+
+
+async_engine = create_async_engine(
+    settings.db.url, poolclass=TimedQueuePool
+)
 AsyncSessionLocal = async_sessionmaker(
     bind=async_engine,
     expire_on_commit=False,
 )
+
+Gauge(
+    "db_pool_connections_in_use",
+    "Connections currently checked out of the pool",
+    function=lambda: async_engine.pool.checkedout(),
+)
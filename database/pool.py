@@ -0,0 +1,19 @@
+from time import perf_counter
+
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from ad_looper.metrics import Histogram
+
+db_pool_checkout_seconds = Histogram(
+    "db_pool_checkout_seconds",
+    "Time spent waiting for a connection from the pool",
+)
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    def _do_get(self):
+        start = perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_seconds.observe(perf_counter() - start)
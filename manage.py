@@ -1,4 +1,5 @@
 import argparse
+import asyncio
 import subprocess
 from pathlib import Path
 
@@ -84,3 +85,30 @@ def makemigrations():
 def migrate():
     subprocess.run(["alembic", "upgrade", "head"], check=True)
     print("Migration applied")
+
+
+def partition_logs():
+    from apps.logs.partitions import maintain_partitions
+
+    created, dropped, pruned = asyncio.run(maintain_partitions())
+    print(f"Log partitions created: {', '.join(created) or 'none'}")
+    print(f"Log partitions dropped: {', '.join(dropped) or 'none'}")
+    print(f"Log rollups pruned: {pruned}")
+
+
+def purge_tokens():
+    from ad_looper.config import settings
+    from apps.auth.purge import purge_expired_tokens
+
+    purged = asyncio.run(
+        purge_expired_tokens(settings.token.purge_batch_size)
+    )
+    for table, count in purged.items():
+        print(f"Purged {count} rows from {table}")
+
+
+def purge_uploads():
+    from apps.media.uploads import purge_upload_sessions
+
+    purged = asyncio.run(purge_upload_sessions())
+    print(f"Purged {purged} expired upload sessions")
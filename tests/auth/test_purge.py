@@ -0,0 +1,104 @@
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from apps.auth import crud, purge
+from apps.auth.utils import create_jwt_token, decode_access_token
+from database.models import DeviceToken, Token
+
+
+class Result:
+    def __init__(self, tokens=()):
+        self.tokens = list(tokens)
+        self.rowcount = len(self.tokens)
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.tokens
+
+
+class PurgeSession:
+    # Each DELETE takes the next batch of deleted tokens
+    def __init__(self, *batches):
+        self.batches = list(batches)
+        self.inserts = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        if statement.is_delete:
+            return Result(self.batches.pop(0))
+        self.inserts.append(
+            statement.compile(dialect=postgresql.dialect()).params
+        )
+        return Result()
+
+    async def commit(self):
+        self.commits += 1
+
+
+def device_token(device_id: int) -> str:
+    return create_jwt_token(
+        {"sub": "user", "owner_id": 1, "display_device_id": device_id}
+    )
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_deleted_in_batches_until_one_comes_up_short():
+    db = PurgeSession(["a", "b"], ["c", "d"], ["e"])
+
+    purged = await crud.purge_tokens(
+        db, Token, Token.expires_at.is_(None), 2
+    )
+
+    assert purged == 5
+    assert db.commits == 3
+    assert db.batches == []
+    assert db.inserts == []
+
+
+@pytest.mark.asyncio
+async def test_inactive_tokens_are_revoked_as_they_are_deleted():
+    tokens = [device_token(device_id) for device_id in range(3)]
+    db = PurgeSession(tokens[:2], tokens[2:])
+
+    purged = await crud.purge_tokens(
+        db, DeviceToken, DeviceToken.is_active.is_(False), 2, revoke=True
+    )
+
+    assert purged == 3
+    revoked = [
+        params[f"jti_m{i}"]
+        for params in db.inserts
+        for i in range(len(params) // 2)
+    ]
+    assert revoked == [decode_access_token(token)["jti"] for token in tokens]
+
+
+@pytest.mark.asyncio
+async def test_purger_counts_per_table_and_revokes_inactive_tokens(
+    fake_crud,
+):
+    fake_crud.use_fake_sessions(purge)
+    passes = []
+
+    def purge_tokens(model, condition, batch_size, revoke):
+        passes.append((model.__tablename__, batch_size, revoke))
+        return len(passes)
+
+    fake_crud.replace(purge, "purge_tokens", purge_tokens)
+
+    purged = await purge.purge_expired_tokens(50)
+
+    assert passes == [
+        ("tokens", 50, False),
+        ("tokens", 50, True),
+        ("display_device_tokens", 50, False),
+        ("display_device_tokens", 50, True),
+        ("revoked_tokens", 50, False),
+    ]
+    assert purged == {
+        "tokens": 3,
+        "display_device_tokens": 7,
+        "revoked_tokens": 5,
+    }
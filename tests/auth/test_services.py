@@ -0,0 +1,132 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from apps.auth import crud, services
+from apps.auth.utils import create_jwt_token, decode_access_token
+from apps.common.events import EntityEvent
+from apps.common.utils import hash_token
+from database.models import User
+
+
+class InsertSession:
+    # Anything but one statement and a commit fails the test
+    def __init__(self):
+        self.statements = []
+        self.commits = 0
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+    async def commit(self):
+        self.commits += 1
+
+
+@pytest.fixture
+def events(monkeypatch):
+    published = []
+
+    async def publish(event):
+        published.append(event)
+
+    monkeypatch.setattr(services, "publish", publish)
+    return published
+
+
+@pytest.mark.asyncio
+async def test_login_issues_both_tokens_at_once(fake_crud):
+    issued = []
+    fake_crud.replace(
+        services,
+        "create_tokens",
+        lambda owner_id, tokens: issued.append((owner_id, tokens)),
+    )
+
+    access, refresh = await services.issue_login_tokens(
+        None, User(id=3, username="ana")
+    )
+
+    [(owner_id, tokens)] = issued
+    assert owner_id == 3
+    assert [(token, kind) for token, kind, _ in tokens] == [
+        (access, "access"),
+        (refresh, "refresh"),
+    ]
+    assert decode_access_token(refresh)["sub"] == "ana"
+
+
+@pytest.mark.asyncio
+async def test_tokens_are_stored_in_one_insert_without_a_refresh():
+    db = InsertSession()
+
+    await crud.create_tokens(
+        db,
+        owner_id=3,
+        tokens=[
+            ("a", "access", datetime(2100, 1, 1)),
+            ("r", "refresh", datetime(2100, 1, 2)),
+        ],
+    )
+
+    [insert] = db.statements
+    params = insert.compile().params
+    assert insert.is_insert
+    assert (params["token_m0"], params["token_type_m0"]) == ("a", "access")
+    assert (params["token_m1"], params["token_type_m1"]) == ("r", "refresh")
+    assert db.commits == 1
+
+
+@pytest.mark.asyncio
+async def test_refresh_swaps_the_token_and_evicts_the_old_one(
+    fake_crud, events
+):
+    refresh = create_jwt_token({"sub": "ana"})
+    exchanges = []
+
+    def exchange(token_hash, token, expires_at, now):
+        exchanges.append((token_hash, token))
+        return 7
+
+    fake_crud.replace(services, "exchange_refresh_token", exchange)
+
+    access = await services.refresh_access_token(None, refresh)
+
+    assert exchanges == [(hash_token(refresh), access)]
+    assert decode_access_token(access)["sub"] == "ana"
+    # Workers drop the refresh token from their caches
+    assert events == [EntityEvent("token", hash_token(refresh).hex())]
+
+
+@pytest.mark.asyncio
+async def test_failed_refresh_says_why_and_publishes_nothing(
+    fake_crud, events
+):
+    fake_crud.replace(services, "exchange_refresh_token")
+    fake_crud.replace(
+        services, "refresh_failure_reason", lambda *_: "Token expired"
+    )
+
+    with pytest.raises(HTTPException) as error:
+        await services.refresh_access_token(
+            None, create_jwt_token({"sub": "ana"})
+        )
+
+    assert (error.value.status_code, error.value.detail) == (
+        401,
+        "Token expired",
+    )
+    assert events == []
+
+
+@pytest.mark.asyncio
+async def test_unreadable_refresh_token_never_reaches_the_database(
+    fake_crud, events
+):
+    fake_crud.replace(services, "exchange_refresh_token")
+
+    with pytest.raises(HTTPException) as error:
+        await services.refresh_access_token(None, "not a jwt")
+
+    assert error.value.status_code == 401
+    assert fake_crud.calls["exchange_refresh_token"] == []
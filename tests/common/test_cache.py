@@ -0,0 +1,50 @@
+from datetime import datetime
+
+from apps.common.cache import TokenCache
+from apps.common.schemas import TokenInfo
+
+
+def token_info(token_id: int) -> TokenInfo:
+    return TokenInfo(
+        id=token_id,
+        owner_id=1,
+        token_type="access",
+        is_active=True,
+        expires_at=datetime(2100, 1, 1),
+    )
+
+
+def test_hit_and_miss():
+    cache = TokenCache(maxsize=10, ttl=60)
+    assert cache.get("a") is None
+    cache.set("a", token_info(1))
+
+    assert cache.get("a").id == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_least_recently_used_is_evicted():
+    cache = TokenCache(maxsize=2, ttl=60)
+    cache.set("a", token_info(1))
+    cache.set("b", token_info(2))
+    cache.get("a")
+    cache.set("c", token_info(3))
+
+    assert cache.get("b") is None
+    assert cache.get("a").id == 1
+    assert cache.get("c").id == 3
+
+
+def test_expired_entries_miss():
+    cache = TokenCache(maxsize=10, ttl=-1)
+    cache.set("a", token_info(1))
+
+    assert cache.get("a") is None
+
+
+def test_invalidate():
+    cache = TokenCache(maxsize=10, ttl=60)
+    cache.set("a", token_info(1))
+    cache.invalidate("a")
+
+    assert cache.get("a") is None
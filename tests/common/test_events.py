@@ -0,0 +1,108 @@
+import asyncio
+import json
+from dataclasses import asdict
+
+import pytest
+
+from apps.common.events import EntityEvent, EventBus, PostgresEventBus
+
+
+@pytest.mark.asyncio
+async def test_sync_and_async_evictors_run_for_their_entity():
+    bus = EventBus()
+    seen = []
+
+    async def async_evictor(event):
+        seen.append(("async", event.id))
+
+    bus.register("media", lambda event: seen.append(("sync", event.id)))
+    bus.register("media", async_evictor)
+    bus.register("schedule", lambda event: seen.append(("schedule", event.id)))
+
+    await bus.publish(EntityEvent("media", 1, owner_id=2))
+
+    assert seen == [("sync", 1), ("async", 1)]
+
+
+@pytest.mark.asyncio
+async def test_failing_evictor_does_not_stop_the_others():
+    bus = EventBus()
+    seen = []
+
+    def broken(event):
+        raise RuntimeError
+
+    bus.register("media", broken)
+    bus.register("media", lambda event: seen.append(event.id))
+
+    await bus.publish(EntityEvent("media", 1))
+
+    assert seen == [1]
+
+
+class FakeConnection:
+    def get_server_pid(self):
+        return 1
+
+
+@pytest.mark.asyncio
+async def test_notifications_from_other_workers_are_dispatched():
+    bus = PostgresEventBus("postgresql://localhost/test", channel="events")
+    seen = []
+    bus.register("media", lambda event: seen.append(event))
+    payload = json.dumps(asdict(EntityEvent("media", 5, 2, {"a": 1})))
+
+    # pid 1 is our own connection, its events were already dispatched
+    bus._on_notify(FakeConnection(), 1, "events", payload)
+    bus._on_notify(FakeConnection(), 2, "events", payload)
+    await asyncio.sleep(0)
+
+    assert seen == [EntityEvent("media", 5, 2, {"a": 1})]
+
+
+class ListeningConnection(FakeConnection):
+    def __init__(self):
+        self.termination_listeners = []
+
+    async def add_listener(self, channel, callback):
+        pass
+
+    def add_termination_listener(self, callback):
+        self.termination_listeners.append(callback)
+
+    async def close(self):
+        pass
+
+
+@pytest.mark.asyncio
+async def test_lost_connection_is_reconnected_and_resynced(monkeypatch):
+    attempts = []
+
+    async def connect(dsn):
+        attempts.append(dsn)
+        # The first reconnect attempt fails, the next one backs off
+        if len(attempts) == 2:
+            raise OSError("connection refused")
+        return ListeningConnection()
+
+    monkeypatch.setattr("apps.common.events.asyncpg.connect", connect)
+    bus = PostgresEventBus(
+        "postgresql://localhost/test",
+        channel="events",
+        reconnect_delay=0.001,
+        reconnect_max_delay=0.002,
+    )
+    resyncs = []
+    bus.register_resync(lambda: resyncs.append(True))
+    await bus.start()
+
+    lost = bus._connection
+    for listener in lost.termination_listeners:
+        listener(lost)
+    assert bus._connection is None
+    await asyncio.wait_for(bus._reconnecting, 1)
+
+    assert len(attempts) == 3
+    assert bus._connection is not lost
+    assert resyncs == [True]
+    await bus.stop()
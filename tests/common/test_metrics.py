@@ -0,0 +1,71 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from ad_looper.main import app
+from ad_looper.metrics import Counter, Gauge, Histogram, registry
+
+
+@pytest.fixture(autouse=True)
+def clean_registry():
+    metrics = list(registry._metrics)
+    yield
+    registry._metrics[:] = metrics
+
+
+def test_counter_labels_are_escaped():
+    counter = Counter("test_requests_total", "Requests", ["path"])
+    counter.labels('/a"b\\c\nd').inc()
+    counter.labels("/").inc(2)
+
+    assert counter.render() == [
+        'test_requests_total{path="/a\\"b\\\\c\\nd"} 1.0',
+        'test_requests_total{path="/"} 2.0',
+    ]
+
+
+def test_gauge_without_labels_and_from_a_function():
+    gauge = Gauge("test_in_flight", "In flight")
+    gauge.inc(3)
+    gauge.dec()
+    assert gauge.render() == ["test_in_flight 2.0"]
+
+    size = Gauge("test_size", "Size", function=lambda: 7)
+    assert size.render() == ["test_size 7"]
+
+
+def test_histogram_buckets_are_cumulative():
+    histogram = Histogram(
+        "test_duration_seconds", "Duration", ["route"], buckets=(0.1, 1)
+    )
+    child = histogram.labels("/media")
+    for value in (0.05, 0.1, 0.5, 3):
+        child.observe(value)
+
+    assert histogram.render() == [
+        'test_duration_seconds_bucket{route="/media",le="0.1"} 2',
+        'test_duration_seconds_bucket{route="/media",le="1"} 3',
+        'test_duration_seconds_bucket{route="/media",le="+Inf"} 4',
+        'test_duration_seconds_sum{route="/media"} 3.65',
+        'test_duration_seconds_count{route="/media"} 4',
+    ]
+
+
+def test_metrics_endpoint():
+    Counter("test_help_total", "Has help text").inc()
+    client = TestClient(app)
+    client.get("/metrics")
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(
+        "text/plain; version=0.0.4"
+    )
+    lines = response.text.splitlines()
+    assert "# HELP test_help_total Has help text" in lines
+    assert "# TYPE test_help_total counter" in lines
+    assert "test_help_total 1.0" in lines
+    # The first request has been timed by the middleware
+    timed = (
+        'http_request_duration_seconds_count{method="GET",route="/metrics"}'
+    )
+    assert any(line.startswith(timed) for line in lines)
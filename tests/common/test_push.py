@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import pytest
+
+from apps.common.push import PushHub
+
+
+class FakeWebSocket:
+    def __init__(self):
+        self.sent = []
+
+    async def send_text(self, text):
+        self.sent.append(json.loads(text))
+
+
+@pytest.mark.asyncio
+async def test_only_affected_group_is_notified():
+    hub = PushHub(send_timeout=1)
+    first, second = FakeWebSocket(), FakeWebSocket()
+    hub.subscribe(first, display_device_id=1, media_group_id=10)
+    hub.subscribe(second, display_device_id=2, media_group_id=20)
+
+    hub.notify_media_group(10)
+    await asyncio.sleep(0)
+
+    assert first.sent == [{"type": "invalidate", "media_group_id": 10}]
+    assert second.sent == []
+
+
+@pytest.mark.asyncio
+async def test_moved_device_follows_its_new_group():
+    hub = PushHub(send_timeout=1)
+    websocket = FakeWebSocket()
+    subscriber = hub.subscribe(
+        websocket, display_device_id=1, media_group_id=10
+    )
+
+    hub.move_device(1, 20)
+    hub.notify_media_group(10)
+    hub.notify_media_group(20)
+    await asyncio.sleep(0)
+
+    assert websocket.sent == [
+        {"type": "invalidate", "display_device_id": 1, "media_group_id": 20},
+        {"type": "invalidate", "media_group_id": 20},
+    ]
+    hub.unsubscribe(subscriber)
+    assert len(hub) == 0
+
+
+@pytest.mark.asyncio
+async def test_bulk_move_sends_one_message_to_moved_devices_only():
+    hub = PushHub(send_timeout=1)
+    moved, other, stayed = FakeWebSocket(), FakeWebSocket(), FakeWebSocket()
+    hub.subscribe(moved, display_device_id=1, media_group_id=10)
+    hub.subscribe(other, display_device_id=2, media_group_id=None)
+    hub.subscribe(stayed, display_device_id=3, media_group_id=10)
+
+    hub.move_devices([1, 2, 4], 20)
+    hub.notify_media_group(20)
+    await asyncio.sleep(0)
+
+    message = {"type": "invalidate", "media_group_id": 20}
+    assert moved.sent == [message, message]
+    assert other.sent == [message, message]
+    assert stayed.sent == []
@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException, Request
+
+from apps.auth import crud
+from apps.auth.utils import create_jwt_token, decode_access_token
+from apps.common.dependencies import get_stateless_token
+from apps.common.evictors import evict_revoked_tokens
+from apps.common.revocation import revoked_tokens
+
+
+def device_request(token: str) -> Request:
+    return Request(
+        {"type": "http", "state": {"token_data": decode_access_token(token)}}
+    )
+
+
+def test_device_token_claims_are_enough():
+    token = create_jwt_token(
+        {"sub": "user", "owner_id": 1, "display_device_id": 7},
+        expires_delta=timedelta(days=1),
+    )
+    token_info = get_stateless_token(device_request(token), token)
+
+    assert token_info.owner_id == 1
+    assert token_info.display_device_id == 7
+    assert token_info.expires_at > datetime.utcnow()
+
+
+def test_user_tokens_fall_back_to_database():
+    token = create_jwt_token({"sub": "user"})
+
+    assert get_stateless_token(device_request(token), token) is None
+
+
+def test_revoked_device_token():
+    token = create_jwt_token(
+        {"sub": "user", "owner_id": 1, "display_device_id": 7}
+    )
+    claims = decode_access_token(token)
+    revoked_tokens.revoke(claims["jti"], datetime.utcnow() + timedelta(1))
+
+    with pytest.raises(HTTPException) as exc:
+        get_stateless_token(device_request(token), token)
+    assert exc.value.status_code == 401
+
+
+@pytest.mark.asyncio
+async def test_bulk_revocations_are_chunked(monkeypatch):
+    events = []
+
+    async def publish(event):
+        events.append(event)
+
+    monkeypatch.setattr(crud, "publish", publish)
+    tokens = [
+        create_jwt_token({"sub": "u", "owner_id": 1, "display_device_id": i})
+        for i in range(crud.REVOKED_TOKENS_CHUNK + 1)
+    ]
+    revocations = [crud._revocation(token) for token in tokens]
+    await crud.publish_revoked_tokens(1, revocations)
+
+    assert [len(event.data["tokens"]) for event in events] == [
+        crud.REVOKED_TOKENS_CHUNK,
+        1,
+    ]
+    for event in events:
+        evict_revoked_tokens(event)
+    with pytest.raises(HTTPException):
+        get_stateless_token(device_request(tokens[-1]), tokens[-1])
@@ -1,3 +1,6 @@
+from collections import defaultdict
+from contextlib import asynccontextmanager
+
 import pytest
 import pytest_asyncio
 from fastapi.testclient import TestClient
@@ -41,3 +44,46 @@ def client():
     yield TestClient(app)
 
     app.dependency_overrides.clear()
+
+
+class FakeSession:
+    async def commit(self):
+        pass
+
+    async def rollback(self):
+        pass
+
+
+class FakeCrud:
+    # Stands in for crud functions: calls are recorded without the session
+    # and answered by `result`, and a function can be told to fail.
+    # Keyword arguments are not recorded, only passed on to `result`
+    def __init__(self, monkeypatch) -> None:
+        self.monkeypatch = monkeypatch
+        self.calls: dict[str, list[tuple]] = defaultdict(list)
+        self.failures: dict[str, int] = defaultdict(int)
+
+    def replace(self, module, name: str, result=None) -> None:
+        async def fake(db, *args, **kwargs):
+            if self.failures[name]:
+                self.failures[name] -= 1
+                raise RuntimeError(f"{name} failed")
+            self.calls[name].append(args)
+            return result(*args, **kwargs) if result is not None else None
+
+        self.monkeypatch.setattr(module.crud, name, fake)
+
+    def fail(self, name: str, times: int = 1) -> None:
+        self.failures[name] += times
+
+    def use_fake_sessions(self, module) -> None:
+        @asynccontextmanager
+        async def session():
+            yield FakeSession()
+
+        self.monkeypatch.setattr(module, "AsyncSessionLocal", session)
+
+
+@pytest.fixture
+def fake_crud(monkeypatch):
+    return FakeCrud(monkeypatch)
@@ -0,0 +1,158 @@
+import json
+from types import SimpleNamespace
+
+import pytest
+from httpx import ASGITransport, AsyncClient
+
+from ad_looper.main import app
+from apps.auth import services as auth_services
+from apps.common.dependencies import get_db, get_request_user
+from apps.display_devices import services
+from apps.display_devices.schemas import DisplayDeviceCreate
+from database.models import User
+
+USER = User(id=1, username="ana")
+
+
+class Session:
+    committed = False
+
+    async def commit(self):
+        self.committed = True
+
+
+def created(display_devices, owner_id):
+    return [
+        SimpleNamespace(
+            id=100 + number,
+            name=display_device.name,
+            description=None,
+            owner_id=owner_id,
+            media_group_id=display_device.media_group_id,
+        )
+        for number, display_device in enumerate(display_devices)
+    ]
+
+
+@pytest.fixture
+def minted(fake_crud):
+    # Group 10 is the user's, 20 someone else's and 30 doesn't exist
+    fake_crud.replace(
+        services, "get_media_group_owners", lambda _: {10: 1, 20: 2}
+    )
+    fake_crud.replace(services, "create_display_devices", created)
+    minted = []
+    fake_crud.replace(
+        auth_services,
+        "create_device_tokens",
+        lambda owner_id, tokens: minted.append(tokens),
+    )
+    return minted
+
+
+def devices(*media_group_ids):
+    return [
+        DisplayDeviceCreate(name=f"screen {index}", media_group_id=group_id)
+        for index, group_id in enumerate(media_group_ids)
+    ]
+
+
+@pytest.mark.asyncio
+async def test_provisioning_answers_every_device_in_order(
+    fake_crud, minted
+):
+    results = await services.provision_display_devices(
+        Session(), USER, devices(None, 30, 20, 10), mint_tokens=True
+    )
+
+    assert [(result.index, result.status) for result in results] == [
+        (0, 201),
+        (1, 404),
+        (2, 403),
+        (3, 201),
+    ]
+    assert [results[1].detail, results[2].detail] == [
+        "Media group not found",
+        "Forbidden",
+    ]
+    assert [results[0].display_device.id, results[3].display_device.id] == [
+        100,
+        101,
+    ]
+    # Only the accepted devices are created, with one token each
+    [(accepted, _)] = fake_crud.calls["create_display_devices"]
+    assert [device.name for device in accepted] == ["screen 0", "screen 3"]
+    [tokens] = minted
+    assert [(token, device_id) for token, _, device_id in tokens] == [
+        (results[0].token, 100),
+        (results[3].token, 101),
+    ]
+
+
+@pytest.mark.asyncio
+async def test_bulk_registration_answers_every_id_in_order(fake_crud):
+    # Device 1 is the user's, 2 someone else's, 3 already registered
+    fake_crud.replace(
+        auth_services,
+        "get_registration_status",
+        lambda _: {1: (1, False), 2: (2, False), 3: (1, True)},
+    )
+    minted = []
+    fake_crud.replace(
+        auth_services,
+        "create_device_tokens",
+        lambda owner_id, tokens: minted.extend(tokens),
+    )
+
+    results = await auth_services.register_display_devices(
+        None, USER, [1, 9, 2, 3, 1]
+    )
+
+    assert [
+        (result.index, result.display_device_id, result.status)
+        for result in results
+    ] == [(0, 1, 201), (1, 9, 404), (2, 2, 403), (3, 3, 409), (4, 1, 409)]
+    assert [token for token, _, _ in minted] == [results[0].token]
+
+
+@pytest.mark.asyncio
+async def test_bulk_route_streams_a_line_per_device(minted, monkeypatch):
+    db = Session()
+
+    async def session():
+        yield db
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, session)
+    monkeypatch.setitem(
+        app.dependency_overrides, get_request_user, lambda: USER
+    )
+    body = {
+        "display_devices": [
+            {"name": "lobby", "media_group_id": 30},
+            {"name": "hall", "media_group_id": 10},
+        ],
+        "mint_tokens": False,
+    }
+
+    async with AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    ) as client:
+        response = await client.post("/display_devices/bulk", json=body)
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert lines == [
+        {"index": 0, "status": 404, "detail": "Media group not found"},
+        {
+            "index": 1,
+            "status": 201,
+            "display_device": {
+                "id": 100,
+                "name": "hall",
+                "owner_id": 1,
+                "media_group_id": 10,
+            },
+        },
+    ]
+    assert db.committed
+    assert minted == []
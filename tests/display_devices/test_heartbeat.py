@@ -0,0 +1,43 @@
+from datetime import datetime
+
+import pytest
+
+from apps.display_devices import heartbeat
+from apps.display_devices.heartbeat import HeartbeatTracker
+
+
+@pytest.fixture
+def batches(fake_crud):
+    fake_crud.use_fake_sessions(heartbeat)
+    fake_crud.replace(heartbeat, "update_last_seen")
+    return fake_crud
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_latest_beat_per_device_in_batches(batches):
+    tracker = HeartbeatTracker(batch_size=2, flush_interval=60)
+    for device_id in (1, 2, 3, 1):
+        tracker.beat(device_id, datetime(2026, 1, 1, 0, 0, device_id))
+    tracker.beat(1, datetime(2026, 1, 1, 0, 1))
+
+    await tracker.flush()
+
+    written = [batch for batch, in batches.calls["update_last_seen"]]
+    assert [len(batch) for batch in written] == [2, 1]
+    assert dict(written[0])[1] == datetime(2026, 1, 1, 0, 1)
+    assert tracker.pending == {}
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_kept_for_the_next_flush(batches):
+    tracker = HeartbeatTracker(batch_size=10, flush_interval=60)
+    tracker.beat(1, datetime(2026, 1, 1))
+    batches.fail("update_last_seen")
+
+    await tracker.flush()
+    assert tracker.pending == {1: datetime(2026, 1, 1)}
+
+    await tracker.flush()
+    assert batches.calls["update_last_seen"] == [
+        ([(1, datetime(2026, 1, 1))],)
+    ]
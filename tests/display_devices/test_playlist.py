@@ -0,0 +1,45 @@
+from apps.common.cache import CompiledPlaylist, PlaylistCache
+from apps.display_devices.utils import etag_matches
+
+
+def playlist(*media_ids: int) -> CompiledPlaylist:
+    return CompiledPlaylist(
+        body=b"{}", etag='"a"', media_ids=frozenset(media_ids)
+    )
+
+
+def test_etag_matches():
+    assert etag_matches('"a"', '"a"')
+    assert etag_matches('"b", W/"a"', '"a"')
+    assert etag_matches("*", '"a"')
+    assert not etag_matches('"b"', '"a"')
+    assert not etag_matches(None, '"a"')
+
+
+def test_media_change_invalidates_groups_listing_it():
+    cache = PlaylistCache(maxsize=10, ttl=60)
+    cache.set_playlist(1, playlist(10, 11))
+    cache.set_playlist(2, playlist(11))
+    cache.set_playlist(3, playlist(12))
+
+    cache.invalidate_media(11)
+
+    assert cache.playlists.get(1) is None
+    assert cache.playlists.get(2) is None
+    assert cache.playlists.get(3) is not None
+
+
+def test_evicted_playlists_leave_the_media_index():
+    cache = PlaylistCache(maxsize=2, ttl=60)
+    cache.set_playlist(1, playlist(10, 11))
+    cache.set_playlist(2, playlist(11))
+    cache.set_playlist(3, playlist(12))
+    assert cache._media_groups == {11: {2}, 12: {3}}
+
+    cache.set_playlist(2, playlist(13))
+    cache.playlists.invalidate(3)
+    assert cache._media_groups == {13: {2}}
+
+    cache.playlists.ttl = -1
+    assert cache.playlists.get(2) is None
+    assert cache._media_groups == {}
@@ -0,0 +1,56 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from apps.logs.crud import upsert_log_rollups
+
+
+class RecordingSession:
+    def __init__(self):
+        self.statements = []
+
+    async def execute(self, statement):
+        self.statements.append(statement)
+
+
+def log(minute: int, url: str, status_code: int, device_id: int | None = 1):
+    return {
+        "device_id": device_id,
+        "created_at": datetime(2024, 8, 7, 15, minute, 30),
+        "method": "GET",
+        "url": url,
+        "status_code": status_code,
+    }
+
+
+@pytest.mark.asyncio
+async def test_rollups_are_kept_per_minute_and_per_hour():
+    db = RecordingSession()
+    await upsert_log_rollups(
+        db,
+        [
+            log(1, "/a", 200),
+            log(1, "/a", 204),
+            log(2, "/b", 200),
+            log(2, "/b", 404),
+            log(3, "/c", 200, device_id=None),
+        ],
+    )
+    minutes, hours = (
+        statement.compile(dialect=postgresql.dialect()).params
+        for statement in db.statements
+    )
+
+    assert [minutes[f"requests_m{i}"] for i in range(3)] == [2, 1, 1]
+    assert [
+        (
+            hours[f"bucket_m{i}"],
+            hours[f"status_class_m{i}"],
+            hours[f"requests_m{i}"],
+        )
+        for i in range(2)
+    ] == [
+        (datetime(2024, 8, 7, 15), 2, 3),
+        (datetime(2024, 8, 7, 15), 4, 1),
+    ]
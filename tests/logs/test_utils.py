@@ -0,0 +1,39 @@
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from apps.logs.utils import decode_cursor, encode_cursor, iter_csv, iter_ndjson
+
+
+async def rows():
+    yield (1, datetime(2024, 8, 7, 15, 0), "/media", "GET", 200, 1.5)
+    yield (2, datetime(2024, 8, 7, 15, 1), "/media/1", "GET", 404, None)
+
+
+def test_cursor_round_trip():
+    created_at = datetime(2024, 8, 7, 15, 24, 16, 136822)
+    assert decode_cursor(encode_cursor(created_at, 42)) == (created_at, 42)
+
+
+def test_invalid_cursor():
+    with pytest.raises(HTTPException) as exc:
+        decode_cursor("not a cursor")
+    assert exc.value.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_export_formats():
+    ndjson = "".join([chunk async for chunk in iter_ndjson(rows())])
+    assert ndjson.splitlines()[1] == (
+        '{"id": 2, "created_at": "2024-08-07T15:01:00", '
+        '"url": "/media/1", "method": "GET", "status_code": 404, '
+        '"duration_ms": null}'
+    )
+
+    csv = "".join([chunk async for chunk in iter_csv(rows())])
+    assert csv.splitlines() == [
+        "id,created_at,url,method,status_code,duration_ms",
+        "1,2024-08-07T15:00:00,/media,GET,200,1.5",
+        "2,2024-08-07T15:01:00,/media/1,GET,404,",
+    ]
@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+from apps.logs.writer import LogWriter
+
+
+class MemoryLogWriter(LogWriter):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.batches = []
+
+    async def write(self, batch):
+        self.batches.append(batch)
+
+
+def put_logs(writer: LogWriter, count: int):
+    for i in range(count):
+        writer.put(url=f"/{i}", method="GET", status_code=200, device_id=1)
+
+
+@pytest.mark.asyncio
+async def test_flush_on_batch_size():
+    writer = MemoryLogWriter(queue_size=100, batch_size=10, flush_interval=60)
+    writer.start()
+    put_logs(writer, 25)
+    await asyncio.sleep(0.01)
+
+    assert [len(batch) for batch in writer.batches] == [10, 10]
+
+    await writer.stop()
+    assert [len(batch) for batch in writer.batches] == [10, 10, 5]
+    assert writer.written == 25
+
+
+@pytest.mark.asyncio
+async def test_flush_on_interval():
+    writer = MemoryLogWriter(queue_size=100, batch_size=10, flush_interval=0.05)
+    writer.start()
+    put_logs(writer, 3)
+    await asyncio.sleep(0.1)
+
+    assert [len(batch) for batch in writer.batches] == [3]
+    await writer.stop()
+
+
+@pytest.mark.asyncio
+async def test_drop_when_full():
+    writer = MemoryLogWriter(queue_size=5, batch_size=10, flush_interval=60)
+    put_logs(writer, 8)
+
+    assert writer.dropped == 3
+
+    writer.start()
+    await writer.stop()
+    assert writer.written == 5
@@ -0,0 +1,76 @@
+from collections import Counter
+
+import pytest
+from sqlalchemy.dialects import postgresql
+
+from ad_looper.config import settings
+from apps.media import crud
+from apps.media.store import blob_path
+
+
+class Result:
+    def __init__(self, rows):
+        self.rows = rows
+
+    def scalars(self):
+        return self
+
+    def all(self):
+        return self.rows
+
+
+class RecordingSession:
+    def __init__(self, *results):
+        self.results = list(results)
+        self.log = []
+
+    async def execute(self, statement, execution_options=None):
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        self.log.append(sql.split()[0])
+        return Result(self.results.pop(0) if self.results else [])
+
+    async def commit(self):
+        self.log.append("COMMIT")
+
+
+@pytest.fixture
+def media_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "media_folder", tmp_path)
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_released_blobs_keep_their_files(media_folder):
+    path = blob_path("ab" * 32)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"promo")
+    db = RecordingSession()
+
+    await crud.release_blobs(db, Counter({"ab" * 32: 2}))
+
+    # The commit may still fail, so only the collector removes files
+    assert db.log == ["UPDATE"]
+    assert path.exists()
+
+
+@pytest.mark.asyncio
+async def test_collected_blobs_lose_their_files_while_locked(media_folder):
+    path = blob_path("ab" * 32)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(b"promo")
+    db = RecordingSession(["ab" * 32, "cd" * 32])
+
+    collected = await crud.collect_blobs(db, 10)
+
+    assert collected == 2
+    assert db.log == ["SELECT", "DELETE", "COMMIT"]
+    assert not path.exists()
+
+
+@pytest.mark.asyncio
+async def test_shared_flat_files_stay_while_another_media_uses_them():
+    db = RecordingSession(["shared.mp4"])
+
+    unused = await crud.release_legacy_files(db, ["shared.mp4", "own.mp4"])
+
+    assert unused == ["own.mp4"]
@@ -0,0 +1,175 @@
+import re
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+
+from ad_looper.config import settings
+from apps.media.responses import media_file_response
+from apps.media.store import blob_path
+from apps.media.utils import RangeNotSatisfiable, parse_range
+
+DATA = bytes(range(100))
+SHA256 = "ab" * 32
+ETAG = f'"{SHA256}"'
+
+
+@pytest.fixture
+def blob(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "media_folder", tmp_path)
+    monkeypatch.setattr(settings.media, "chunk_size", 16)
+    path = blob_path(SHA256)
+    path.parent.mkdir(parents=True)
+    path.write_bytes(DATA)
+    return path
+
+
+@pytest.fixture
+def client(blob):
+    app = FastAPI()
+
+    @app.get("/download")
+    async def download(request: Request):
+        return await media_file_response(
+            request.headers, blob, "loop.mp4", SHA256, "video/mp4"
+        )
+
+    return TestClient(app)
+
+
+def test_single_and_open_ranges():
+    assert parse_range("bytes=0-99", 1000) == [(0, 99)]
+    assert parse_range("bytes=900-", 1000) == [(900, 999)]
+    assert parse_range("bytes=-100", 1000) == [(900, 999)]
+    assert parse_range("bytes=990-2000", 1000) == [(990, 999)]
+    assert parse_range("bytes=-5000", 1000) == [(0, 999)]
+
+
+def test_multiple_ranges_are_sorted_and_merged():
+    assert parse_range("bytes=500-599, 0-99", 1000) == [(0, 99), (500, 599)]
+    assert parse_range("bytes=0-99,50-149,150-199", 1000) == [(0, 199)]
+
+
+def test_invalid_headers_are_ignored():
+    assert parse_range("items=0-1", 1000) is None
+    assert parse_range("bytes=abc", 1000) is None
+    assert parse_range("bytes=5-1", 1000) is None
+    assert parse_range("bytes=-", 1000) is None
+    many = ",".join(f"{i * 10}-{i * 10 + 1}" for i in range(20))
+    assert parse_range(f"bytes={many}", 1000) is None
+
+
+def test_ranges_past_the_end_are_not_satisfiable():
+    assert parse_range("bytes=2000-,0-0", 1000) == [(0, 0)]
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=1000-", 1000)
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range("bytes=-0", 1000)
+
+
+def test_an_empty_file_satisfies_no_range():
+    for header in ("bytes=-5", "bytes=0-", "bytes=0-0,-1"):
+        with pytest.raises(RangeNotSatisfiable):
+            parse_range(header, 0)
+
+
+@pytest.mark.asyncio
+async def test_offloaded_downloads_leave_the_body_to_the_proxy(blob):
+    headers = Headers({"range": "bytes=0-9"})
+
+    response = await media_file_response(
+        headers, blob, "a b.mp4", "ab" * 32, "video/mp4",
+        delivery="x-accel-redirect",
+    )
+    assert response.status_code == 200
+    assert response.body == b""
+    assert response.headers["x-accel-redirect"] == (
+        "/_media/ab/ab/" + "ab" * 32
+    )
+    assert "a%20b.mp4" in response.headers["content-disposition"]
+
+    response = await media_file_response(
+        headers, blob, None, "ab" * 32, None, delivery="x-sendfile"
+    )
+    assert response.headers["x-sendfile"] == str(blob.resolve())
+
+    # Validators are still answered without bothering the proxy
+    response = await media_file_response(
+        Headers({"if-none-match": f'"{"ab" * 32}"'}),
+        blob, None, "ab" * 32, None, delivery="x-sendfile",
+    )
+    assert response.status_code == 304
+    assert "x-sendfile" not in response.headers
+
+
+def test_a_range_is_sent_as_partial_content(client):
+    response = client.get("/download", headers={"Range": "bytes=10-29"})
+
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-29/100"
+    assert response.headers["content-length"] == "20"
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.content == DATA[10:30]
+
+
+def test_several_ranges_are_sent_as_byteranges(client):
+    response = client.get("/download", headers={"Range": "bytes=0-4,90-"})
+
+    assert response.status_code == 206
+    assert "content-range" not in response.headers
+    match = re.fullmatch(
+        r"multipart/byteranges; boundary=(\w+)",
+        response.headers["content-type"],
+    )
+    boundary = match.group(1).encode()
+    assert response.content == (
+        b"--" + boundary + b"\r\n"
+        b"Content-Type: video/mp4\r\n"
+        b"Content-Range: bytes 0-4/100\r\n\r\n" + DATA[0:5] + b"\r\n"
+        b"--" + boundary + b"\r\n"
+        b"Content-Type: video/mp4\r\n"
+        b"Content-Range: bytes 90-99/100\r\n\r\n" + DATA[90:] + b"\r\n"
+        b"--" + boundary + b"--\r\n"
+    )
+    assert response.headers["content-length"] == str(len(response.content))
+
+
+def test_a_matching_etag_is_not_modified(client):
+    response = client.get("/download", headers={"If-None-Match": ETAG})
+
+    assert response.status_code == 304
+    assert response.headers["etag"] == ETAG
+    assert response.content == b""
+
+
+def test_a_stale_if_range_gets_the_whole_file(client):
+    response = client.get(
+        "/download",
+        headers={"Range": "bytes=10-29", "If-Range": '"stale"'},
+    )
+    assert response.status_code == 200
+    assert "content-range" not in response.headers
+    assert response.content == DATA
+
+    response = client.get(
+        "/download", headers={"Range": "bytes=10-29", "If-Range": ETAG}
+    )
+    assert response.status_code == 206
+    assert response.content == DATA[10:30]
+
+
+def test_a_range_past_the_end_is_not_satisfiable(client):
+    response = client.get("/download", headers={"Range": "bytes=100-"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */100"
+
+
+def test_a_suffix_range_of_an_empty_file_is_not_satisfiable(blob, client):
+    blob.write_bytes(b"")
+
+    response = client.get("/download", headers={"Range": "bytes=-5"})
+
+    assert response.status_code == 416
+    assert response.headers["content-range"] == "bytes */0"
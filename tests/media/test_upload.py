@@ -0,0 +1,111 @@
+import hashlib
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from ad_looper.config import settings
+from ad_looper.main import app
+from apps.media.store import blob_path, media_file_path, place_blob
+from apps.media.utils import safe_filename, write_stream
+
+
+async def chunks(data: bytes, size: int):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+
+
+@pytest.fixture
+def media_folder(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "media_folder", tmp_path)
+    monkeypatch.setattr(settings.media, "chunk_size", 64)
+    return tmp_path
+
+
+@pytest.mark.asyncio
+async def test_stream_is_hashed_and_stored_by_content(media_folder):
+    data = bytes(range(256)) * 3
+
+    temp_path, size, sha256 = await write_stream(chunks(data, 10), 1000)
+    place_blob(temp_path, sha256)
+
+    assert (size, sha256) == (len(data), hashlib.sha256(data).hexdigest())
+    assert blob_path(sha256) == media_folder / sha256[:2] / sha256[2:4] / sha256
+    assert blob_path(sha256).read_bytes() == data
+    assert not temp_path.exists()
+
+
+@pytest.mark.asyncio
+async def test_same_content_is_stored_once(media_folder):
+    for _ in range(2):
+        temp_path, _, sha256 = await write_stream(chunks(b"promo", 2), 100)
+        place_blob(temp_path, sha256)
+
+    files = [path for path in media_folder.rglob("*") if path.is_file()]
+    assert files == [blob_path(sha256)]
+
+
+@pytest.mark.asyncio
+async def test_oversized_stream_leaves_nothing_behind(media_folder):
+    with pytest.raises(HTTPException) as error:
+        await write_stream(chunks(b"x" * 500, 10), 100)
+
+    assert error.value.status_code == 413
+    assert list(media_folder.iterdir()) == []
+
+
+def test_files_from_before_the_store_are_still_found(media_folder):
+    (media_folder / "old.mp4").write_bytes(b"old")
+
+    assert media_file_path("ab" * 32, "old.mp4") == media_folder / "old.mp4"
+    assert media_file_path(None, "gone.mp4") is None
+
+
+def test_only_media_from_before_the_store_use_flat_files(media_folder):
+    (media_folder / "promo.mp4").write_bytes(b"another owner's")
+
+    assert media_file_path("ab" * 32, None) is None
+
+
+def test_filename_cannot_escape_media_folder():
+    assert safe_filename("../../etc/passwd") == "passwd"
+    with pytest.raises(HTTPException):
+        safe_filename("..")
+
+
+def test_oversized_form_is_refused_before_it_is_read(monkeypatch):
+    monkeypatch.setattr(settings.media, "max_upload_size", 100)
+    client = TestClient(app)
+
+    # Turned away before authentication or the form parser get to run
+    response = client.post(
+        "/media/1/upload", files={"file": ("a.mp4", b"x" * 200)}
+    )
+
+    assert response.status_code == 413
+
+
+@pytest.mark.parametrize("content_length", ["-1", "abc", "1e3"])
+def test_malformed_content_length_is_refused(content_length):
+    client = TestClient(app)
+
+    response = client.put(
+        "/media/1/content?filename=a.mp4",
+        content=b"x",
+        headers={"Content-Length": content_length},
+    )
+
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid Content-Length"}
+
+
+def test_form_without_content_length_is_refused():
+    client = TestClient(app)
+
+    response = client.post(
+        "/media/1/upload",
+        content=iter([b"--x--\r\n"]),
+        headers={"Content-Type": "multipart/form-data; boundary=x"},
+    )
+
+    assert response.status_code == 411
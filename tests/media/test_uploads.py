@@ -0,0 +1,220 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from httpx import ASGITransport, AsyncClient
+
+from ad_looper.config import settings
+from ad_looper.main import app
+from apps.common.dependencies import get_db, get_request_user
+from apps.media import routers
+from apps.media.uploads import (
+    create_part_file,
+    merge_ranges,
+    part_path,
+    write_chunk,
+)
+from database.models import UploadSession, User
+
+
+async def body(data: bytes):
+    for start in range(0, len(data), 3):
+        yield data[start : start + 3]
+
+
+def test_received_chunks_are_merged():
+    chunks = [(10, 5), (0, 10), (20, 5), (22, 1)]
+    assert merge_ranges(chunks) == [(0, 15), (20, 5)]
+    assert merge_ranges([]) == []
+
+
+@pytest.mark.asyncio
+async def test_chunks_can_arrive_out_of_order(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings.media, "chunk_size", 4)
+    path = tmp_path / "1.part"
+    data = b"0123456789abcdefghij"
+    create_part_file(path, len(data))
+
+    for offset in (10, 0):
+        length = await write_chunk(
+            body(data[offset : offset + 10]), path, offset, len(data) - offset
+        )
+        assert length == 10
+
+    assert path.read_bytes() == data
+    with pytest.raises(HTTPException):
+        await write_chunk(body(b"xyz"), path, 18, 2)
+
+
+class FakeUpload:
+    # What the upload_sessions row does under the crud calls
+    def __init__(self, data: bytes) -> None:
+        self.data = data
+        self.session = UploadSession(
+            id=1,
+            owner_id=1,
+            media_id=1,
+            filename="loop.mp4",
+            size=len(data),
+            status="open",
+            expires_at=datetime(2100, 1, 1),
+        )
+        self.writers = 0
+        self.chunks = []
+        self.deleted = False
+        self.stored = []
+        self.commits = 0
+
+    def begin(self, session_id):
+        if self.session.status != "open":
+            return False
+        self.writers += 1
+        return True
+
+    def finish(self, session_id, offset, length):
+        if length:
+            self.chunks.append((offset, length))
+        self.writers -= 1
+
+    def set_status(self, session_id, status, expected):
+        if self.session.status != expected or self.writers:
+            return False
+        self.session.status = status
+        return True
+
+    def delete(self, session_id):
+        self.deleted = True
+
+    async def commit(self):
+        self.commits += 1
+
+    async def rollback(self):
+        pass
+
+
+@pytest.fixture
+def upload(tmp_path, monkeypatch, fake_crud):
+    monkeypatch.setattr(settings, "media_folder", tmp_path)
+    upload = FakeUpload(b"0123456789abcdefghij")
+    create_part_file(part_path(1), len(upload.data))
+    fake_crud.replace(routers, "get_upload_session", lambda _: upload.session)
+    fake_crud.replace(routers, "get_upload_chunks", lambda _: upload.chunks)
+    fake_crud.replace(routers, "begin_upload_chunk", upload.begin)
+    fake_crud.replace(routers, "finish_upload_chunk", upload.finish)
+    fake_crud.replace(routers, "set_upload_status", upload.set_status)
+    fake_crud.replace(routers, "delete_upload_session", upload.delete)
+
+    async def set_media_filename(db, media_id, filename, path, **kwargs):
+        # Moves the part file like the real one does
+        upload.stored.append(path.read_bytes())
+        path.unlink()
+        return SimpleNamespace(
+            id=media_id, name="m", filename=filename, owner_id=1,
+            media_groups=[], schedules=[], **kwargs,
+        )
+
+    monkeypatch.setattr(routers.crud, "set_media_filename", set_media_filename)
+
+    async def session():
+        yield upload
+
+    monkeypatch.setitem(app.dependency_overrides, get_db, session)
+    monkeypatch.setitem(
+        app.dependency_overrides, get_request_user, lambda: User(id=1)
+    )
+    return upload
+
+
+def client() -> AsyncClient:
+    return AsyncClient(
+        transport=ASGITransport(app=app), base_url="http://test"
+    )
+
+
+@pytest.mark.asyncio
+async def test_finalize_waits_for_chunks_being_written(upload):
+    data = upload.data
+    arrived = asyncio.Event()
+    resume = asyncio.Event()
+
+    async def slow_body():
+        yield data[:5]
+        arrived.set()
+        await resume.wait()
+        yield data[5:]
+
+    async with client() as http:
+        await http.put("/media/uploads/1/chunks?offset=0", content=data)
+        chunk = asyncio.create_task(
+            http.put("/media/uploads/1/chunks?offset=0", content=slow_body())
+        )
+        await arrived.wait()
+
+        # Every byte has arrived, but a retried chunk is still being
+        # written over them
+        response = await http.post("/media/uploads/1/finalize")
+        assert response.status_code == 409
+        assert not upload.stored
+
+        resume.set()
+        assert (await chunk).status_code == 204
+        response = await http.post("/media/uploads/1/finalize")
+        assert response.status_code == 200
+
+    assert upload.stored == [data]
+    assert upload.writers == 0
+    assert upload.deleted
+
+
+@pytest.mark.asyncio
+async def test_part_file_is_hashed_without_a_connection(upload, monkeypatch):
+    commits = []
+
+    def hash_file(path):
+        commits.append(upload.commits)
+        return "ab" * 32
+
+    monkeypatch.setattr(routers, "hash_file", hash_file)
+    upload.chunks.append((0, len(upload.data)))
+
+    async with client() as http:
+        await http.post("/media/uploads/1/finalize")
+
+    # The chunk read is committed by then
+    assert commits == [1]
+
+
+@pytest.mark.asyncio
+async def test_failed_finalize_reopens_while_the_part_file_is_left(upload):
+    upload.session.sha256 = "0" * 64
+    upload.chunks.append((0, len(upload.data)))
+
+    async with client() as http:
+        response = await http.post("/media/uploads/1/finalize")
+
+    assert response.status_code == 422
+    assert upload.session.status == "open"
+    assert not upload.deleted
+
+
+@pytest.mark.asyncio
+async def test_failed_finalize_drops_a_session_whose_file_has_moved(
+    upload, monkeypatch
+):
+    upload.chunks.append((0, len(upload.data)))
+    store = routers.crud.set_media_filename
+
+    async def set_media_filename(*args, **kwargs):
+        await store(*args, **kwargs)
+        raise RuntimeError("commit failed")
+
+    monkeypatch.setattr(routers.crud, "set_media_filename", set_media_filename)
+
+    async with client() as http:
+        with pytest.raises(RuntimeError):
+            await http.post("/media/uploads/1/finalize")
+
+    assert upload.deleted
+    assert upload.session.status == "finalizing"
@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from apps.common.schemas import TokenInfo
+from apps.plays import services
+from apps.plays.schemas import PlayBatch
+
+
+@pytest.fixture
+def records(fake_crud):
+    fake_crud.replace(
+        services,
+        "get_owned_media_ids",
+        lambda owner_id, media_ids: {1, 2} & set(media_ids),
+    )
+    fake_crud.replace(services, "create_play_events")
+    return fake_crud
+
+
+@pytest.mark.asyncio
+async def test_ingest_rejects_foreign_media_by_index(records):
+    token = TokenInfo(
+        owner_id=1,
+        token_type="access_display_device",
+        is_active=True,
+        expires_at=datetime(2100, 1, 1),
+        display_device_id=7,
+    )
+    noon = datetime(2026, 1, 1, 12)
+    local = timezone(timedelta(hours=2))
+    batch = PlayBatch(
+        events=[
+            {"media_id": 1, "started_at": noon, "duration": 10},
+            {"media_id": 3, "started_at": noon, "duration": 10},
+            {
+                "media_id": 2,
+                "started_at": datetime(2026, 1, 1, 12, tzinfo=local),
+                "duration": 5.5,
+            },
+        ]
+    )
+
+    result = await services.ingest_plays(None, token, batch)
+
+    assert result.accepted == 2
+    assert [(r.index, r.media_id) for r in result.rejected] == [(1, 3)]
+    assert records.calls["create_play_events"] == [
+        (
+            [
+                (7, 1, datetime(2026, 1, 1, 12), 10),
+                (7, 2, datetime(2026, 1, 1, 10), 5.5),
+            ],
+        )
+    ]
@@ -0,0 +1,51 @@
+from datetime import time
+
+from apps.common.timeline import ScheduleTimeline
+
+
+def test_current_and_next_wrap_around_midnight():
+    timeline = ScheduleTimeline()
+    timeline.load([(1, 10, 100, time(8)), (2, 10, 101, time(12))])
+
+    current, upcoming = timeline.at(10, time(9))
+    assert (current.schedule_id, upcoming.schedule_id) == (1, 2)
+
+    current, upcoming = timeline.at(10, time(7))
+    assert (current.schedule_id, upcoming.schedule_id) == (2, 1)
+
+    current, upcoming = timeline.at(10, time(12))
+    assert (current.schedule_id, upcoming.schedule_id) == (2, 1)
+
+
+def test_incremental_updates():
+    timeline = ScheduleTimeline()
+    timeline.add(1, 10, 100, time(8))
+    timeline.add(2, 10, 101, time(12))
+
+    # Moving a schedule to another group takes it out of the old one
+    timeline.add(2, 11, 101, time(12))
+    assert timeline.at(10, time(13)) == timeline.at(10, time(9))
+    assert timeline.at(11, time(13))[0].schedule_id == 2
+
+    timeline.remove(1)
+    assert timeline.at(10, time(9)) == (None, None)
+    assert len(timeline) == 1
+
+
+def test_changes_during_a_reload_survive_it():
+    timeline = ScheduleTimeline()
+    timeline.load([(1, 10, 100, time(8)), (2, 10, 101, time(12))])
+
+    timeline.begin_load()
+    # Handled while the reload query was running
+    timeline.add(3, 10, 102, time(10))
+    timeline.remove(2)
+    timeline.load([(1, 10, 100, time(8)), (2, 10, 101, time(12))])
+
+    assert len(timeline) == 2
+    assert timeline.at(10, time(11))[0].schedule_id == 3
+    assert timeline.at(10, time(13))[0].schedule_id == 3
+
+    # Only changes made during that reload are replayed
+    timeline.load([(1, 10, 100, time(8))])
+    assert len(timeline) == 1